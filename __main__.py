@@ -1,9 +1,9 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
-import controller
+import timing  # jako pierwszy - początek pomiaru czasu startu
 import os
-import subprocess
+import sys
 
 APP_NAME = "SiteBlocker"
 VERSION = "1.0"
@@ -12,15 +12,27 @@ HOST = "127.0.0.1"
 
 
 def main():
-    isroot = subprocess.check_output('whoami').strip() == b'root'
+    if len(sys.argv) > 1:
+        # Tryb wiersza poleceń - bez GUI, nie importuje tkintera.
+        with timing.startup.phase("import cli"):
+            import cli
+        code = cli.main(sys.argv[1:], APP_NAME, FPATH, HOST)
+        timing.report()
+        sys.exit(code)
+    # Bez uruchamiania `whoami` w osobnym procesie.
+    with timing.startup.phase("privilege check"):
+        isroot = os.geteuid() == 0
     if isroot:
+        with timing.startup.phase("import controller"):
+            import controller
         c = controller.AppController(APP_NAME, VERSION, FPATH, HOST)
         c.create_gui()
     else:
         print("Uruchamiasz", APP_NAME, "v.", VERSION)
-        subprocess.call(['sudo', '-S', 'python3', os.path.realpath(__file__)])
-        # subprocess.run(['gksudo', '--sudo-mode', 'python3', __file__])
-        # subprocess.call(['pkexec', 'python3', os.path.realpath(__file__)])
+        # execvp zastępuje bieżący proces, zamiast czekać na proces potomny.
+        os.execvp('sudo', ['sudo', '-S', sys.executable,
+                           os.path.realpath(__file__)])
+        # os.execvp('pkexec', ['pkexec', sys.executable, __file__])
 
 
 if __name__ == "__main__":
@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""Porównanie układu bloku: jedna para adresów w wierszu i układ zwarty
+(`AppModel.dense`) - rozmiar pliku, liczba wierszy i czas odczytu
+(`load_sites`) dla 100k stron.
+
+Uruchomienie: python3 benchmarks/bench_dense.py [liczba_stron [N ...]]
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import model  # noqa: E402
+from hostsgen import APP_NAME, HOST, write_hosts  # noqa: E402
+
+SIZE = 100000
+LAYOUTS = (0, model.DENSE_NAMES, 32)
+
+
+def main(n=SIZE, layouts=LAYOUTS):
+    print("{:>6} {:>14} {:>10} {:>16}".format("N", "rozmiar [B]", "wiersze",
+                                              "load_sites [ms]"))
+    with tempfile.TemporaryDirectory() as tmp:
+        fpath = os.path.join(tmp, 'hosts')
+        write_hosts(fpath, n)
+        m = model.AppModel(APP_NAME, fpath, HOST)
+        store = m.load_sites()
+        for dense in layouts:
+            m.dense = dense
+            m.write_file(store, atomic=True, force=True)
+            with open(fpath) as fr:
+                lines = sum(1 for _ in fr)
+            start = time.perf_counter()
+            loaded = m.load_sites()
+            elapsed = (time.perf_counter() - start) * 1000
+            assert list(loaded) == list(store)
+            print("{:>6} {:>14,} {:>10,} {:>16.1f}".format(
+                dense, os.path.getsize(fpath), lines, elapsed))
+
+
+if __name__ == "__main__":
+    args = [int(a) for a in sys.argv[1:]]
+    main(*args[:1] or [SIZE], layouts=args[1:] or LAYOUTS)
@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""Test obciążeniowy serwera DNS `dnssink` (zapytania na sekundę i p99
+opóźnienia). Działa w całości lokalnie: upstream zastępuje serwer na
+127.0.0.1 odpowiadający stałym adresem.
+
+Dla porównania podaje czas jednego przejścia przez plik hosts, które glibc
+wykonuje przy każdym zapytaniu.
+
+Uruchomienie: python3 benchmarks/bench_dns.py [liczba_stron ...]
+"""
+
+import asyncio
+import os
+import socket
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import dnssink  # noqa: E402
+import model  # noqa: E402
+from hostsgen import APP_NAME, HOST, write_hosts  # noqa: E402
+
+SIZES = (10000, 100000, 500000)
+QUERIES = 20000
+# Liczba zapytań jednocześnie czekających na odpowiedź.
+WINDOW = 64
+
+
+class Upstream(asyncio.DatagramProtocol):
+    """Zastępczy upstream - odpowiada stałym adresem na każde pytanie."""
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def datagram_received(self, data, addr):
+        query = dnssink.parse_query(data)
+        self.transport.sendto(dnssink.build_response(
+            query, rdata=socket.inet_aton("192.0.2.1")), addr)
+
+
+class LoadClient(asyncio.DatagramProtocol):
+    """Wysyła `packets` z oknem `WINDOW` i mierzy opóźnienie każdego."""
+
+    def __init__(self, packets, done):
+        self.packets = packets
+        self.done = done
+        self.sent = {}
+        self.latencies = []
+        self.next = 0
+
+    def connection_made(self, transport):
+        self.transport = transport
+        for _ in range(min(WINDOW, len(self.packets))):
+            self.send()
+
+    def send(self):
+        ident = self.next & 0xFFFF
+        self.sent[ident] = time.perf_counter()
+        self.transport.sendto(self.packets[self.next])
+        self.next += 1
+
+    def datagram_received(self, data, addr):
+        ident = int.from_bytes(data[:2], 'big')
+        self.latencies.append(time.perf_counter() - self.sent.pop(ident))
+        if self.next < len(self.packets):
+            self.send()
+        elif not self.sent and not self.done.done():
+            self.done.set_result(None)
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+
+async def load(addr, names):
+    loop = asyncio.get_event_loop()
+    packets = [dnssink.build_query(name, ident=i & 0xFFFF)
+               for i, name in enumerate(names)]
+    done = loop.create_future()
+    start = time.perf_counter()
+    client, proto = await loop.create_datagram_endpoint(
+        lambda: LoadClient(packets, done), remote_addr=addr)
+    await asyncio.wait_for(done, 60)
+    elapsed = time.perf_counter() - start
+    client.close()
+    return len(packets) / elapsed, percentile(proto.latencies, 0.99) * 1000
+
+
+def scan_hosts(fpath, name):
+    """Przejście przez plik hosts wiersz po wierszu, jak robi to glibc."""
+    with open(fpath) as fr:
+        for line in fr:
+            fields = line.split('#', 1)[0].split()
+            if name in fields[1:]:
+                return True
+    return False
+
+
+async def bench(store):
+    loop = asyncio.get_event_loop()
+    upstream, _ = await loop.create_datagram_endpoint(
+        Upstream, local_addr=("127.0.0.1", 0))
+    sinkhole = dnssink.DnsSinkhole(dnssink.SinkIndex.from_store(store), HOST,
+                                   upstream=upstream.get_extra_info('sockname'))
+    transport, server = await dnssink.serve(sinkhole, port=0)
+    addr = transport.get_extra_info('sockname')
+    # Tylko strony rzeczywiście zablokowane na liście.
+    selected = store.selected()
+    blocked = [next(filter(None, store[selected[i % len(selected)]]))
+               for i in range(QUERIES)]
+    assert all(name in sinkhole.index for name in blocked)
+    passed = ["other{}.org".format(i) for i in range(QUERIES // 4)]
+    results = [await load(addr, blocked), await load(addr, passed)]
+    transport.close()
+    upstream.close()
+    server.close()
+    await server.wait_closed()
+    return results
+
+
+def main(sizes=SIZES):
+    print("{:>8} {:>14} {:>10} {:>14} {:>10} {:>12}".format(
+        "strony", "zablok. [1/s]", "p99 [ms]", "przek. [1/s]", "p99 [ms]",
+        "hosts [ms]"))
+    loop = asyncio.get_event_loop()
+    with tempfile.TemporaryDirectory() as tmp:
+        fpath = os.path.join(tmp, 'hosts')
+        for n in sizes:
+            write_hosts(fpath, n)
+            m = model.AppModel(APP_NAME, fpath, HOST)
+            m.load_sites()
+            (bqps, bp99), (fqps, fp99) = loop.run_until_complete(
+                bench(m.sites))
+            start = time.perf_counter()
+            scan_hosts(fpath, "missing.example")
+            scan = (time.perf_counter() - start) * 1000
+            print("{:>8} {:>14,.0f} {:>10.2f} {:>14,.0f} {:>10.2f} {:>12.1f}"
+                  .format(n, bqps, bp99, fqps, fp99, scan))
+
+
+if __name__ == "__main__":
+    main([int(a) for a in sys.argv[1:]] or SIZES)
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""Czas do interakcji GUI (od utworzenia okna do wyrenderowania listy) dla
+10k i 100k stron: dawne ładowanie wiersz po wierszu (`insert`,
+`selection_set`, `entry.delete`, `entry.focus` i pętla tabulatora na każdą
+pozycję) kontra `AppView.load_from_file` z wirtualną listą.
+
+Wymaga działającego serwera X (zmienna DISPLAY).
+Uruchomienie: python3 benchmarks/bench_gui.py [liczba_stron ...]
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import model  # noqa: E402
+
+SIZES = (10000, 100000)
+
+
+def make_store(n: int) -> model.SiteStore:
+    return model.SiteStore.from_sites(
+        (i % 3 == 0, "site{}.com".format(i), "www.site{}.com".format(i))
+        for i in range(n))
+
+
+def legacy_load(v, store: model.SiteStore) -> None:
+    """Odtworzenie dawnego `load_from_file` + `add_to_listbox`."""
+    import tkinter as tk
+    for n, elem in enumerate(store):
+        tab = 16
+        while len(elem[0]) >= tab:
+            tab += 4
+        v.listbox.insert(tk.END, (' ' * (tab - len(elem[0]))).join(elem))
+        if store.blocked[n]:
+            v.listbox.selection_set(tk.END)
+        v.entry.delete(0, 'end')
+        v.entry.focus()
+
+
+def time_to_interactive(store: model.SiteStore, legacy: bool) -> float:
+    import view
+    start = time.perf_counter()
+    v = view.AppView()
+    if legacy:
+        legacy_load(v, store)
+    else:
+        v.load_from_file(store)
+    v.root.update()
+    elapsed = time.perf_counter() - start
+    v.quit()
+    return elapsed * 1000
+
+
+def main(sizes=SIZES):
+    if not os.environ.get('DISPLAY'):
+        print("Brak DISPLAY - pomiar GUI pominięty.")
+        return
+    print("{:>10} {:>16} {:>16}".format("strony", "przed [ms]", "po [ms]"))
+    for n in sizes:
+        store = make_store(n)
+        before = time_to_interactive(store, legacy=True)
+        after = time_to_interactive(store, legacy=False)
+        print("{:>10} {:>16.1f} {:>16.1f}".format(n, before, after))
+
+
+if __name__ == "__main__":
+    main([int(a) for a in sys.argv[1:]] or SIZES)
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""Import dużej listy blokowanych domen: jeden proces (`import_lines`)
+i import równoległy (`import_parallel`) dla różnej liczby procesów.
+Na liście są już strony (`EXISTING`), więc procesy potomne odrzucają część
+wierszy jako duplikaty. Sprawdza też, czy wynik jest taki sam. Zysk
+z równoległości widać tylko na maszynie z więcej niż jednym procesorem.
+
+Uruchomienie: python3 benchmarks/bench_import.py [liczba_wierszy
+                  [procesy ...]]
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import importer  # noqa: E402
+import model  # noqa: E402
+from hostsgen import APP_NAME, HOST  # noqa: E402
+
+SIZE = 2000000
+# Co która strona z pliku jest już na liście przed importem.
+EXISTING = 20
+
+
+def write_list(fpath: str, n: int) -> None:
+    """Lista w formacie hosts z domenami, adblock i powtórzeniami."""
+    with open(fpath, 'w') as fw:
+        for i in range(n):
+            if i % 10 == 0:
+                fw.write("||ads{}.example.net^\n".format(i))
+            elif i % 10 == 1:
+                fw.write("0.0.0.0 site{}.com\n".format(i - 1))
+            else:
+                fw.write("0.0.0.0 tracker{}.com www.tracker{}.com\n".format(
+                    i, i))
+
+
+def run(fn, n: int):
+    m = model.AppModel(APP_NAME, "", HOST)
+    m.sites = model.SiteStore(
+        ("tracker{}.com".format(i), "www.tracker{}.com".format(i))
+        for i in range(2, n, EXISTING))
+    start = time.perf_counter()
+    report = fn(m)
+    return time.perf_counter() - start, report, m.sites
+
+
+def main(n=SIZE, workers=None):
+    cpus = os.cpu_count() or 1
+    workers = workers or sorted({2, cpus // 2 or 1, cpus} - {1})
+    with tempfile.TemporaryDirectory() as tmp:
+        fpath = os.path.join(tmp, 'list.txt')
+        write_list(fpath, n)
+        print("plik: {:,} B, {:,} wierszy, procesory: {}".format(
+            os.path.getsize(fpath), n, cpus))
+        if cpus == 1:
+            print("uwaga: jeden procesor - wynik pokazuje koszt procesów, "
+                  "nie skalowanie")
+        print("{:>8} {:>10} {:>14} {:>9}".format("procesy", "czas [s]",
+                                                "wiersze [1/s]", "zysk"))
+
+        def sequential(m):
+            with open(fpath, errors='replace') as fr:
+                return importer.import_lines(m, fr)
+        base, expected, sites = run(sequential, n)
+        print("{:>8} {:>10.2f} {:>14,.0f} {:>8.2f}x".format(1, base,
+                                                           n / base, 1.0))
+        for w in workers:
+            seconds, report, other = run(
+                lambda m: importer.import_parallel(m, fpath, workers=w), n)
+            assert report == expected and list(other) == list(sites)
+            print("{:>8} {:>10.2f} {:>14,.0f} {:>8.2f}x".format(
+                w, seconds, n / seconds, base / seconds))
+
+
+if __name__ == "__main__":
+    args = [int(a) for a in sys.argv[1:]]
+    main(*args[:1] or [SIZE], workers=args[1:] or None)
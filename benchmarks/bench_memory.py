@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""Pamięć zajmowana przez 1M stron: lista krotek (zablokowana, adres.com,
+www.adres.com), czyli dawny wynik `extract_sites`, poprzednia postać
+`SiteStore` (lista par z indeksem obu adresów) i obecny `SiteStore`
+(adres zapisany raz, wariant `www.` i stan zablokowania jako bity) razem
+z indeksem adresów.
+
+Uruchomienie: python3 benchmarks/bench_memory.py [liczba_stron]
+"""
+
+import os
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import model  # noqa: E402
+
+N = 1000000
+
+
+def parsed(n: int):
+    """Krotki tak jak z `extract_data` - każdy adres to osobny napis."""
+    for i in range(n):
+        yield i % 3 == 0, "site{}.com".format(i), "www.site{}.com".format(i)
+
+
+def pair_store(n: int):
+    """Poprzednia postać `SiteStore`: lista par, indeks obu adresów każdej
+    pary i bajt zaznaczenia na pozycję."""
+    sites, index, blocked = [], {}, bytearray()
+    for n, site in enumerate(parsed(n)):
+        sites.append(site[1:3])
+        blocked.append(site[0])
+        index[site[1]] = index[site[2]] = n
+    return sites, index, blocked
+
+
+def measure(build, n: int) -> int:
+    tracemalloc.start()
+    data = build(n)  # noqa: F841
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return size
+
+
+def main(n=N):
+    legacy = measure(lambda k: list(parsed(k)), n)
+    pairs = measure(pair_store, n)
+    store = measure(lambda k: model.SiteStore.from_sites(parsed(k)), n)
+    print("stron: {}".format(n))
+    for label, size in (("lista krotek", legacy),
+                        ("lista par + indeks", pairs),
+                        ("SiteStore + indeks", store)):
+        print("{:<20} {:8.1f} MB  {:6.1f} B/stronę".format(
+            label, size / 2 ** 20, size / n))
+
+
+if __name__ == "__main__":
+    main(*[int(a) for a in sys.argv[1:2]])
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""Sprawdzanie i uzupełnianie adresów przy imporcie dużych list: pojedynczo
+(`validate_data` + `complete_user_input`, jak przed zmianą) i wsadowo
+(`normalize_batch` - wzorce kompilowane raz, powtórzenia rozpoznawane
+słownikiem, IDNA) oraz `normalize_domain` wywoływane pojedynczo
+(`lru_cache`).
+
+Dane: adresy z powtórzeniami (jak na listach łączonych z wielu źródeł),
+wielkimi literami, kropką na końcu, adresy spoza ASCII i błędne wpisy.
+
+Uruchomienie: python3 benchmarks/bench_normalize.py [liczba_adresów
+                  [ułamek_powtórzeń]]
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import model  # noqa: E402
+from hostsgen import APP_NAME, HOST  # noqa: E402
+
+SIZE = 1000000
+REPEATED = 0.3
+
+
+def make_inputs(n: int, repeated: float):
+    unique = max(1, int(n * (1 - repeated)))
+    inputs = []
+    for i in range(n):
+        k = i % unique
+        if k % 50 == 0:
+            inputs.append("Sklep{}.zażółć.pl.".format(k))
+        elif k % 50 == 1:
+            inputs.append("?bad{}.com".format(k))
+        elif k % 2:
+            inputs.append("www.Site{}.com".format(k))
+        else:
+            inputs.append("tracker{}.net.".format(k))
+    return inputs
+
+
+def per_item(m: model.AppModel, inputs):
+    """Dawna ścieżka importu - każdy adres osobno."""
+    validate, complete = m.validate_data, m.complete_user_input
+    sites = []
+    for inp in inputs:
+        inp = inp.strip().lower().rstrip('.')
+        if validate(inp):
+            sites.append(complete(inp))
+    return sites
+
+
+def single(inputs):
+    normalize = model.normalize_domain
+    return [site for site, _ in map(normalize, inputs) if site is not None]
+
+
+def batch(inputs):
+    return [site for site, _ in model.normalize_batch(inputs)
+            if site is not None]
+
+
+def main(n=SIZE, repeated=REPEATED):
+    inputs = make_inputs(n, repeated)
+    m = model.AppModel(APP_NAME, "", HOST)
+    print("{:<24} {:>10} {:>14}".format("ścieżka", "czas [s]",
+                                        "adresy [1/s]"))
+    for name, fn in (("pojedynczo", lambda: per_item(m, inputs)),
+                     ("normalize_domain", lambda: single(inputs)),
+                     ("normalize_batch", lambda: batch(inputs))):
+        start = time.perf_counter()
+        sites = fn()
+        seconds = time.perf_counter() - start
+        print("{:<24} {:>10.2f} {:>14,.0f}  ({:,} poprawnych)".format(
+            name, seconds, n / seconds, len(sites)))
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    main(int(args[0]) if args else SIZE,
+         float(args[1]) if len(args) > 1 else REPEATED)
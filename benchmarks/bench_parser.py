@@ -0,0 +1,45 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""Pomiar przepustowości parsera pliku hosts (pozycje na sekundę).
+
+Porównuje jednoprzebiegowy generator `AppModel.iter_sites` ze ścieżką
+`read_file` + `extract_sites` dla 10k, 100k i 1M wierszy.
+
+Uruchomienie: python3 benchmarks/bench_parser.py [liczba_wierszy ...]
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import model  # noqa: E402
+from hostsgen import APP_NAME, HOST, write_hosts  # noqa: E402
+
+SIZES = (10000, 100000, 1000000)
+
+
+def measure(fn) -> float:
+    start = time.perf_counter()
+    count = fn()
+    return count / (time.perf_counter() - start)
+
+
+def main(sizes=SIZES):
+    print("{:>10} {:>18} {:>18}".format("wiersze", "iter_sites [1/s]",
+                                        "read+extract [1/s]"))
+    with tempfile.TemporaryDirectory() as tmp:
+        fpath = os.path.join(tmp, 'hosts')
+        m = model.AppModel(APP_NAME, fpath, HOST)
+        for n in sizes:
+            write_hosts(fpath, n)
+            stream = measure(lambda: sum(1 for _ in m.iter_sites()))
+            legacy = measure(lambda: len(m.extract_sites(m.read_file())))
+            print("{:>10} {:>18,.0f} {:>18,.0f}".format(n, stream, legacy))
+
+
+if __name__ == "__main__":
+    main([int(a) for a in sys.argv[1:]] or SIZES)
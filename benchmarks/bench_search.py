@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""Filtrowanie listy stron podczas pisania w polu wyszukiwania: czas
+każdego kolejnego znaku dla `AppModel.filter_sites` (indeks `SiteIndex`)
+w porównaniu z przeglądaniem wszystkich wierszy, jak przy filtrowaniu
+w widżecie. Mierzy też budowę indeksu: całość i najdłuższy krok
+(`SEARCH_STEP` pozycji), który GUI wykonuje w tle.
+
+Adresy są losowane z sylab (stałe ziarno), żeby n-gramy miały rozkład
+bliższy prawdziwym listom niż `siteN.com` z `hostsgen`.
+
+Uruchomienie: python3 benchmarks/bench_search.py [liczba_stron
+                  [zapytanie ...]]
+"""
+
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import model  # noqa: E402
+from hostsgen import APP_NAME, HOST  # noqa: E402
+
+SIZE = 500000
+QUERIES = ("tracker", "adserv", "news.pl", "cdn7")
+# Czas klatki przy 60 Hz.
+FRAME_MS = 1000 / 60
+SYLLABLES = ("ad", "ber", "bu", "cdn", "do", "go", "ka", "la", "mi", "my",
+             "net", "news", "pro", "ro", "serv", "shop", "tes", "track",
+             "vi", "xo", "zen", "er", "stat", "img")
+TLDS = ("com", "net", "org", "pl", "de", "io")
+
+
+def make_store(n: int) -> model.SiteStore:
+    rnd = random.Random(1)
+    names = set()
+    while len(names) < n:
+        names.add("{}{}.{}".format(
+            "".join(rnd.choice(SYLLABLES)
+                    for _ in range(rnd.randint(2, 4))),
+            rnd.randint(0, 99), rnd.choice(TLDS)))
+    return model.SiteStore((name, "www." + name) for name in sorted(names))
+
+
+def scan_rows(store: model.SiteStore, query: str):
+    """Filtrowanie bez indeksu - każdy wiersz listy."""
+    return [n for n, (bare, alias) in enumerate(store)
+            if query in bare or query in alias]
+
+
+def timed(fn) -> float:
+    start = time.perf_counter()
+    fn()
+    return (time.perf_counter() - start) * 1000
+
+
+def main(n=SIZE, queries=QUERIES):
+    m = model.AppModel(APP_NAME, "", HOST)
+    m.sites = store = make_store(n)
+    steps = []
+    while True:
+        remaining = []
+        steps.append(timed(lambda: remaining.append(
+            store.search_index.update(model.SEARCH_STEP))))
+        if not remaining[0]:
+            break
+    print("{:,} stron; indeks: {:.0f} ms w {} krokach, najdłuższy krok "
+          "{:.1f} ms".format(n, sum(steps), len(steps), max(steps)))
+    print("{:<14} {:>9} {:>12} {:>12}".format("wpisane", "wyniki",
+                                              "wiersze [ms]", "indeks [ms]"))
+    worst = 0.0
+    for query in queries:
+        for k in range(1, len(query) + 1):
+            text = query[:k]
+            found = []
+            ms = timed(lambda: found.append(m.filter_sites(text)))
+            scan = timed(lambda: scan_rows(store, text))
+            worst = max(worst, ms)
+            print("{:<14} {:>9} {:>12.1f} {:>12.1f}{}".format(
+                text, len(found[0]), scan, ms,
+                "" if ms <= FRAME_MS else "  > klatka"))
+    print("najdłuższe filtrowanie: {:.1f} ms (klatka {:.1f} ms)".format(
+        worst, FRAME_MS))
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    main(int(args[0]) if args else SIZE, args[1:] or QUERIES)
@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""Renderowanie bloku dla 100k stron z 90% zaznaczonych: zaznaczenie jako
+krotka z `curselection()` (test `n in sel`, O(n*m)) kontra mapa bitowa
+`SiteStore.blocked`.
+
+Stara ścieżka jest mierzona na próbce SAMPLE równomiernie rozłożonych
+pozycji i ekstrapolowana - pełny pomiar trwałby kilkadziesiąt minut.
+
+Uruchomienie: python3 benchmarks/bench_selection.py [liczba_stron]
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import model  # noqa: E402
+from hostsgen import APP_NAME, HOST  # noqa: E402
+
+N = 100000
+SAMPLE = 1000
+
+
+def main(n=N):
+    m = model.AppModel(APP_NAME, '', HOST)
+    sites = [("site{}.com".format(i), "www.site{}.com".format(i))
+             for i in range(n)]
+    sel = tuple(i for i in range(n) if i % 10)
+    store = model.SiteStore(sites)
+    store.select(sel)
+
+    start = time.perf_counter()
+    for i in range(0, n, n // SAMPLE):
+        i in sel
+    legacy = (time.perf_counter() - start) * n / SAMPLE
+
+    start = time.perf_counter()
+    sum(1 for _ in m.render_block(store))
+    bitmap = time.perf_counter() - start
+
+    print("strony: {}, zaznaczone: {}".format(n, len(sel)))
+    print("krotka (n in sel), ekstrapolacja: {:10.1f} ms".format(legacy * 1000))
+    print("mapa bitowa, cały blok:           {:10.1f} ms".format(bitmap * 1000))
+
+
+if __name__ == "__main__":
+    main(*[int(a) for a in sys.argv[1:2]])
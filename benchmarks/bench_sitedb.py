@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""Baza stron (`sitedb`) dla dużych list: wczytanie listy z bazy
+(`load_sites`), zapis bloku pliku hosts z zapytania (`write_file`) po
+przełączeniu jednej strony oraz zapytania wg listy i czasu dodania
+(indeksy) w porównaniu z odczytem pliku hosts bez bazy.
+
+Uruchomienie: python3 benchmarks/bench_sitedb.py [liczba_stron ...]
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import model  # noqa: E402
+import sitedb  # noqa: E402
+from hostsgen import APP_NAME, HOST, write_hosts  # noqa: E402
+
+SIZES = (100000, 1000000)
+# Strony dodane później, z osobnej listy - wynik zapytań.
+QUERIED = 1000
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return (time.perf_counter() - start) * 1000, result
+
+
+def run(n: int, tmp: str):
+    fpath = os.path.join(tmp, 'hosts')
+    write_hosts(fpath, n)
+    plain = model.AppModel(APP_NAME, fpath, HOST)
+    yield "load_sites (plik hosts)", timed(plain.load_sites)[0]
+    clock = [0.0]
+    db = sitedb.SiteDatabase(os.path.join(tmp, '{}.db'.format(n)),
+                             lambda: clock[0])
+    m = model.AppModel(APP_NAME, fpath, HOST)
+    m.db = db
+    yield "import do bazy", timed(m.load_sites)[0]
+    clock[0] = 1.0
+    db.source = "nowe"
+    for i in range(QUERIED):
+        m.sites.append(("new{}.org".format(i), "www.new{}.org".format(i)),
+                       True)
+    yield "write_file +{}".format(QUERIED), timed(
+        lambda: m.write_file(m.sites, atomic=True))[0]
+    yield "load_sites (baza)", timed(m.load_sites)[0]
+    m.sites.set_blocked(0, not m.sites.blocked[0])
+    yield "write_file (1 zmiana)", timed(
+        lambda: m.write_file(m.sites, atomic=True))[0]
+    # Jak `cli query` - zawsze z blokiem (indeksy złożone).
+    for name, query in (("query --list", lambda: list(db.query(
+                            m.head, source="nowe"))),
+                        ("query --since", lambda: list(db.query(
+                            m.head, since=1.0)))):
+        ms, rows = timed(query)
+        assert len(rows) == QUERIED
+        yield name, ms
+    db.close()
+
+
+def main(sizes=SIZES):
+    print("{:<26} {:>9} {:>12}".format("operacja", "strony", "czas [ms]"))
+    with tempfile.TemporaryDirectory() as tmp:
+        for n in sizes:
+            for name, ms in run(n, tmp):
+                print("{:<26} {:>9} {:>12.1f}".format(name, n, ms))
+
+
+if __name__ == "__main__":
+    main([int(a) for a in sys.argv[1:]] or SIZES)
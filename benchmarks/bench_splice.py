@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""Plik hosts z dużą częścią spoza bloku (np. lokalne nazwy hostów) i małym
+blokiem programu: czas `clear_hosts_file` i `replace_hosts_file` (znaczniki
+szukane w mmap, kopiowanie bajtów) w porównaniu z przepisywaniem pliku
+wiersz po wierszu, jak przed zmianą.
+
+Uruchomienie: python3 benchmarks/bench_splice.py [wiersze_spoza_bloku ...]
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import model  # noqa: E402
+from hostsgen import APP_NAME, HOST, write_hosts  # noqa: E402
+
+SIZES = (10000, 100000, 1000000)
+BLOCK = 100
+REPEAT = 3
+
+
+def clear_by_lines(m: model.AppModel) -> None:
+    """Dawne `clear_hosts_file` - dekodowanie i zapis wszystkich wierszy."""
+    with open(m.fpath, 'r+') as fr:
+        rewritten = []
+        rewrite = True
+        for line in fr.readlines():
+            if line.strip() == m.head:
+                rewrite = False
+            elif line.strip() == m.foot:
+                rewrite = True
+                continue
+            if rewrite:
+                rewritten.append(line)
+        fr.truncate(0)
+        fr.seek(0)
+        fr.write(''.join(rewritten))
+
+
+def best_of(fn, setup) -> float:
+    times = []
+    for _ in range(REPEAT):
+        setup()
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return min(times) * 1000
+
+
+def main(sizes=SIZES):
+    print("{:>10} {:>16} {:>16} {:>16}".format(
+        "poza blok.", "wierszami [ms]", "clear [ms]", "replace [ms]"))
+    with tempfile.TemporaryDirectory() as tmp:
+        fpath = os.path.join(tmp, 'hosts')
+        m = model.AppModel(APP_NAME, fpath, HOST)
+        for n in sizes:
+            def regen():
+                write_hosts(fpath, BLOCK, unmanaged=n)
+            regen()
+            block = list(m.render_block(m.load_sites()))
+            lines = best_of(lambda: clear_by_lines(m), regen)
+            clear = best_of(m.clear_hosts_file, regen)
+            replace = best_of(lambda: m.replace_hosts_file(block), regen)
+            print("{:>10} {:>16.1f} {:>16.1f} {:>16.1f}".format(
+                n, lines, clear, replace))
+
+
+if __name__ == "__main__":
+    main([int(a) for a in sys.argv[1:]] or SIZES)
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""Czas zimnego startu: `list` w trybie wiersza poleceń kontra ścieżka GUI
+do pierwszego wyrenderowania listy (import `controller` i `view`, `Tk()`,
+odczyt bloku, `load_from_file` i `update` okna). Każdy pomiar to osobny
+proces Pythona; wynik to mediana z REPEAT uruchomień.
+
+Pomiar GUI wymaga działającego serwera X (zmienna DISPLAY) - bez niego jest
+pomijany.
+Uruchomienie: python3 benchmarks/bench_startup.py
+"""
+
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+REPEAT = 15
+# Ścieżka GUI z `AppController.create_gui` bez pętli zdarzeń: okno
+# z wyrenderowaną listą, po czym koniec procesu.
+GUI = """import sys, timing, controller
+c = controller.AppController("SiteBlocker", "0", sys.argv[1], "127.0.0.1")
+import view
+c.view = view.AppView()
+c.view.load_from_file(c.model.load_sites())
+c.view.root.update()
+c.view.root.destroy()
+"""
+
+
+def median_ms(argv, env=None) -> float:
+    times = []
+    for _ in range(REPEAT):
+        start = time.perf_counter()
+        subprocess.run(argv, cwd=ROOT, env=env, check=True,
+                       stdout=subprocess.DEVNULL)
+        times.append(time.perf_counter() - start)
+    return statistics.median(times) * 1000
+
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        fpath = os.path.join(tmp, 'hosts')
+        with open(fpath, 'w') as fw:
+            fw.write("127.0.0.1 localhost\n")
+        env = dict(os.environ, XDG_CACHE_HOME=tmp)
+        results = [
+            ("python3 -c pass", [sys.executable, '-c', 'pass']),
+            ("cli: list", [sys.executable, ROOT, '--hosts', fpath, 'list'])]
+        if os.environ.get('DISPLAY'):
+            results.append(("GUI: okno z listą",
+                            [sys.executable, '-c', GUI, fpath]))
+        else:
+            print("brak DISPLAY - pomiar GUI pominięty")
+        times = {}
+        for label, argv in results:
+            times[label] = median_ms(argv, env)
+            print("{:<24} {:8.1f} ms".format(label, times[label]))
+        if len(times) == 3:
+            base = times["python3 -c pass"]
+            print("cli / GUI (bez startu interpretera): {:.2f}".format(
+                (times["cli: list"] - base) /
+                (times["GUI: okno z listą"] - base)))
+
+
+if __name__ == "__main__":
+    main()
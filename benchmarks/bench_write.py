@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""Porównanie zapisu bloku: dwa przebiegi (`clear_hosts_file` + dopisanie)
+kontra jeden przebieg przez plik tymczasowy i `os.replace`. Każdy pomiar
+zapisuje plik (`force=True`) - bez tego po pierwszym zapisie `write_file`
+pomija zapis niezmienionego bloku i mierzony byłby tylko skrót bloku.
+
+Uruchomienie: python3 benchmarks/bench_write.py [liczba_stron ...]
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import model  # noqa: E402
+from hostsgen import APP_NAME, HOST, write_hosts  # noqa: E402
+
+SIZES = (10000, 100000, 500000)
+REPEAT = 3
+
+
+def best_of(fn) -> float:
+    times = []
+    for _ in range(REPEAT):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return min(times) * 1000
+
+
+def main(sizes=SIZES):
+    print("{:>10} {:>10} {:>16} {:>16}".format(
+        "strony", "poza blok.", "dwa przebiegi", "atomowo [ms]"))
+    with tempfile.TemporaryDirectory() as tmp:
+        fpath = os.path.join(tmp, 'hosts')
+        m = model.AppModel(APP_NAME, fpath, HOST)
+        for n in sizes:
+            write_hosts(fpath, n, unmanaged=n)
+            sites = [s[1:3] for s in m.iter_sites()]
+            sel = set(range(0, n, 3))
+            legacy = best_of(lambda: m.write_file(sites, sel, force=True))
+            atomic = best_of(lambda: m.write_file(sites, sel, atomic=True,
+                                                  force=True))
+            print("{:>10} {:>10} {:>16.1f} {:>16.1f}".format(
+                n, n, legacy, atomic))
+
+
+if __name__ == "__main__":
+    main([int(a) for a in sys.argv[1:]] or SIZES)
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""Generator syntetycznych plików hosts dla benchmarków.
+
+Wynik zależy tylko od parametrów (bez losowości), więc ten sam plik można
+odtworzyć przy porównywaniu wersji programu.
+
+Uruchomienie: python3 benchmarks/hostsgen.py PLIK LICZBA_STRON
+                  [--blocked UŁAMEK] [--unmanaged LICZBA]
+"""
+
+from typing import Iterator
+import argparse
+import math
+
+APP_NAME = "SiteBlocker"
+HOST = "127.0.0.1"
+# Domyślnie co trzecia strona jest zablokowana.
+BLOCKED = 1 / 3
+# Tolerancja błędu zaokrąglenia przy wyznaczaniu zablokowanych stron.
+EPS = 1e-9
+
+
+def is_blocked(i: int, blocked: float) -> bool:
+    """Czy strona `i` jest zablokowana - zablokowane są rozłożone równo,
+    tak aby wśród pierwszych `k` stron było ich ok. `k * blocked` (dla 1/3
+    są to strony 0, 3, 6...)."""
+    return (math.floor(i * blocked + EPS) >
+            math.floor((i - 1) * blocked + EPS)) and blocked > 0
+
+
+def iter_hosts(n: int, unmanaged: int = 2,
+               blocked: float = BLOCKED) -> Iterator[str]:
+    """Generator - wiersze pliku hosts: `unmanaged` wierszy spoza bloku
+    (co najmniej dwa) i blok `n` stron, z których ułamek `blocked` jest
+    zablokowany."""
+    yield "127.0.0.1    localhost\n127.0.1.1    nuc\n"
+    for i in range(unmanaged - 2):
+        yield "10.{}.{}.{} host{}.lan\n".format(i >> 16 & 255, i >> 8 & 255,
+                                                 i & 255, i)
+    yield "# BEGIN {}\n".format(APP_NAME)
+    for i in range(n):
+        prefix = '' if is_blocked(i, blocked) else '# '
+        yield "{}{} site{}.com www.site{}.com \n".format(prefix, HOST, i, i)
+    yield "# END {}\n".format(APP_NAME)
+
+
+def write_hosts(fpath: str, n: int, unmanaged: int = 2,
+                blocked: float = BLOCKED) -> None:
+    """Zapisuje plik hosts z `unmanaged` wierszami spoza bloku i blokiem
+    `n` stron (domyślnie co trzecia zablokowana), zob. `iter_hosts`.
+    """
+    with open(fpath, 'w') as fw:
+        fw.writelines(iter_hosts(n, unmanaged, blocked))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('fpath', metavar='PLIK')
+    parser.add_argument('n', type=int, metavar='LICZBA_STRON')
+    parser.add_argument('--blocked', type=float, default=BLOCKED,
+                        metavar='UŁAMEK')
+    parser.add_argument('--unmanaged', type=int, default=2, metavar='LICZBA')
+    args = parser.parse_args()
+    write_hosts(args.fpath, args.n, args.unmanaged, args.blocked)
+
+
+if __name__ == "__main__":
+    # execute only if run as a script
+    main()
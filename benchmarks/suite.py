@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""Zestaw benchmarków operacji modelu dla plików hosts od 1k do 1M stron.
+
+Dla każdego rozmiaru generuje plik (`hostsgen`) i mierzy: `read_file`,
+`extract_sites`, `iter_sites`, `load_sites` (bez i z pamięcią podręczną
+`parsecache`), `validate_data`,
+`complete_user_input`, `write_file` (dwa przebiegi i atomowo) oraz
+`clear_hosts_file`. Wyniki (najlepszy z `--repeat` pomiarów) zapisuje
+w formacie JSON razem z wersją programu (git), żeby porównywać kolejne
+wersje:
+
+    python3 benchmarks/suite.py -o przed.json
+    python3 benchmarks/suite.py -o po.json --compare przed.json
+
+Uruchomienie: python3 benchmarks/suite.py [--sizes N ...] [--blocked UŁAMEK]
+                  [--unmanaged UŁAMEK] [--repeat N] [-o PLIK]
+                  [--compare PLIK]
+"""
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import model  # noqa: E402
+import parsecache  # noqa: E402
+from hostsgen import APP_NAME, BLOCKED, HOST, write_hosts  # noqa: E402
+
+SIZES = (1000, 10000, 100000, 1000000)
+REPEAT = 3
+
+
+def revision() -> str or None:
+    """Skrót bieżącej wersji z gita (z `-dirty`, jeśli są zmiany)."""
+    try:
+        return subprocess.check_output(
+            ['git', 'describe', '--always', '--dirty'], cwd=ROOT,
+            stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def best_of(fn, repeat: int, setup=None) -> float:
+    """Najkrótszy czas wykonania `fn` w sekundach; `setup` (nie mierzony)
+    jest wywoływany przed każdym pomiarem."""
+    times = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def run_size(fpath: str, n: int, unmanaged: int, blocked: float,
+             repeat: int):
+    """Generator - (operacja, czas w sekundach) dla pliku z `n` stronami."""
+    def regen():
+        write_hosts(fpath, n, unmanaged, blocked)
+
+    regen()
+    m = model.AppModel(APP_NAME, fpath, HOST)
+    lines = m.read_file()
+    sites = m.extract_sites(lines)
+    domains = [site[1] for site in sites]
+    pairs = [site[1:] for site in sites]
+    sel = [i for i, site in enumerate(sites) if site[0]]
+    del sites
+
+    def write(atomic):
+        # Świeży model - bez stanu z poprzedniego zapisu plik jest zapisywany
+        # zawsze, tak jak przy pierwszym zapisie po starcie programu.
+        model.AppModel(APP_NAME, fpath, HOST).write_file(pairs, sel, atomic)
+
+    yield 'read_file', best_of(m.read_file, repeat)
+    yield 'extract_sites', best_of(lambda: m.extract_sites(lines), repeat)
+    yield 'iter_sites', best_of(lambda: sum(1 for _ in m.iter_sites()),
+                                repeat)
+    yield 'load_sites', best_of(m.load_sites, repeat)
+    cached = model.AppModel(APP_NAME, fpath, HOST)
+    cached.cache = parsecache.ParseCache(os.path.join(
+        os.path.dirname(fpath), 'cache'))
+    cached.load_sites()
+    # Wpis zapisany zaraz po utworzeniu pliku wymaga sprawdzenia skrótu
+    # bloku (`RACY_SECONDS`) - mierzone są oba przypadki.
+    yield 'load_sites cache+hash', best_of(cached.load_sites, repeat)
+    old, parsecache.RACY_SECONDS = parsecache.RACY_SECONDS, -1e9
+    try:
+        cached.save_cached(cached.sites, cached.disk_hash,
+                           parsecache.file_signature(fpath), True)
+        yield 'load_sites cached', best_of(cached.load_sites, repeat)
+    finally:
+        parsecache.RACY_SECONDS = old
+    yield 'validate_data', best_of(
+        lambda: sum(map(m.validate_data, domains)), repeat)
+    yield 'complete_user_input', best_of(
+        lambda: list(map(m.complete_user_input, domains)), repeat)
+    yield 'write_file', best_of(lambda: write(False), repeat, regen)
+    yield 'write_file atomic', best_of(lambda: write(True), repeat, regen)
+    yield 'clear_hosts_file', best_of(m.clear_hosts_file, repeat, regen)
+
+
+def compare(results, fpath: str) -> None:
+    """Wypisuje stosunek czasów do wyników z pliku `fpath`."""
+    with open(fpath) as fr:
+        old = {(r['op'], r['n']): r['seconds']
+               for r in json.load(fr)['results']}
+    print("\n{:<22} {:>9} {:>12} {:>12} {:>8}".format(
+        "operacja", "strony", "przed [ms]", "po [ms]", "zmiana"))
+    for r in results:
+        prev = old.get((r['op'], r['n']))
+        if prev:
+            print("{:<22} {:>9} {:>12.1f} {:>12.1f} {:>7.2f}x".format(
+                r['op'], r['n'], prev * 1000, r['seconds'] * 1000,
+                prev / r['seconds']))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sizes', type=int, nargs='+', default=SIZES,
+                        metavar='N')
+    parser.add_argument('--blocked', type=float, default=BLOCKED,
+                        metavar='UŁAMEK', help="ułamek stron zablokowanych")
+    parser.add_argument('--unmanaged', type=float, default=0.0,
+                        metavar='UŁAMEK',
+                        help="wiersze spoza bloku jako ułamek liczby stron")
+    parser.add_argument('--repeat', type=int, default=REPEAT)
+    parser.add_argument('-o', '--output', metavar='PLIK',
+                        help="plik z wynikami JSON (domyślnie stdout)")
+    parser.add_argument('--compare', metavar='PLIK',
+                        help="wyniki JSON poprzedniej wersji")
+    args = parser.parse_args(argv)
+    results = []
+    print("{:<22} {:>9} {:>12} {:>14}".format("operacja", "strony", "czas [ms]",
+                                             "pozycje [1/s]"), file=sys.stderr)
+    with tempfile.TemporaryDirectory() as tmp:
+        fpath = os.path.join(tmp, 'hosts')
+        for n in args.sizes:
+            unmanaged = max(2, int(n * args.unmanaged))
+            for op, seconds in run_size(fpath, n, unmanaged, args.blocked,
+                                        args.repeat):
+                results.append({'op': op, 'n': n, 'seconds': seconds,
+                                'per_sec': n / seconds if seconds else None})
+                print("{:<22} {:>9} {:>12.1f} {:>14,.0f}".format(
+                    op, n, seconds * 1000, n / seconds), file=sys.stderr)
+    report = {'revision': revision(),
+              'python': platform.python_version(),
+              'platform': platform.platform(),
+              'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+              'config': {'sizes': args.sizes, 'blocked': args.blocked,
+                         'unmanaged': args.unmanaged, 'repeat': args.repeat},
+              'results': results}
+    if args.output:
+        with open(args.output, 'w') as fw:
+            json.dump(report, fw, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,385 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""Tryb wiersza poleceń (bez GUI) - do skryptów, crona i serwerów bez
+środowiska graficznego. Moduł nie importuje `controller` ani `view`, więc
+nie ładuje tkintera.
+
+Wszystkie polecenia działają na bloku głównym albo na profilu wybranym
+przez `--profile NAZWA` (blok `# BEGIN SiteBlocker:NAZWA`). Odczytany blok
+jest zapamiętywany w `~/.cache/siteblocker` (`parsecache`); `--no-cache`
+wyłącza pamięć podręczną. Z `--db PLIK` lista jest trzymana w bazie SQLite
+(`sitedb`) razem z danymi o stronach, a blok pliku hosts jest z niej
+tworzony.
+
+    python3 KATALOG_PROGRAMU [--profile NAZWA] list [--blocked | --unblocked]
+    python3 KATALOG_PROGRAMU block [--subdomains] ADRES [ADRES ...]
+    python3 KATALOG_PROGRAMU unblock ADRES [ADRES ...]
+    python3 KATALOG_PROGRAMU import PLIK [--unblocked] [--jobs N]
+    python3 KATALOG_PROGRAMU export [PLIK] [--all]
+    python3 KATALOG_PROGRAMU check ADRES [ADRES ...]
+    python3 KATALOG_PROGRAMU [--dense N] rewrite
+    python3 KATALOG_PROGRAMU profiles
+    python3 KATALOG_PROGRAMU enable | disable PROFIL [PROFIL ...]
+    python3 KATALOG_PROGRAMU --db PLIK query [--list NAZWA] [--since DNI]
+    python3 KATALOG_PROGRAMU schedule PLIK [--once]
+    python3 KATALOG_PROGRAMU dns [--listen ADRES] [--port PORT]
+                                 [--upstream ADRES[:PORT]]
+"""
+
+from typing import Dict, List
+import argparse
+import functools
+import model
+import os
+import sys
+import time
+
+ERRMSG: Dict[str, str] = {'invalid': "Niepoprawny adres strony: {}",
+                          'missing': "Strony nie ma na liście: {}",
+                          'oserror': "Błąd zapisu lub odczytu pliku: {}",
+                          'schedule': "Błąd w harmonogramie: {}",
+                          'profile': "Nie ma takiego profilu: {}",
+                          'badprofile': "Niepoprawna nazwa profilu: {}",
+                          'nodb': "Polecenie wymaga bazy (--db PLIK)",
+                          'db': "Błąd bazy danych: {}"}
+# 'invalid': "Invalid site address: {}"
+# 'missing': "Site is not on the list: {}"
+# 'oserror': "Cannot read or write the file: {}"
+# 'schedule': "Schedule error: {}"
+# 'profile': "No such profile: {}"
+# 'badprofile': "Invalid profile name: {}"
+# 'nodb': "This command requires a database (--db FILE)"
+# 'db': "Database error: {}"
+MSG: Dict[str, str] = {'written': "Dodane: {}, usunięte: {}, przełączone: {}",
+                       'imported': "Zaimportowano: {}, duplikaty: {}, "
+                                   "błędne wpisy: {}",
+                       'covered': "{}: blokowana przez {}",
+                       'notcovered': "{}: nie jest blokowana",
+                       'profile': "{:<16} zablokowane: {} z {}",
+                       'record': "{} {}\tlista: {}\tdodana: {} ({})\t"
+                                 "trafienia: {}"}
+# 'written': "Added: {}, removed: {}, toggled: {}"
+# 'imported': "Imported: {}, duplicates: {}, invalid: {}"
+# 'covered': "{}: blocked by {}"
+# 'notcovered': "{}: not blocked"
+# 'profile': "{:<16} blocked: {} of {}"
+# 'record': "{} {}\tlist: {}\tadded: {} ({})\thits: {}"
+
+
+def create_parser(app_name: str, fpath: str) -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog=app_name.lower())
+    parser.add_argument('--hosts', default=fpath, metavar='PLIK',
+                        help="plik hosts (domyślnie %(default)s)")
+    parser.add_argument('--profile', metavar='NAZWA',
+                        help="profil - osobny blok w pliku hosts")
+    parser.add_argument('--no-cache', action='store_true',
+                        help="nie używa pamięci podręcznej odczytanego "
+                             "bloku (zawsze parsuje plik hosts)")
+    parser.add_argument('--db', metavar='PLIK',
+                        help="baza SQLite z listą stron; blok pliku hosts "
+                             "jest tworzony z bazy")
+    parser.add_argument('--dense', type=int, metavar='N',
+                        help="zapisuje do N adresów w wierszu (np. {}; 0 - "
+                             "jedna para w wierszu; domyślnie układ bloku "
+                             "w pliku)".format(model.DENSE_NAMES))
+    sub = parser.add_subparsers(dest='command', metavar='POLECENIE')
+    sub.required = True
+    p = sub.add_parser('list', help="wypisuje strony z listy")
+    group = p.add_mutually_exclusive_group()
+    group.add_argument('--blocked', action='store_true',
+                       help="tylko zablokowane")
+    group.add_argument('--unblocked', action='store_true',
+                       help="tylko odblokowane")
+    for name, text in (('block', "blokuje strony (dodaje brakujące)"),
+                       ('unblock', "odblokowuje strony")):
+        p = sub.add_parser(name, help=text)
+        p.add_argument('sites', nargs='+', metavar='ADRES')
+        if name == 'block':
+            p.add_argument('--subdomains', action='store_true',
+                           help="blokuje także subdomeny ({})".format(
+                               ", ".join(model.SUBDOMAINS)))
+    p = sub.add_parser('import', help="importuje listę stron (hosts, lista "
+                                      "domen, adblock)")
+    p.add_argument('source', metavar='PLIK')
+    p.add_argument('--unblocked', action='store_true',
+                   help="importowane strony nie będą zablokowane")
+    p.add_argument('--jobs', type=int, default=1, metavar='N',
+                   help="liczba procesów dla dużych plików (0 - liczba "
+                        "procesorów; domyślnie %(default)s)")
+    p = sub.add_parser('query', help="wypisuje strony z bazy (--db) "
+                                     "z danymi o nich")
+    p.add_argument('--list', dest='source', metavar='NAZWA',
+                   help="tylko z listy (np. nazwy importowanego pliku)")
+    p.add_argument('--since', type=float, metavar='DNI',
+                   help="tylko dodane w ciągu ostatnich DNI dni")
+    p = sub.add_parser('export', help="zapisuje listę domen")
+    p.add_argument('target', nargs='?', metavar='PLIK',
+                   help="plik docelowy (domyślnie standardowe wyjście)")
+    p.add_argument('--all', action='store_true',
+                   help="także strony odblokowane")
+    p = sub.add_parser('check', help="sprawdza, czy strony są blokowane "
+                                     "(także przez domenę nadrzędną)")
+    p.add_argument('sites', nargs='+', metavar='ADRES')
+    sub.add_parser('profiles', help="wypisuje profile i liczbę stron")
+    for name, text in (('enable', "blokuje wszystkie strony profili"),
+                       ('disable', "odblokowuje wszystkie strony profili")):
+        p = sub.add_parser(name, help=text)
+        p.add_argument('profiles', nargs='+', metavar='PROFIL',
+                       help="nazwa profilu ('-' - blok główny)")
+    sub.add_parser('rewrite', help="zapisuje blok ponownie, np. w innym "
+                                   "układzie (--dense)")
+    p = sub.add_parser('schedule', help="blokuje strony w godzinach "
+                                        "z pliku harmonogramu")
+    p.add_argument('schedule', metavar='PLIK')
+    p.add_argument('--once', action='store_true',
+                   help="stosuje harmonogram raz i kończy (np. z crona)")
+    p = sub.add_parser('dns', help="serwer DNS odpowiadający na zapytania "
+                                   "o zablokowane strony (zamiast pliku hosts)")
+    p.add_argument('--listen', default="127.0.0.1", metavar='ADRES',
+                   help="adres serwera (domyślnie %(default)s)")
+    p.add_argument('--port', type=int, default=53,
+                   help="port UDP i TCP (domyślnie %(default)s)")
+    p.add_argument('--upstream', metavar='ADRES[:PORT]',
+                   help="serwer DNS dla pozostałych zapytań (bez niego są "
+                        "odrzucane)")
+    return parser
+
+
+def cmd_list(app_model: model.AppModel, args) -> int:
+    sites = app_model.sites
+    for n, site in enumerate(sites):
+        blocked: bool = bool(sites.blocked[n])
+        if args.blocked and not blocked or args.unblocked and blocked:
+            continue
+        print('+' if blocked else '-', *filter(None, site))
+    return 0
+
+
+def cmd_block(app_model: model.AppModel, args) -> int:
+    """Polecenia `block` i `unblock`."""
+    sites = app_model.sites
+    blocked: bool = args.command == 'block'
+    for inp, (site, _) in zip(args.sites,
+                              model.normalize_batch(args.sites)):
+        if site is None:
+            print(ERRMSG['invalid'].format(inp), file=sys.stderr)
+            return 2
+        if blocked and args.subdomains:
+            sites.add_subdomains(site[0])
+            for domain in sites.trie.iter_under(site[0]):
+                sites.set_blocked(sites.position(domain), True)
+            continue
+        n: int or None = sites.position(site[0])
+        if n is None:
+            n = sites.position(site[1])
+        if n is not None:
+            sites.set_blocked(n, blocked)
+        elif blocked:
+            sites.append(site, True)
+        else:
+            print(ERRMSG['missing'].format(inp), file=sys.stderr)
+            return 1
+    return write(app_model)
+
+
+def cmd_import(app_model: model.AppModel, args) -> int:
+    import importer
+    if app_model.db is not None:
+        app_model.db.source = os.path.basename(args.source)
+    report = importer.import_file(app_model, args.source,
+                                  blocked=not args.unblocked, write=False,
+                                  workers=args.jobs)
+    print(MSG['imported'].format(*report))
+    return write(app_model)
+
+
+def cmd_export(app_model: model.AppModel, args) -> int:
+    sites = app_model.sites
+    out = open(args.target, 'w') if args.target else sys.stdout
+    try:
+        for n, site in enumerate(sites):
+            if args.all or sites.blocked[n]:
+                out.write((site[0] or site[1]) + '\n')
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    return 0
+
+
+def cmd_query(app_model: model.AppModel, args) -> int:
+    """Strony z bazy - zapytania korzystają z indeksów listy i czasu
+    dodania."""
+    if app_model.db is None:
+        print(ERRMSG['nodb'], file=sys.stderr)
+        return 2
+    since: float or None = None
+    if args.since is not None:
+        since = time.time() - args.since * 86400
+    for record in app_model.db.query(app_model.head, args.source, since):
+        print(MSG['record'].format(
+            '+' if record.blocked else '-',
+            " ".join(filter(None, (record.name, record.alias))),
+            record.source or '-',
+            time.strftime('%Y-%m-%d %H:%M', time.localtime(record.added_at)),
+            record.added_by or '-', record.hits))
+    return 0
+
+
+def cmd_check(app_model: model.AppModel, args) -> int:
+    """Dla każdego adresu wypisuje pozycję listy, która go obejmuje (także
+    domenę nadrzędną blokowaną z subdomenami). Kod wyjścia 1, jeśli któryś
+    adres nie jest blokowany."""
+    sites = app_model.sites
+    status: int = 0
+    for inp in args.sites:
+        domain: str = inp.strip().lower()
+        cover: str or None = sites.covered(domain)
+        n: int or None = sites.position(cover) if cover else None
+        if n is not None and sites.blocked[n]:
+            print(MSG['covered'].format(domain, cover))
+        else:
+            print(MSG['notcovered'].format(domain))
+            status = 1
+    return status
+
+
+def cmd_schedule(app_model: model.AppModel, args) -> int:
+    """Stosuje harmonogram; bez `--once` działa do przerwania (Ctrl+C)."""
+    import scheduler
+    try:
+        with open(args.schedule) as fr:
+            schedule = scheduler.parse_schedule(fr)
+    except scheduler.ScheduleError as err:
+        print(ERRMSG['schedule'].format(err), file=sys.stderr)
+        return 2
+    runner = scheduler.Scheduler(app_model, schedule)
+    if args.once:
+        print(MSG['written'].format(*runner.step()))
+        return 0
+    try:
+        runner.run()
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+def cmd_dns(app_model: model.AppModel, args) -> int:
+    """Serwuje zablokowane strony z pamięci, do przerwania (Ctrl+C). Z bazą
+    (--db) liczby zapytań o strony są dodawane do kolumny `hits`."""
+    import dnssink
+    sinkhole = dnssink.DnsSinkhole(
+        dnssink.SinkIndex.from_store(app_model.sites), app_model.host,
+        upstream=dnssink.parse_address(args.upstream)
+        if args.upstream else None)
+    flush = None
+    if app_model.db is not None:
+        flush = functools.partial(app_model.db.add_hits, app_model.head)
+    dnssink.run(sinkhole, args.listen, args.port, flush)
+    return 0
+
+
+def cmd_profiles(app_model: model.AppModel, args) -> int:
+    """Wypisuje profile (`-` - blok główny) - jeden przebieg przez plik."""
+    models = app_model.load_profiles()
+    for profile in sorted(models, key=lambda p: p or ''):
+        sites = models[profile].sites
+        print(MSG['profile'].format(profile or '-', len(sites.selected()),
+                                    len(sites)))
+    return 0
+
+
+def cmd_enable(app_model: model.AppModel, args) -> int:
+    """Polecenia `enable` i `disable` - przełączają całe profile; plik jest
+    czytany i zapisywany jednym przebiegiem niezależnie od liczby profili.
+    Parsowane są tylko przełączane bloki, pozostałe są kopiowane bajt po
+    bajcie (`replace_blocks`).
+    """
+    names: List[str or None] = [None if name == '-' else name
+                                for name in args.profiles]
+    models = app_model.load_profiles(names)
+    selected = []
+    for name, profile in zip(args.profiles, names):
+        if profile not in models:
+            print(ERRMSG['profile'].format(name), file=sys.stderr)
+            return 1
+        models[profile].sites.set_all(args.command == 'enable')
+        selected.append(models[profile])
+    diffs = app_model.write_profiles(selected)
+    print(MSG['written'].format(*map(sum, zip(*diffs.values()))))
+    return 0
+
+
+def cmd_rewrite(app_model: model.AppModel, args) -> int:
+    return write(app_model, force=True)
+
+
+def write(app_model: model.AppModel, force: bool = False) -> int:
+    diff: model.BlockDiff = app_model.write_file(app_model.sites, atomic=True,
+                                                 force=force)
+    print(MSG['written'].format(*diff))
+    return 0
+
+
+COMMANDS = {'list': cmd_list,
+            'block': cmd_block,
+            'unblock': cmd_block,
+            'import': cmd_import,
+            'export': cmd_export,
+            'check': cmd_check,
+            'query': cmd_query,
+            'rewrite': cmd_rewrite,
+            'profiles': cmd_profiles,
+            'enable': cmd_enable,
+            'disable': cmd_enable,
+            'schedule': cmd_schedule,
+            'dns': cmd_dns}
+
+# Polecenia, które same czytają wszystkie profile (`load_profiles`).
+PROFILE_COMMANDS = frozenset(('profiles', 'enable', 'disable'))
+
+
+def main(argv: List[str] or None = None, app_name: str = "SiteBlocker",
+         fpath: str = "/etc/hosts", host: str = "127.0.0.1") -> int:
+    """Wykonuje polecenie z `argv` i zwraca kod wyjścia. Moduły używane
+    tylko przez niektóre polecenia są importowane dopiero w nich."""
+    import timing
+    startup = timing.startup
+    with startup.phase("parse args"):
+        args = create_parser(app_name, fpath).parse_args(argv)
+    try:
+        app_model = model.AppModel(app_name, args.hosts, host, args.profile)
+    except ValueError:
+        print(ERRMSG['badprofile'].format(args.profile), file=sys.stderr)
+        return 2
+    app_model.dense = args.dense
+    if not args.no_cache:
+        import parsecache
+        app_model.cache = parsecache.ParseCache(
+            parsecache.default_dir(app_name))
+    db_errors: tuple = ()
+    if args.db:
+        import sitedb  # sqlite3 tylko z bazą
+        db_errors = (sitedb.sqlite3.Error,)
+    try:
+        if args.db:
+            app_model.db = sitedb.SiteDatabase(args.db)
+        if args.command not in PROFILE_COMMANDS:
+            with startup.phase("load sites"):
+                app_model.load_sites()
+        with startup.phase(args.command):
+            return COMMANDS[args.command](app_model, args)
+    except OSError as err:
+        print(ERRMSG['oserror'].format(err), file=sys.stderr)
+        return 1
+    except db_errors as err:
+        print(ERRMSG['db'].format(err), file=sys.stderr)
+        return 1
+    finally:
+        if app_model.db is not None:
+            app_model.db.close()
+
+
+if __name__ == "__main__":
+    # execute only if run as a script
+    sys.exit(main())
@@ -1,15 +1,29 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
+import importer
 import model
-import view
-from typing import Dict, List, Tuple
+import parsecache
+import timing
+from typing import Dict, Tuple
 
 ERRMSG: Dict[str, str] = {'invalid': "Wprowadzone dane zawierają niedozwolone "
                                      "znaki lub nic nie wprowadzono",
-                          'exists': "Strona już istnieje na liście"}
+                          'exists': "Strona już istnieje na liście",
+                          'notselected': "Nie wybrano żadnej pozycji",
+                          'import': "Nie można odczytać pliku z listą stron",
+                          'conflict': "Plik hosts został zmieniony przez inny "
+                                      "program. Pozostawiono niezapisane "
+                                      "zmiany dla: {}"}
 # 'invalid':"Input contains the invalid characters or input is empty"
 # 'exists': "Site already exists on the list"
+# 'notselected': "No item selected"
+# 'import': "Cannot read the site list file"
+# 'conflict': "The hosts file was changed by another program. Unsaved changes
+#              were kept for: {}"
+MSG: Dict[str, str] = {'imported': "Zaimportowano: {}\nDuplikaty: {}\n"
+                                   "Błędne wpisy: {}"}
+# 'imported': "Imported: {}\nDuplicates: {}\nInvalid: {}"
 
 
 class AppController:
@@ -22,35 +36,137 @@ class AppController:
         self.fpath = fpath
         self.host = host
         self.model = model.AppModel(self.app_name, self.fpath, self.host)
+        self.model.cache = parsecache.ParseCache(
+            parsecache.default_dir(self.app_name))
         self.view = None
+        self.watcher = None
         self.errmsg = ERRMSG
+        self.msg = MSG
 
     def create_gui(self):
-        """Creates application GUI."""
-        self.view = view.AppView()
-        lines: List[str] = self.model.read_file()
-        sites: List[Tuple[bool, str, str]] = self.model.extract_sites(lines)
-        self.view.load_from_file(sites)
+        """Creates application GUI. Moduł `view` (a więc i tkinter) jest
+        importowany dopiero tutaj. Fazy są mierzone przez `timing`."""
+        startup = timing.startup
+        with timing.span("create_gui"):
+            with startup.phase("import view"):
+                import view
+            with startup.phase("create window"):
+                self.view = view.AppView()
+            # Liczbę pozycji zapisują fazy modelu pod `load sites`.
+            with startup.phase("load sites"):
+                self.model.load_sites()
+            with startup.phase("render list"):
+                self.view.load_from_file(self.model.sites)
         self.view.register(self)
         self.view.root.title(" ".join((self.app_name, self.version)))
+        self.watch_hosts()
+        timing.report()
         self.view.mainloop()
 
+    def watch_hosts(self) -> None:
+        """Obserwuje plik hosts (moduł `watcher`) i po każdej zmianie
+        z zewnątrz nanosi ją na listę (`on_external_change`)."""
+        import watcher
+        self.watcher = watcher.create_watcher(self.fpath)
+        self.view.watch_file(self.watcher, self.on_external_change)
+
+    def on_external_change(self) -> model.ReloadDiff or bool:
+        """Nanosi na model i widok zmiany bloku wprowadzone w pliku hosts
+        przez inny program. Ostrzega, jeśli dotyczą stron ze zmianami
+        niezapisanymi lokalnie (te zmiany zostają)."""
+        try:
+            diff: model.ReloadDiff = self.model.reload_block()
+        except OSError:
+            # Plik jest właśnie podmieniany - kolejne zdarzenie przyjdzie.
+            return False
+        if diff.added or diff.removed or diff.toggled:
+            self.view.refresh()
+        if diff.conflicts:
+            self.view.showerr(self.errmsg['conflict'].format(
+                ", ".join(diff.conflicts)))
+        return diff
+
     def add_user_input(self):  # OK
         """Pobiera adres strony podany przez użytkownika, sprawdza jego
-        poprawność, to czy jest unikatowy i dodaje go lub zwraca błąd."""
-        user_inp: str = self.view.user_input
-        all_sites: List[Tuple[str, str]] = self.view.all_sites
-        if not self.model.validate_data(user_inp):
-            self.view.showerr(self.errmsg['invalid'])
+        poprawność, to czy jest unikatowy i dodaje go lub zwraca błąd.
+        Adres jest normalizowany jak przy imporcie (`model.normalize_domain`
+        - małe litery, IDNA), więc warianty różniące się wielkością liter
+        nie są dodawane jako osobne strony."""
+        with timing.span("add_user_input", entries=len(self.model.sites)):
+            with timing.span("validate"):
+                site, _ = model.normalize_domain(self.view.user_input)
+                exists: bool = site is not None and site in self.model.sites
+            if site is None:
+                self.view.showerr(self.errmsg['invalid'])
+                return False
+            if exists:
+                self.view.showerr(self.errmsg['exists'])
+                return False
+            with timing.span("store"):
+                self.model.sites.append(site, True)
+            with timing.span("view"):
+                self.view.show_added()
+
+    def delete_selected(self):
+        """Usuwa zaznaczone strony z modelu i odświeża widżet. Zaznaczenie
+        jest trzymane w modelu. Przy aktywnym filtrze usuwane są tylko
+        zaznaczone strony widoczne na liście - ukryte przez filtr zostają."""
+        sites = self.model.filter_sites(self.view.filter_text)
+        if sites is self.model.sites:
+            sel: Tuple[int, ...] = sites.selected()
+        else:
+            sel: Tuple[int, ...] = sites.selected_positions()
+        if not sel:
+            self.view.showerr(self.errmsg['notselected'])
             return False
-        user_inp: Tuple[str, str] = self.model.complete_user_input(user_inp)
-        if user_inp in all_sites:
-            self.view.showerr(self.errmsg['exists'])
+        self.model.sites.delete(sel)
+        self.view.delete_from_listbox()
+
+    def filter_sites(self) -> int:
+        """Zawęża listę do stron pasujących do tekstu z pola wyszukiwania.
+        Pozycje są wyszukiwane w indeksie modelu, bez przeglądania wierszy
+        w widżecie. Zwraca liczbę wyświetlonych pozycji."""
+        with timing.span("filter_sites", entries=len(self.model.sites)) \
+                as span:
+            sites = self.model.filter_sites(self.view.filter_text)
+            span.set(matches=len(sites))
+            self.view.show_filtered(sites)
+        return len(sites)
+
+    def index_sites(self) -> int:
+        """Jeden krok budowy indeksu wyszukiwania (`model.SEARCH_STEP`
+        pozycji) - widok wywołuje go w tle pętli zdarzeń. Zwraca liczbę
+        pozycji, które są jeszcze poza indeksem."""
+        return self.model.sites.search_index.update(model.SEARCH_STEP)
+
+    def import_file(self, fpath: str) -> importer.ImportReport or bool:
+        """Importuje strony z pliku `fpath` do modelu (bez zapisu pliku hosts
+        - nowe strony są zaznaczone, zapisuje je dopiero `Blokuj`). Pokazuje
+        liczbę zaimportowanych, zduplikowanych i błędnych wpisów."""
+        try:
+            report = importer.import_file(self.model, fpath, write=False)
+        except OSError:
+            self.view.showerr(self.errmsg['import'])
             return False
-        self.view.add_to_listbox(True, user_inp)
+        self.view.refresh()
+        self.view.showinfo(self.msg['imported'].format(*report))
+        return report
 
-    def block_selected(self):
-        self.model.write_file(self.view.all_sites, self.view.sel_sites)
+    def block_selected(self) -> model.BlockDiff:
+        """Zapisuje zaznaczone strony do pliku hosts. Wcześniej nanosi zmiany
+        wprowadzone w pliku przez inne programy, żeby ich nie nadpisać - gdy
+        plik jest obserwowany, tylko jeśli `watcher` zgłasza zmianę (bez
+        odczytu pliku). Zwraca liczbę pozycji dodanych, usuniętych
+        i przełączonych."""
+        if self.watcher is None or self.watcher.changed():
+            self.on_external_change()
+        with timing.span("block_selected", entries=len(self.model.sites)) \
+                as span:
+            diff: model.BlockDiff = self.model.write_file(self.model.sites,
+                                                          atomic=True)
+            span.set(added=diff.added, removed=diff.removed,
+                     toggled=diff.toggled)
+        return diff
 
 
 def main():
@@ -0,0 +1,394 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""Lokalny serwer DNS (sinkhole) jako alternatywa dla bloku w /etc/hosts.
+
+glibc przegląda /etc/hosts liniowo przy każdym zapytaniu, więc duży blok
+spowalnia rozwiązywanie wszystkich nazw w systemie. Ten moduł trzyma
+zablokowane strony w słowniku w pamięci i odpowiada na zapytania DNS (UDP
+i TCP) adresem `sink`. Pozostałe zapytania przekazuje do serwera `upstream`
+tym samym protokołem, którym przyszły (odpowiedź przez TCP nie jest
+obcinana do rozmiaru pakietu UDP), albo, jeśli go nie podano, odrzuca
+(REFUSED). Zapytania inne niż standardowe (opcode różny od 0) dostają
+NOTIMP. Liczby zapytań o zablokowane
+pozycje (`DnsSinkhole.hits`) można co jakiś czas zapisywać, np. w bazie
+(`sitedb.SiteDatabase.add_hits`) - zob. `run`.
+
+    python3 KATALOG_PROGRAMU dns [--listen ADRES] [--port PORT]
+                                 [--upstream ADRES[:PORT]]
+
+Moduł korzysta tylko z biblioteki standardowej (asyncio, socket, struct).
+"""
+
+from typing import Callable, Dict, Iterable, Tuple
+import asyncio
+import socket
+import struct
+
+HEADER = struct.Struct("!HHHHHH")
+# Typy rekordów i kody odpowiedzi (RFC 1035, RFC 3596).
+QTYPE_A: int = 1
+QTYPE_AAAA: int = 28
+QCLASS_IN: int = 1
+RCODE_OK: int = 0
+RCODE_FORMERR: int = 1
+RCODE_SERVFAIL: int = 2
+RCODE_NOTIMP: int = 4
+RCODE_REFUSED: int = 5
+TTL: int = 60
+# Co ile sekund `run` przekazuje zebrane liczby zapytań (`flush`).
+FLUSH_SECONDS: float = 60.0
+# Bity opcode w nagłówku (0 - standardowe zapytanie).
+OPCODE_MASK: int = 0x7800
+# Rekord odpowiedzi: wskaźnik na nazwę z pytania, typ, klasa, TTL, długość.
+ANSWER = struct.Struct("!HHHIH")
+NAME_POINTER: int = 0xC00C
+
+
+class DnsError(ValueError):
+    """Niepoprawny pakiet DNS."""
+
+
+class DnsNotImplemented(DnsError):
+    """Zapytanie z opcode innym niż standardowe (np. NOTIFY, UPDATE)."""
+
+
+class Query:
+    """Pytanie z pakietu DNS: identyfikator, flagi, nazwa (małymi literami,
+    bez kropki na końcu), typ i pakiet do końca sekcji pytań."""
+    __slots__ = ('ident', 'flags', 'name', 'qtype', 'question')
+
+    def __init__(self, ident: int, flags: int, name: str, qtype: int,
+                 question: bytes) -> None:
+        self.ident = ident
+        self.flags = flags
+        self.name = name
+        self.qtype = qtype
+        self.question = question
+
+
+def parse_query(data: bytes) -> Query:
+    """Odczytuje pierwsze pytanie z pakietu. Podnosi `DnsError`, jeśli
+    pakiet jest uszkodzony albo nie jest zapytaniem, a `DnsNotImplemented`
+    dla opcode innego niż 0."""
+    if len(data) < HEADER.size:
+        raise DnsError("short packet")
+    ident, flags, qdcount = HEADER.unpack_from(data)[:3]
+    if flags & 0x8000:
+        raise DnsError("not a query")
+    if flags & OPCODE_MASK:
+        raise DnsNotImplemented("opcode {}".format(flags >> 11 & 0xF))
+    if qdcount < 1:
+        raise DnsError("not a query")
+    labels = []
+    pos: int = HEADER.size
+    while True:
+        if pos >= len(data):
+            raise DnsError("truncated name")
+        length: int = data[pos]
+        pos += 1
+        if not length:
+            break
+        if length & 0xC0 or pos + length > len(data):
+            raise DnsError("bad label")
+        labels.append(data[pos:pos + length])
+        pos += length
+    if pos + 4 > len(data):
+        raise DnsError("truncated question")
+    qtype, qclass = struct.unpack_from("!HH", data, pos)
+    name: str = b'.'.join(labels).decode('ascii', 'replace').lower()
+    return Query(ident, flags, name, qtype, data[HEADER.size:pos + 4])
+
+
+def build_query(name: str, qtype: int = QTYPE_A, ident: int = 0) -> bytes:
+    """Buduje pakiet zapytania o `name` (flaga RD) - dla testów i benchmarku.
+    """
+    qname = b''.join(bytes((len(label),)) + label
+                     for label in name.encode('ascii').split(b'.') if label)
+    return (HEADER.pack(ident, 0x0100, 1, 0, 0, 0) + qname + b'\0' +
+            struct.pack("!HH", qtype, QCLASS_IN))
+
+
+def build_response(query: Query, rcode: int = RCODE_OK,
+                   rdata: bytes or None = None) -> bytes:
+    """Buduje odpowiedź na `query` z kodem `rcode` i co najwyżej jednym
+    rekordem (`rdata` - adres w postaci binarnej)."""
+    # QR, AA, RA oraz opcode i RD przepisane z zapytania.
+    flags: int = 0x8480 | query.flags & 0x7900 | rcode
+    ancount: int = 1 if rdata is not None else 0
+    packet = HEADER.pack(query.ident, flags, 1, ancount, 0, 0) + query.question
+    if rdata is not None:
+        packet += ANSWER.pack(NAME_POINTER, query.qtype, QCLASS_IN, TTL,
+                              len(rdata)) + rdata
+    return packet
+
+
+def error_response(data: bytes, rcode: int) -> bytes or None:
+    """Odpowiedź z samym nagłówkiem, gdy pakietu nie udało się odczytać
+    albo obsłużyć."""
+    if len(data) < 2:
+        return None
+    flags: int = 0x8080 | rcode
+    if len(data) >= 4:
+        # Opcode i RD przepisane z zapytania.
+        flags |= struct.unpack_from("!H", data, 2)[0] & 0x7900
+    return HEADER.pack(struct.unpack_from("!H", data)[0], flags, 0, 0, 0, 0)
+
+
+class SinkIndex:
+    """Słownik zablokowanych nazw w pamięci: {nazwa: pozycja listy (klucz
+    `model.SiteStore`)}. Domeny blokowane razem z subdomenami
+    (`model.DomainTrie`) są trzymane osobno i sprawdzane dla kolejnych domen
+    nadrzędnych nazwy - koszt zależy od liczby etykiet, nie od liczby
+    stron."""
+    __slots__ = ('names', 'wildcards')
+
+    def __init__(self, names: Dict[str, str] or Iterable[str] = (),
+                 wildcards: Iterable[str] = ()) -> None:
+        self.names: Dict[str, str] = dict(names) \
+            if isinstance(names, dict) else {name: name for name in names}
+        self.wildcards = frozenset(wildcards)
+
+    @classmethod
+    def from_store(cls, store) -> 'SinkIndex':
+        """Buduje indeks z zablokowanych pozycji `model.SiteStore`."""
+        names: Dict[str, str] = {}
+        for n in store.selected():
+            key: str = store.names[n]
+            for name in filter(None, store[n]):
+                names[name] = key
+        trie = store.trie
+        wildcards = [name for name in names if trie.is_wildcard(name)]
+        return cls(names, wildcards)
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def __contains__(self, name: str) -> bool:
+        return self.match(name) is not None
+
+    def match(self, name: str) -> str or None:
+        """Pozycja listy, która blokuje `name` (wprost albo przez domenę
+        nadrzędną), albo None."""
+        key: str or None = self.names.get(name)
+        if key is not None:
+            return key
+        if self.wildcards:
+            pos: int = name.find('.')
+            while pos >= 0:
+                if name[pos + 1:] in self.wildcards:
+                    return self.names[name[pos + 1:]]
+                pos = name.find('.', pos + 1)
+        return None
+
+
+class DnsSinkhole:
+    """Odpowiada na zapytania: zablokowane nazwy dostają adres `sink`
+    (rekord A) lub `sink6` (AAAA), a dla innych typów pustą odpowiedź.
+    Pozostałe zapytania są przekazywane do `upstream` (adres, port) albo
+    odrzucane. Zapytania o zablokowane nazwy są liczone w `hits` ({pozycja
+    listy: liczba zapytań}, zob. `take_hits`).
+    """
+
+    def __init__(self, index: SinkIndex, sink: str = "0.0.0.0",
+                 sink6: str = "::", upstream: Tuple[str, int] or None = None,
+                 timeout: float = 2.0) -> None:
+        self.index = index
+        self.rdata: Dict[int, bytes] = {
+            QTYPE_A: socket.inet_pton(socket.AF_INET, sink),
+            QTYPE_AAAA: socket.inet_pton(socket.AF_INET6, sink6)}
+        self.upstream = upstream
+        self.timeout = timeout
+        self.hits: Dict[str, int] = {}
+
+    def take_hits(self) -> Dict[str, int]:
+        """Zwraca liczby zapytań zebrane od poprzedniego wywołania."""
+        hits, self.hits = self.hits, {}
+        return hits
+
+    def respond(self, data: bytes) -> bytes or None:
+        """Odpowiedź, którą da się udzielić bez sieci; None, jeśli zapytanie
+        trzeba przekazać do `upstream`."""
+        try:
+            query: Query = parse_query(data)
+        except DnsNotImplemented:
+            return error_response(data, RCODE_NOTIMP)
+        except DnsError:
+            return error_response(data, RCODE_FORMERR)
+        key: str or None = self.index.match(query.name)
+        if key is not None:
+            self.hits[key] = self.hits.get(key, 0) + 1
+            return build_response(query, rdata=self.rdata.get(query.qtype))
+        if self.upstream is None:
+            return build_response(query, RCODE_REFUSED)
+        return None
+
+    async def forward(self, data: bytes) -> bytes:
+        """Przekazuje zapytanie do `upstream` przez UDP. Jeśli nie odpowie
+        w czasie `timeout`, zwraca SERVFAIL. Zob. też `forward_tcp`."""
+        loop = asyncio.get_event_loop()
+        waiter = loop.create_future()
+        transport, _ = await loop.create_datagram_endpoint(
+            lambda: _UpstreamProtocol(waiter), remote_addr=self.upstream)
+        try:
+            transport.sendto(data)
+            return await asyncio.wait_for(waiter, self.timeout)
+        except (asyncio.TimeoutError, OSError):
+            return error_response(data, RCODE_SERVFAIL)
+        finally:
+            transport.close()
+
+    async def forward_tcp(self, data: bytes) -> bytes:
+        """Jak `forward`, ale przez TCP (pakiety poprzedzone długością) - dla
+        zapytań, które przyszły przez TCP, bo odpowiedź może nie zmieścić się
+        w pakiecie UDP."""
+        writer = None
+
+        async def exchange() -> bytes:
+            nonlocal writer
+            reader, writer = await asyncio.open_connection(*self.upstream)
+            writer.write(struct.pack("!H", len(data)) + data)
+            length, = struct.unpack("!H", await reader.readexactly(2))
+            return await reader.readexactly(length)
+        try:
+            return await asyncio.wait_for(exchange(), self.timeout)
+        except (asyncio.TimeoutError, asyncio.IncompleteReadError, OSError):
+            return error_response(data, RCODE_SERVFAIL)
+        finally:
+            if writer is not None:
+                writer.close()
+
+    async def resolve(self, data: bytes, tcp: bool = False) -> bytes or None:
+        """Odpowiedź na zapytanie - z `respond` albo od `upstream` (przez
+        TCP, jeśli `tcp`)."""
+        response = self.respond(data)
+        if response is None:
+            response = await (self.forward_tcp(data) if tcp else
+                              self.forward(data))
+        return response
+
+
+class _UpstreamProtocol(asyncio.DatagramProtocol):
+
+    def __init__(self, waiter: asyncio.Future) -> None:
+        self.waiter = waiter
+
+    def datagram_received(self, data: bytes, addr) -> None:
+        if not self.waiter.done():
+            self.waiter.set_result(data)
+
+    def error_received(self, exc: Exception) -> None:
+        if not self.waiter.done():
+            self.waiter.set_exception(exc)
+
+
+class UdpProtocol(asyncio.DatagramProtocol):
+    """Serwer UDP - zablokowane nazwy obsługuje od razu, bez tworzenia
+    zadania asyncio."""
+
+    def __init__(self, sinkhole: DnsSinkhole) -> None:
+        self.sinkhole = sinkhole
+        self.transport = None
+        # Zadania przekazujące zapytania - pętla zdarzeń trzyma tylko słabe
+        # odwołania, więc bez tego zadanie mogłoby zostać usunięte w trakcie.
+        self.pending: set = set()
+
+    def connection_made(self, transport) -> None:
+        self.transport = transport
+
+    def datagram_received(self, data: bytes, addr) -> None:
+        response = self.sinkhole.respond(data)
+        if response is None:
+            task = asyncio.ensure_future(self.reply(data, addr))
+            self.pending.add(task)
+            task.add_done_callback(self.pending.discard)
+        else:
+            self.transport.sendto(response, addr)
+
+    async def reply(self, data: bytes, addr) -> None:
+        response = await self.sinkhole.forward(data)
+        if response is not None and not self.transport.is_closing():
+            self.transport.sendto(response, addr)
+
+
+async def handle_tcp(sinkhole: DnsSinkhole, reader: asyncio.StreamReader,
+                     writer: asyncio.StreamWriter) -> None:
+    """Obsługuje połączenie TCP: pakiety poprzedzone długością (2 bajty)."""
+    try:
+        while True:
+            length, = struct.unpack("!H", await reader.readexactly(2))
+            response = await sinkhole.resolve(await reader.readexactly(length),
+                                              tcp=True)
+            if response is None:
+                break
+            writer.write(struct.pack("!H", len(response)) + response)
+            await writer.drain()
+    except (asyncio.IncompleteReadError, ConnectionError):
+        pass
+    finally:
+        writer.close()
+
+
+async def serve(sinkhole: DnsSinkhole, host: str = "127.0.0.1",
+                port: int = 53):
+    """Uruchamia serwer UDP i TCP na tym samym adresie. Zwraca parę
+    (transport UDP, serwer TCP) - port 0 oznacza dowolny wolny port, ten
+    sam dla obu (odczytany z gniazda UDP)."""
+    loop = asyncio.get_event_loop()
+    transport, _ = await loop.create_datagram_endpoint(
+        lambda: UdpProtocol(sinkhole), local_addr=(host, port))
+    port = transport.get_extra_info('sockname')[1]
+    server = await asyncio.start_server(
+        lambda r, w: handle_tcp(sinkhole, r, w), host, port)
+    return transport, server
+
+
+def parse_address(address: str, port: int = 53) -> Tuple[str, int]:
+    """'1.1.1.1' -> ('1.1.1.1', 53), '1.1.1.1:5353' -> ('1.1.1.1', 5353)."""
+    host, sep, num = address.rpartition(':')
+    if sep and '.' in host:
+        return host, int(num)
+    return address, port
+
+
+def run(sinkhole: DnsSinkhole, host: str = "127.0.0.1", port: int = 53,
+        flush: Callable[[Dict[str, int]], None] or None = None,
+        interval: float = FLUSH_SECONDS) -> None:
+    """Uruchamia serwer i obsługuje zapytania do przerwania (Ctrl+C).
+    flush -- wywoływana co `interval` sekund i przy zakończeniu z liczbami
+             zapytań zebranymi od poprzedniego wywołania (`take_hits`)
+    """
+    loop = asyncio.get_event_loop()
+    transport, server = loop.run_until_complete(serve(sinkhole, host, port))
+    timer = None
+
+    def save_hits() -> None:
+        nonlocal timer
+        hits: Dict[str, int] = sinkhole.take_hits()
+        if hits:
+            flush(hits)
+        timer = loop.call_later(interval, save_hits)
+    if flush is not None:
+        timer = loop.call_later(interval, save_hits)
+    try:
+        loop.run_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if timer is not None:
+            timer.cancel()
+            hits = sinkhole.take_hits()
+            if hits:
+                flush(hits)
+        transport.close()
+        server.close()
+        loop.run_until_complete(server.wait_closed())
+
+
+def main():
+    run(DnsSinkhole(SinkIndex(["example.com"])), port=5353)
+
+
+if __name__ == "__main__":
+    # execute only if run as a script
+    main()
@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""Import stron z list blokowanych domen. Obsługiwane formaty (także
+wymieszane w jednym pliku):
+- plik hosts: `0.0.0.0 example.com www.example.com`
+- lista domen: `example.com`
+- lista adblock: `||example.com^`
+Plik jest czytany wiersz po wierszu, więc zużycie pamięci nie zależy od jego
+rozmiaru, a jedynie od liczby nowych stron (powtórzenia adresów są
+zapamiętywane najwyżej dla `model.NORMALIZE_CACHE` adresów naraz, zob.
+`model.normalize_batch`).
+
+Bardzo duże listy (setki MB) można importować równolegle (`workers` > 1):
+plik jest mapowany do pamięci (mmap) i dzielony na fragmenty na granicach
+wierszy, które procesy potomne rozpoznają, sprawdzają i porównują z listą
+sprzed importu niezależnie. Wyniki są łączone w kolejności fragmentów, więc
+lista i `ImportReport` są takie same jak przy imporcie w jednym procesie.
+Każdy proces trzyma wtedy w pamięci cały odkodowany fragment - około
+rozmiaru pliku / (`workers` * `CHUNKS_PER_WORKER`).
+"""
+
+from typing import Iterable, Iterator, List, NamedTuple, Tuple
+import os
+import re
+
+import model
+
+ADBLOCK_PATT = re.compile(r"\|\|([^\^/$|*]+)\^(?:\$.*)?$")
+# Mniejsze pliki są importowane w jednym procesie - uruchomienie procesów
+# kosztuje więcej niż samo rozpoznanie wierszy.
+PARALLEL_MIN: int = 4 * 1024 * 1024
+# Fragmentów jest kilka razy więcej niż procesów, żeby wolniejszy fragment
+# nie wstrzymywał pozostałych.
+CHUNKS_PER_WORKER: int = 4
+# Adresy lokalne, które występują w każdym pliku hosts, a nie są stronami.
+IGNORED = frozenset(("localhost", "localhost.localdomain", "local",
+                     "broadcasthost", "ip6-localhost", "ip6-loopback",
+                     "ip6-localnet", "ip6-mcastprefix", "ip6-allnodes",
+                     "ip6-allrouters", "ip6-allhosts", "0.0.0.0"))
+# W procesie potomnym importu równoległego: lista sprzed importu
+# (`init_worker`).
+existing: model.SiteStore = model.SiteStore()
+
+
+class ImportReport(NamedTuple):
+    """Liczba stron zaimportowanych, pominiętych jako duplikaty i błędnych."""
+    imported: int
+    duplicate: int
+    invalid: int
+
+
+def iter_domains(lines: Iterable[str]) -> Iterator[str or None]:
+    """Generator - z wierszy listy zwraca kolejne adresy stron (małymi
+    literami). Za wiersz, którego nie udało się rozpoznać, zwraca None.
+    Komentarze (`#`, `!`), nagłówki `[Adblock ...]` i puste wiersze pomija.
+    """
+    for line in lines:
+        line = line.strip()
+        if not line or line[0] in '#![':
+            continue
+        if line.startswith('||'):
+            m = ADBLOCK_PATT.match(line)
+            yield m.group(1).lower() if m else None
+            continue
+        line = line.split('#', 1)[0]
+        fields = line.split()
+        if len(fields) > 1:
+            # Format hosts - pierwsze pole to adres IP, dalej nazwy stron.
+            fields = fields[1:]
+        for domain in fields:
+            domain = domain.lower()
+            if domain not in IGNORED:
+                yield domain
+
+
+def import_lines(app_model, lines: Iterable[str],
+                 blocked: bool = True) -> ImportReport:
+    """Normalizuje adresy z `lines` (`model.normalize_batch` - także adresy
+    spoza ASCII jako punycode), pomija te, które już są na liście lub są
+    objęte blokadą domeny nadrzędnej razem z subdomenami
+    (`SiteStore.covered`), a nowe dodaje do `app_model.sites`. Nie zapisuje
+    pliku hosts. Zwraca `ImportReport`.
+    app_model -- `model.AppModel`
+    blocked -- czy dodane strony mają być zaznaczone do zablokowania
+    """
+    sites = app_model.sites
+    imported: int = 0
+    duplicate: int = 0
+    invalid: int = 0
+    for site, _ in model.normalize_batch(
+            domain or "" for domain in iter_domains(lines)):
+        if site is None:
+            invalid += 1
+            continue
+        if site in sites or sites.covered(site[0]):
+            duplicate += 1
+            continue
+        sites.append(site, blocked)
+        imported += 1
+    return ImportReport(imported, duplicate, invalid)
+
+
+def split_chunks(fpath: str, parts: int) -> List[Tuple[int, int]]:
+    """Dzieli plik na najwyżej `parts` zakresów bajtów [początek, koniec),
+    każdy kończący się na końcu wiersza. Granice są szukane przez mmap, bez
+    czytania całego pliku."""
+    import mmap  # tylko przy imporcie równoległym
+    size: int = os.path.getsize(fpath)
+    if not size:
+        return []
+    bounds: List[int] = [0]
+    with open(fpath, 'rb') as fr, \
+            mmap.mmap(fr.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        for k in range(1, parts):
+            pos: int = max(size * k // parts, bounds[-1])
+            end: int = mm.find(b'\n', pos)
+            if end == -1:
+                break
+            if end + 1 > bounds[-1]:
+                bounds.append(end + 1)
+    if bounds[-1] != size:
+        bounds.append(size)
+    return list(zip(bounds, bounds[1:]))
+
+
+def init_worker(parts: tuple) -> None:
+    """W procesie potomnym: odtwarza listę sprzed importu z
+    `SiteStore.to_parts` (przesyłaną raz na proces, nie z każdym
+    fragmentem)."""
+    global existing
+    existing = model.SiteStore.from_parts(parts)
+
+
+def parse_chunk(task: Tuple[str, int, int, str]) -> \
+        Tuple[List[Tuple[str, str]], int, int]:
+    """W procesie potomnym: rozpoznaje i sprawdza adresy z zakresu bajtów
+    pliku i pomija te, które są już na liście sprzed importu lub są objęte
+    blokadą domeny nadrzędnej (`existing`, zob. `import_lines`). Zwraca
+    (nowe pary adresów w kolejności, liczba błędnych, liczba duplikatów -
+    powtórzeń w obrębie fragmentu i stron z listy).
+    task -- (plik, początek, koniec, kodowanie)
+    """
+    import mmap
+    fpath, start, end, encoding = task
+    with open(fpath, 'rb') as fr, \
+            mmap.mmap(fr.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        text: str = mm[start:end].decode(encoding, errors='replace')
+    # Jak w trybie tekstowym `open`: \r\n i \r to także końce wierszy.
+    lines = text.replace('\r\n', '\n').replace('\r', '\n').split('\n')
+    sites: List[Tuple[str, str]] = []
+    seen = set()
+    invalid: int = 0
+    duplicate: int = 0
+    for site, _ in model.normalize_batch(
+            domain or "" for domain in iter_domains(lines)):
+        if site is None:
+            invalid += 1
+            continue
+        if site in seen or site in existing or existing.covered(site[0]):
+            duplicate += 1
+            continue
+        seen.add(site)
+        sites.append(site)
+    return sites, invalid, duplicate
+
+
+def import_parallel(app_model, fpath: str, blocked: bool = True,
+                    workers: int or None = None) -> ImportReport:
+    """Jak `import_lines` dla pliku `fpath`, ale wiersze są rozpoznawane,
+    sprawdzane i porównywane z listą sprzed importu w `workers` procesach
+    (None - liczba procesorów). W tym procesie są tylko dodawane do listy
+    w kolejności fragmentów pliku - z pominięciem powtórzeń z wcześniejszych
+    fragmentów (sprawdzanych w indeksie listy, `SiteStore.index`)."""
+    import locale
+    import multiprocessing  # tylko przy imporcie równoległym
+    workers = workers or os.cpu_count() or 1
+    encoding: str = locale.getpreferredencoding(False)
+    tasks = [(fpath, start, end, encoding) for start, end
+             in split_chunks(fpath, workers * CHUNKS_PER_WORKER)]
+    sites = app_model.sites
+    imported: int = 0
+    duplicate: int = 0
+    invalid: int = 0
+    # `Pool` zamiast `ProcessPoolExecutor` - ten ma `initializer` dopiero
+    # od Pythona 3.7.
+    with multiprocessing.Pool(workers, init_worker,
+                              (sites.to_parts(),)) as pool:
+        for chunk, bad, repeated in pool.imap(parse_chunk, tasks):
+            invalid += bad
+            duplicate += repeated
+            for site in chunk:
+                # Strony z listy sprzed importu pominęły już procesy
+                # potomne - zostają powtórzenia z innych fragmentów.
+                if site in sites:
+                    duplicate += 1
+                    continue
+                sites.append(site, blocked)
+                imported += 1
+    return ImportReport(imported, duplicate, invalid)
+
+
+def import_file(app_model, fpath: str, blocked: bool = True,
+                write: bool = True, workers: int = 1) -> ImportReport:
+    """Importuje strony z pliku `fpath` (zob. `import_lines`), a następnie,
+    jeśli cokolwiek dodano i `write` jest True, zapisuje plik hosts jednym
+    wywołaniem `write_file`. Zwraca `ImportReport`.
+    workers -- liczba procesów (0 - liczba procesorów); pliki mniejsze niż
+               `PARALLEL_MIN` są zawsze importowane w jednym procesie
+    """
+    if workers != 1 and os.path.getsize(fpath) >= PARALLEL_MIN:
+        report: ImportReport = import_parallel(app_model, fpath, blocked,
+                                               workers or None)
+    else:
+        with open(fpath, 'r', errors='replace') as fr:
+            report: ImportReport = import_lines(app_model, fr, blocked)
+    if write and report.imported:
+        app_model.write_file(app_model.sites, atomic=True)
+    return report
+
+
+def main():
+    ImportReport(0, 0, 0)
+
+
+if __name__ == "__main__":
+    # execute only if run as a script
+    main()
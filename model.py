@@ -2,39 +2,1120 @@
 # -*- coding: utf-8 -*-
 
 
-from typing import List, Tuple
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Tuple
+import bisect
+import functools
+import hashlib
+import itertools
+import mmap
+import os
+import parsecache
 import re
+import stat
+import timing
+
+# Wzorzec wiersza z pliku hosts kompilowany raz, przy imporcie modułu.
+SITE_PATT = re.compile(r"""(\s*\#*\s*)
+                           (\d{3}.\d{1}.\d{1}.\d{1})
+                           (\s+)
+                           ([\w\.\-]+)
+                           (\s*)
+                           ([\w\.\-]*)""", re.VERBOSE)
+# Adres wprowadzony przez użytkownika (`validate_data`,
+# `complete_user_input`).
+START_PATT = re.compile(r"[a-zA-Z]")
+CHARS_PATT = re.compile(r"^[\w.-]+$")
+WWW_PATT = re.compile(r"^www\.")
+# Adres po normalizacji (`normalize_domain`) - tylko ASCII, małe litery.
+NAME_PATT = re.compile(r"^[a-z][a-z0-9_.-]*$")
+LONG_LABEL_PATT = re.compile(r"[^.]{64}")
+# Separatory etykiet w adresach IDNA (jak w kodeku `idna`).
+IDNA_DOTS = re.compile("[\u002e\u3002\uff0e\uff61]")
+MAX_NAME: int = 253
+# Liczba zapamiętanych wyników `normalize_domain` i `idna_label` -
+# powtórzenia (np. ten sam adres wpisany kilka razy) nie są sprawdzane
+# ponownie.
+NORMALIZE_CACHE: int = 1 << 16
+# Powody odrzucenia adresu przez `normalize_domain`.
+REJECT_EMPTY: str = 'empty'    # pusty adres
+REJECT_START: str = 'start'    # nie zaczyna się od litery
+REJECT_CHARS: str = 'chars'    # niedozwolone znaki
+REJECT_IDNA: str = 'idna'      # nie da się zapisać jako punycode (IDNA)
+REJECT_LENGTH: str = 'length'  # za długi adres lub etykieta
+# Nazwa profilu - osobnego bloku `# BEGIN SiteBlocker:<profil>`.
+PROFILE_PATT = re.compile(r"^[\w-]+$")
+# Domyślna liczba adresów w wierszu w układzie zwartym (`AppModel.dense`).
+DENSE_NAMES: int = 8
+# Długość n-gramów indeksu wyszukiwania (`SiteIndex`) - krótsze zapytania
+# są szukane jako początek adresu.
+NGRAM: int = 3
+# Liczba pozycji dodawanych do indeksu wyszukiwania w jednym kroku
+# (`SiteIndex.update`) - krok mieści się w czasie klatki, więc GUI buduje
+# indeks w tle pętli zdarzeń.
+SEARCH_STEP: int = 1000
+
+
+class BlockDiff(NamedTuple):
+    """Liczba pozycji dodanych, usuniętych i przełączonych (zablokowana /
+    odblokowana) przez `AppModel.write_file`."""
+    added: int
+    removed: int
+    toggled: int
+
+
+class ReloadDiff(NamedTuple):
+    """Zmiany wprowadzone do listy przez `AppModel.reload_block` i adresy
+    pozycji zmienionych jednocześnie w pliku i lokalnie (`conflicts`)."""
+    added: int
+    removed: int
+    toggled: int
+    conflicts: Tuple[str, ...]
+
+
+@functools.lru_cache(maxsize=NORMALIZE_CACHE)
+def idna_label(label: str) -> str:
+    """Etykieta adresu jako ASCII (punycode) - kodowanie IDNA jest kosztowne,
+    a etykiety (np. domena nadrzędna) powtarzają się w wielu adresach."""
+    return label.encode('idna').decode('ascii') if label else label
+
+
+def _normalize(inp: str) -> Tuple[Tuple[str, str] or None, str or None]:
+    """Normalizuje adres: usuwa białe znaki i kropkę na końcu, zamienia na
+    małe litery, adres spoza ASCII zapisuje jako punycode (kodek `idna`)
+    i tworzy parę (adres.com, www.adres.com) jak `complete_user_input`.
+    Zwraca (para, None) albo (None, powód odrzucenia).
+    """
+    name: str = inp.strip().lower().rstrip('.')
+    if not name:
+        return None, REJECT_EMPTY
+    if not NAME_PATT.match(name):
+        try:
+            name.encode('ascii')
+        except UnicodeEncodeError:
+            try:
+                name = '.'.join(map(idna_label, IDNA_DOTS.split(name)))
+            except UnicodeError:
+                return None, REJECT_IDNA
+        if not START_PATT.match(name):
+            return None, REJECT_START
+        if not NAME_PATT.match(name):
+            return None, REJECT_CHARS
+    if len(name) > MAX_NAME or LONG_LABEL_PATT.search(name):
+        return None, REJECT_LENGTH
+    if name.startswith('www.'):
+        return (name[4:], name), None
+    return (name, 'www.' + name), None
+
+
+# `_normalize` z zapamiętywaniem wyników (`NORMALIZE_CACHE`) - dla
+# pojedynczych adresów; listy sprawdza `normalize_batch`.
+normalize_domain = functools.lru_cache(maxsize=NORMALIZE_CACHE)(_normalize)
+
+
+def normalize_batch(inputs: Iterable[str], limit: int = NORMALIZE_CACHE) \
+        -> Iterator[Tuple[Tuple[str, str] or None, str or None]]:
+    """Generator - wynik `normalize_domain` dla każdego z `inputs` (np.
+    wierszy importowanej listy), w tej samej kolejności. Powtórzenia
+    w obrębie wsadu są rozpoznawane słownikiem, bez ponownego sprawdzania
+    i bez `lru_cache`, który przy dużych listach tylko wymienia wpisy.
+    Słownik jest czyszczony po `limit` adresach, więc zużycie pamięci nie
+    zależy od długości `inputs`.
+    """
+    seen: Dict[str, Tuple[Tuple[str, str] or None, str or None]] = {}
+    get = seen.get
+    for raw in inputs:
+        result = get(raw)
+        if result is None:
+            if len(seen) >= limit:
+                seen.clear()
+            result = seen[raw] = _normalize(raw)
+        yield result
+
+
+# Znaczniki w `SiteStore.flags` - które adresy pary są zapisane.
+HAS_BARE: int = 1   # adres.com
+HAS_WWW: int = 2    # www.adres.com
+HAS_ALIAS: int = 4  # drugi adres nie jest wariantem `www.` (w `aliases`)
+# Bity ustawione w każdym bajcie - tablica do szybkiej iteracji po bitach.
+BYTE_BITS: List[Tuple[int, ...]] = [tuple(b >> i & 1 for i in range(8))
+                                    for b in range(256)]
+NONZERO_BYTE = re.compile(rb"[^\x00]")
+NONFULL_BYTE = re.compile(rb"[^\xff]")
+
+
+class BitArray:
+    """ Tablica bitów (jeden bit na pozycję) o interfejsie zbliżonym do
+    `bytearray`: indeksowanie, przypisanie, `append`, `find` i iteracja.
+    """
+    __slots__ = ('bits', 'size')
+
+    def __init__(self, size: int = 0):
+        self.bits: bytearray = bytearray((size + 7) >> 3)
+        self.size: int = size
+
+    @classmethod
+    def from_iterable(cls, values: Iterable[int]) -> 'BitArray':
+        array = cls()
+        for value in values:
+            array.append(value)
+        return array
+
+    def __len__(self) -> int:
+        return self.size
+
+    def fill(self, value: int) -> None:
+        """Ustawia wszystkie bity na `value`."""
+        self.bits[:] = (b'\xff' if value else b'\0') * len(self.bits)
+        if value and self.size & 7:
+            self.bits[-1] = (1 << (self.size & 7)) - 1
+
+    def __getitem__(self, n: int) -> int:
+        if n < 0:
+            n += self.size
+        if not 0 <= n < self.size:
+            raise IndexError("BitArray index out of range")
+        return self.bits[n >> 3] >> (n & 7) & 1
+
+    def __setitem__(self, n: int, value: int) -> None:
+        if n < 0:
+            n += self.size
+        if not 0 <= n < self.size:
+            raise IndexError("BitArray index out of range")
+        if value:
+            self.bits[n >> 3] |= 1 << (n & 7)
+        else:
+            self.bits[n >> 3] &= ~(1 << (n & 7)) & 0xff
+
+    def __iter__(self) -> Iterator[int]:
+        bits = itertools.chain.from_iterable(map(BYTE_BITS.__getitem__,
+                                                 self.bits))
+        return itertools.islice(bits, self.size)
+
+    def __eq__(self, other) -> bool:
+        return (isinstance(other, BitArray) and self.size == other.size
+                and self.bits == other.bits)
+
+    def append(self, value: int) -> None:
+        if not self.size & 7:
+            self.bits.append(0)
+        self.size += 1
+        if value:
+            self[self.size - 1] = 1
+
+    def find(self, value: int, start: int = 0, end: int or None = None) -> int:
+        """Zwraca indeks pierwszego bitu równego `value` w przedziale
+        [`start`, `end`) albo -1. Całe bajty bez szukanego bitu są pomijane
+        przez wyrażenie regularne, a nie bit po bicie.
+        """
+        end = self.size if end is None else min(end, self.size)
+        n: int = max(start, 0)
+        while n < end and n & 7:
+            if self[n] == value:
+                return n
+            n += 1
+        if n >= end:
+            return -1
+        patt = NONZERO_BYTE if value else NONFULL_BYTE
+        m = patt.search(self.bits, n >> 3, (end + 7) >> 3)
+        if m is None:
+            return -1
+        byte: int = self.bits[m.start()]
+        if not value:
+            byte = ~byte & 0xff
+        n = (m.start() << 3) + (byte & -byte).bit_length() - 1
+        return n if n < end else -1
+
+
+def to_bitmap(size: int, indices: Iterable[int]) -> BitArray:
+    """Zamienia indeksy zaznaczonych pozycji (np. krotkę z `curselection()`)
+    na tablicę bitów o długości `size`: 1 - zaznaczona, 0 - nie.
+    """
+    bitmap = BitArray(size)
+    for n in indices:
+        bitmap[n] = 1
+    return bitmap
+
+
+# Subdomeny blokowane razem z domeną przez `SiteStore.add_subdomains`
+# (`www.` jest zawsze częścią pary adresów).
+SUBDOMAINS: Tuple[str, ...] = ("m", "mobile", "api", "cdn", "static", "login")
+# Klucz węzła `DomainTrie` przechowujący znaczniki - nie koliduje z etykietą.
+TRIE_END = None
+TRIE_ENTRY: int = 1     # domena jest na liście
+TRIE_WILDCARD: int = 2  # domena jest blokowana razem z subdomenami
+
+
+class DomainTrie:
+    """ Drzewo domen czytanych od końca etykietami (com -> example -> www).
+    Pozwala szybko sprawdzić, czy domena jest objęta blokadą domeny
+    nadrzędnej (`covered_by`) i czy cokolwiek pod daną domeną jest już na
+    liście (`has_under`). Węzły to słowniki {etykieta: węzeł}, znaczniki są
+    pod kluczem `TRIE_END`.
+    """
+    __slots__ = ('root',)
+
+    def __init__(self, domains: Iterable[str] = ()):
+        self.root: dict = {}
+        for domain in domains:
+            self.add(domain)
+
+    def _node(self, domain: str) -> dict or None:
+        node: dict or None = self.root
+        for label in reversed(domain.split('.')):
+            node = node.get(label)
+            if node is None:
+                return None
+        return node
+
+    def add(self, domain: str, wildcard: bool = False) -> None:
+        node: dict = self.root
+        for label in reversed(domain.split('.')):
+            node = node.setdefault(label, {})
+        flags: int = TRIE_ENTRY | (TRIE_WILDCARD if wildcard else 0)
+        node[TRIE_END] = node.get(TRIE_END, 0) | flags
+
+    def discard(self, domain: str) -> None:
+        """Usuwa domenę z drzewa (i puste już węzły)."""
+        path: List[Tuple[dict, str]] = []
+        node: dict = self.root
+        for label in reversed(domain.split('.')):
+            path.append((node, label))
+            node = node.get(label)
+            if node is None:
+                return
+        node.pop(TRIE_END, None)
+        for parent, label in reversed(path):
+            if parent[label]:
+                break
+            del parent[label]
+
+    def __contains__(self, domain: str) -> bool:
+        node: dict or None = self._node(domain)
+        return node is not None and bool(node.get(TRIE_END, 0) & TRIE_ENTRY)
+
+    def is_wildcard(self, domain: str) -> bool:
+        node: dict or None = self._node(domain)
+        return node is not None and bool(node.get(TRIE_END, 0) & TRIE_WILDCARD)
+
+    def covered_by(self, domain: str) -> str or None:
+        """Zwraca domenę z listy, która obejmuje `domain`: ją samą albo
+        najbliższą domenę nadrzędną blokowaną razem z subdomenami. Jeśli
+        takiej nie ma, zwraca None. Koszt zależy od liczby etykiet, nie od
+        długości listy.
+        """
+        labels: List[str] = domain.split('.')
+        node: dict = self.root
+        for i in range(len(labels) - 1, -1, -1):
+            node = node.get(labels[i])
+            if node is None:
+                return None
+            flags: int = node.get(TRIE_END, 0)
+            if flags & TRIE_WILDCARD or i == 0 and flags & TRIE_ENTRY:
+                return '.'.join(labels[i:])
+        return None
+
+    def iter_under(self, domain: str) -> Iterator[str]:
+        """Generator - zwraca domenę i wszystkie jej subdomeny z listy."""
+        node: dict or None = self._node(domain)
+        if node is None:
+            return
+        stack: List[Tuple[str, dict]] = [(domain, node)]
+        while stack:
+            name, node = stack.pop()
+            for label, child in node.items():
+                if label is TRIE_END:
+                    if child & TRIE_ENTRY:
+                        yield name
+                else:
+                    stack.append((label + '.' + name, child))
+
+    def has_under(self, domain: str) -> bool:
+        """Czy domena lub którakolwiek z jej subdomen jest na liście."""
+        return next(self.iter_under(domain), None) is not None
+
+    def infer_wildcards(self, subdomains: Iterable[str] = SUBDOMAINS) -> None:
+        """Oznacza jako blokowane z subdomenami te domeny, dla których na
+        liście są wszystkie `subdomains` - tak zapisuje je
+        `SiteStore.add_subdomains`, więc znacznik odtwarza się po odczycie
+        pliku hosts."""
+        subdomains = tuple(subdomains)
+        stack: List[dict] = [self.root]
+        while stack:
+            node = stack.pop()
+            if node.get(TRIE_END, 0) & TRIE_ENTRY and all(
+                    node.get(sub, {}).get(TRIE_END, 0) & TRIE_ENTRY
+                    for sub in subdomains):
+                node[TRIE_END] |= TRIE_WILDCARD
+            stack.extend(child for label, child in node.items()
+                         if label is not TRIE_END)
+
+
+class SiteStore:
+    """ Strony zarządzane przez program (pary adresów) w kolejności, w jakiej
+    są wyświetlane, razem z indeksem adresów. Sprawdzenie, czy strona już
+    istnieje, kosztuje O(1) i nie wymaga odczytu widżetu.
+    Każda strona jest zapisana zwięźle: adres bez `www.` tylko raz (`names`),
+    obecność wariantu `www.` jako bit w `flags`, a stan zablokowania
+    (zaznaczenia) jako bit w `blocked` (`BitArray`). Pary adresów są
+    odtwarzane dopiero przy odczycie (`store[n]`, iteracja).
+    Drzewo domen (`trie`) i indeks wyszukiwania (`search_index`) są
+    tworzone dopiero przy pierwszym użyciu.
+    """
+    __slots__ = ('names', 'flags', 'blocked', 'aliases', 'index', '_trie',
+                 '_search')
+
+    def __init__(self, sites: Iterable[Tuple[str, str]] = ()):
+        self.names: List[str] = []
+        self.flags: bytearray = bytearray()
+        self.blocked: BitArray = BitArray()
+        # {indeks: drugi adres} - tylko dla par innych niż adres / www.adres
+        self.aliases: Dict[int, str] = {}
+        # {adres: indeks w `names`} - klucze to te same obiekty co w `names`
+        self.index: Dict[str, int] = {}
+        self._trie: DomainTrie or None = None
+        self._search: SiteIndex or None = None
+        for site in sites:
+            self.append(site)
+
+    @classmethod
+    def from_sites(cls, sites: Iterable[Tuple[bool, str, str]]) -> 'SiteStore':
+        """Tworzy listę z krotek (zablokowana, adres.com, www.adres.com)."""
+        store = cls()
+        for site in sites:
+            store.append(site[1:3], site[0])
+        return store
+
+    def to_parts(self) -> tuple:
+        """Zwięzła postać listy z samych typów wbudowanych (np. dla
+        `marshal`): (names, flags, bity `blocked`, liczba pozycji, aliases).
+        """
+        return (self.names, bytes(self.flags), bytes(self.blocked.bits),
+                self.blocked.size, self.aliases)
+
+    @classmethod
+    def from_parts(cls, parts: tuple) -> 'SiteStore':
+        """Odtwarza listę z `to_parts` bez parsowania wierszy; indeks jest
+        budowany jednym przebiegiem."""
+        names, flags, bits, size, aliases = parts
+        if len(names) != size or len(flags) != size:
+            raise ValueError("inconsistent parts")
+        store = cls()
+        store.names = names
+        store.flags = bytearray(flags)
+        store.blocked.bits = bytearray(bits)
+        store.blocked.size = size
+        store.aliases = aliases
+        index: Dict[str, int] = dict(zip(names, range(size)))
+        for n, alias in aliases.items():
+            index[alias] = n
+        store.index = index
+        return store
+
+    def is_sorted(self) -> bool:
+        """Czy lista jest w kolejności `sort`."""
+        keys: List[str] = self.sort_keys()
+        return all(a <= b for a, b in zip(keys, itertools.islice(keys, 1,
+                                                                 None)))
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def pair(self, n: int) -> Tuple[str, str]:
+        """Odtwarza parę adresów (adres.com, www.adres.com) pozycji `n`."""
+        name: str = self.names[n]
+        flags: int = self.flags[n]
+        if flags & HAS_WWW:
+            alias: str = "www." + name
+        elif flags & HAS_ALIAS:
+            alias: str = self.aliases[n]
+        else:
+            alias: str = ''
+        return (name if flags & HAS_BARE else ''), alias
+
+    def __iter__(self) -> Iterator[Tuple[str, str]]:
+        return map(self.pair, range(len(self.names)))
+
+    def __getitem__(self, n):
+        if isinstance(n, slice):
+            return [self.pair(i) for i in range(*n.indices(len(self.names)))]
+        if n < 0:
+            n += len(self.names)
+        return self.pair(n)
+
+    def __contains__(self, site: Tuple[str, str]) -> bool:
+        """Czy którykolwiek adres z pary jest już na liście."""
+        return any(self.position(domain) is not None
+                   for domain in site if domain)
+
+    def find(self, domain: str) -> Tuple[str, str] or None:
+        """Zwraca parę adresów, do której należy `domain`, albo None."""
+        n: int or None = self.position(domain)
+        return None if n is None else self.pair(n)
+
+    def position(self, domain: str) -> int or None:
+        """Zwraca indeks pary adresów, do której należy `domain`, albo None."""
+        n: int or None = self.index.get(domain)
+        if n is None and domain.startswith("www."):
+            n = self.index.get(domain[4:])
+            if n is not None and not self.flags[n] & HAS_WWW:
+                n = None
+        return n
+
+    def append(self, site: Tuple[str, str], blocked: bool = False) -> None:
+        """Dodaje parę adresów na koniec listy i do indeksu. Pozycja z samym
+        `www.adres` jest zapisywana pod pełnym adresem (jak drugi adres
+        bez pary), żeby nie dzieliła klucza w `index` i `state` z pozycją
+        z samym `adres` - w pliku hosts mogą to być dwa osobne wiersze."""
+        n: int = len(self.names)
+        bare, alias = site
+        if bare:
+            name, flags = bare, HAS_BARE
+            if alias == "www." + bare:
+                flags |= HAS_WWW
+            elif alias:
+                flags |= HAS_ALIAS
+        else:
+            name, flags = alias, HAS_ALIAS
+        if flags & HAS_ALIAS:
+            self.aliases[n] = alias
+            self.index[alias] = n
+            if self._trie is not None:
+                self._trie.add(alias)
+        self.names.append(name)
+        self.flags.append(flags)
+        self.blocked.append(blocked)
+        self.index[name] = n
+        if self._trie is not None:
+            self._trie.add(name)
+
+    @property
+    def trie(self) -> DomainTrie:
+        """Drzewo domen z listy (`DomainTrie`), budowane przy pierwszym
+        użyciu i potem aktualizowane razem z listą."""
+        if self._trie is None:
+            self._trie = DomainTrie(self.index)
+            self._trie.infer_wildcards()
+        return self._trie
+
+    @property
+    def search_index(self) -> 'SiteIndex':
+        """Indeks wyszukiwania (`SiteIndex`) - tworzony pusty przy pierwszym
+        użyciu, uzupełniany przez `SiteIndex.update`. Pozycje dodane później
+        są sprawdzane bezpośrednio, aż trafią do indeksu."""
+        if self._search is None:
+            self._search = SiteIndex(self)
+        return self._search
+
+    def search(self, query: str) -> List[int]:
+        """Zwraca rosnące indeksy pozycji pasujących do `query` (małymi
+        literami), zob. `SiteIndex.search`."""
+        return self.search_index.search(query)
+
+    def covered(self, domain: str) -> str or None:
+        """Zwraca adres z listy, który obejmuje `domain` (ją samą, jej wariant
+        `www.` albo domenę nadrzędną blokowaną z subdomenami), lub None."""
+        if self.position(domain) is not None:
+            return domain
+        return self.trie.covered_by(domain)
+
+    def add_subdomains(self, domain: str, subdomains: Iterable[str] = SUBDOMAINS,
+                       blocked: bool = True) -> int:
+        """Dodaje domenę (parę z `www.`) i jej `subdomains`, których jeszcze
+        nie ma na liście, i oznacza ją w drzewie jako blokowaną razem
+        z subdomenami. Każda subdomena to osobna pozycja, więc w pliku hosts
+        zapisuje się jako zwykły wiersz. Zwraca liczbę dodanych pozycji.
+        """
+        added: int = 0
+        sites: List[Tuple[str, str]] = [(domain, "www." + domain)]
+        sites.extend((sub + '.' + domain, '') for sub in subdomains)
+        for site in sites:
+            if site not in self:
+                self.append(site, blocked)
+                added += 1
+        self.trie.add(domain, wildcard=True)
+        return added
+
+    def rebuild(self, order: Iterable[int]) -> None:
+        """Układa pozycje w kolejności indeksów z `order` (pominięte indeksy
+        są usuwane) i odbudowuje indeks - jednym przebiegiem."""
+        names, flags, blocked = self.names, self.flags, self.blocked
+        aliases = self.aliases
+        self.names, self.flags, self.blocked = [], bytearray(), BitArray()
+        self.aliases, self.index = {}, {}
+        # Indeksy pozycji się zmieniają - indeks wyszukiwania od nowa.
+        self._search = None
+        index = self.index
+        for n in order:
+            i: int = len(self.names)
+            name: str = names[n]
+            self.names.append(name)
+            self.flags.append(flags[n])
+            self.blocked.append(blocked[n])
+            index[name] = i
+            if n in aliases:
+                self.aliases[i] = aliases[n]
+                index[aliases[n]] = i
+
+    def delete(self, indices: Iterable[int]) -> None:
+        """Usuwa pozycje o podanych indeksach (np. z `curselection()`) z listy
+        i z indeksu - jednym przebiegiem niezależnie od ich liczby.
+        """
+        drop = set(indices)
+        if drop:
+            self.rebuild(n for n in range(len(self.names)) if n not in drop)
+            # Drzewo zostanie zbudowane od nowa przy następnym użyciu.
+            self._trie = None
+
+    def sort(self) -> None:
+        """Sortuje listę alfabetycznie wg adresu bez `www.` (tak jak widok),
+        a przy równych (adres.com i osobna pozycja www.adres.com) - wg
+        całego adresu. Tak samo sortuje baza (`sitedb`)."""
+        keys: List[str] = self.sort_keys()
+        self.rebuild(sorted(range(len(keys)), key=keys.__getitem__))
+
+    def sort_keys(self) -> List[str]:
+        """Klucze `sort`: `sort_name` adresu, `\\0` (mniejsze od każdego
+        znaku adresu) i cały adres - jak (sort_name, adres)."""
+        return [sort_name(name) + '\0' + name for name in self.names]
+
+    def state(self) -> Dict[str, int]:
+        """Zwraca {adres: znaczniki | 0x80 dla zablokowanych} - zwięzły stan
+        listy, z którym `AppModel.diff_sites` porównuje kolejne zapisy."""
+        return {name: flags | blocked << 7 for name, flags, blocked
+                in zip(self.names, self.flags, self.blocked)}
+
+    def select(self, indices: Iterable[int]) -> None:
+        """Ustawia zaznaczenie: zablokowane są dokładnie pozycje o podanych
+        indeksach."""
+        self.blocked = to_bitmap(len(self.names), indices)
+
+    def set_blocked(self, n: int, blocked: bool) -> None:
+        self.blocked[n] = blocked
+
+    def set_all(self, blocked: bool) -> None:
+        """Blokuje lub odblokowuje wszystkie pozycje (np. cały profil)."""
+        self.blocked.fill(blocked)
+
+    def blocked_ranges(self, start: int = 0,
+                       end: int or None = None) -> Iterator[Tuple[int, int]]:
+        """Generator - zwraca ciągłe zakresy (pierwszy, ostatni) zablokowanych
+        pozycji pomiędzy indeksami `start` i `end`.
+        """
+        blocked = self.blocked
+        end = len(blocked) if end is None else end
+        first: int = blocked.find(1, start, end)
+        while first != -1:
+            last: int = blocked.find(0, first, end)
+            last = end if last == -1 else last
+            yield first, last - 1
+            first = blocked.find(1, last, end)
+
+    def selected(self) -> Tuple[int, ...]:
+        """Zwraca krotkę z indeksami zablokowanych pozycji."""
+        return tuple(n for first, last in self.blocked_ranges()
+                     for n in range(first, last + 1))
+
+
+class SiteIndex:
+    """ Indeks wyszukiwania adresów z listy (`SiteStore.search_index`):
+    posortowane adresy (początek adresu - `bisect`) i n-gramy (`NGRAM`
+    znaków) z rosnącymi indeksami pozycji, które je zawierają (fragment
+    adresu). Koszt zapytania zależy od liczby kandydatów z najrzadszego
+    n-gramu, a nie od długości listy.
+    Indeks jest budowany krokami (`update`), więc może powstawać w tle GUI;
+    pozycje jeszcze poza indeksem (np. dodane później) są sprawdzane
+    bezpośrednio, więc wynik jest zawsze pełny.
+    """
+    __slots__ = ('store', 'texts', 'runs', 'grams', 'last')
+
+    def __init__(self, store: SiteStore):
+        self.store = store
+        # Przeszukiwany tekst pozycji: adres i ewentualnie drugi adres pary.
+        self.texts: List[str] = []
+        # Posortowane (adresy, indeksy pozycji) - po jednym ciągu na krok.
+        self.runs: List[Tuple[List[str], List[int]]] = []
+        self.grams: Dict[str, List[int]] = {}
+        # (zapytanie, stan listy, wynik) - ostatnie wyszukiwanie fragmentu;
+        # dłuższe zapytanie zawierające poprzednie zawęża jego wynik.
+        self.last: Tuple[str, Tuple[int, int], List[int]] or None = None
+
+    def __len__(self) -> int:
+        """Liczba pozycji w indeksie."""
+        return len(self.texts)
+
+    def text(self, n: int) -> str:
+        """Przeszukiwany tekst pozycji `n` małymi literami (zapytania
+        z `AppModel.filter_sites` są małymi literami)."""
+        name: str = self.store.names[n]
+        alias: str or None = self.store.aliases.get(n)
+        if alias is None:
+            return name.lower()
+        if alias == name:
+            # Sam drugi adres - `www.adres` jest szukany bez `www.`.
+            return WWW_PATT.sub('', name, 1).lower()
+        return (name + '\n' + alias).lower()
+
+    def update(self, limit: int or None = None) -> int:
+        """Dodaje do indeksu najwyżej `limit` (None - wszystkie) kolejnych
+        pozycji listy. Zwraca liczbę pozycji, które są jeszcze poza nim."""
+        start: int = len(self.texts)
+        size: int = len(self.store)
+        end: int = size if limit is None else min(size, start + limit)
+        if end <= start:
+            return size - end
+        texts: List[str] = [self.text(n) for n in range(start, end)]
+        keys: List[Tuple[str, int]] = sorted(
+            (key, n) for n, text in enumerate(texts, start)
+            for key in text.split('\n'))
+        self.runs.append(([key for key, _ in keys], [n for _, n in keys]))
+        grams = self.grams
+        get = grams.get
+        for n, text in enumerate(texts, start):
+            for gram in {text[i:i + NGRAM]
+                         for i in range(len(text) - NGRAM + 1)}:
+                positions: List[int] or None = get(gram)
+                if positions is None:
+                    grams[gram] = [n]
+                else:
+                    positions.append(n)
+        self.texts.extend(texts)
+        return size - end
+
+    def prefix(self, query: str) -> List[int]:
+        """Zwraca rosnące indeksy pozycji, których adres zaczyna się od
+        `query`."""
+        found: List[int] = []
+        # Każdy klucz zaczynający się od `query` jest przed `query` + znak
+        # o największym kodzie.
+        high: str = query + '\U0010ffff'
+        for keys, positions in self.runs:
+            found.extend(positions[bisect.bisect_left(keys, query):
+                                   bisect.bisect_left(keys, high)])
+        found = sorted(set(found))
+        text, nl = self.text, '\n' + query
+        found.extend(n for n in range(len(self.texts), len(self.store))
+                     if text(n).startswith(query) or nl in text(n))
+        return found
+
+    def search(self, query: str) -> List[int]:
+        """Zwraca rosnące indeksy pozycji, których adres zawiera `query`;
+        zapytania krótsze niż `NGRAM` znaków - zaczynających się od niego
+        (`prefix`)."""
+        if len(query) < NGRAM:
+            return self.prefix(query)
+        built: int = len(self.texts)
+        state: Tuple[int, int] = (built, len(self.store))
+        grams = self.grams
+        candidates: List[int] = min(
+            (grams.get(query[i:i + NGRAM], ())
+             for i in range(len(query) - NGRAM + 1)), key=len)
+        tail: Iterable[int] = range(built, state[1])
+        last = self.last
+        if last is not None and last[1] == state and last[0] in query and \
+                len(last[2]) < len(candidates) + len(tail):
+            split: int = bisect.bisect_left(last[2], built)
+            candidates, tail = last[2][:split], last[2][split:]
+        if len(query) == NGRAM:
+            # Pozycje z n-gramem zawierają całe zapytanie.
+            found: List[int] = list(candidates)
+        else:
+            texts = self.texts
+            found: List[int] = [n for n in candidates if query in texts[n]]
+        text = self.text
+        found.extend(n for n in tail if query in text(n))
+        self.last = (query, state, found)
+        return found
+
+
+class FilteredSites:
+    """ Część listy (`SiteStore`) - pozycje o rosnących indeksach
+    `positions`, np. wynik `AppModel.filter_sites`. Ma interfejs listy
+    potrzebny widokowi (`len`, `[n]`, `blocked_ranges`, `set_blocked`,
+    `selected`); zaznaczenie jest zapisywane w całej liście.
+    """
+    __slots__ = ('store', 'positions')
+
+    def __init__(self, store: SiteStore, positions: List[int]):
+        self.store = store
+        self.positions = positions
+
+    def __len__(self) -> int:
+        return len(self.positions)
+
+    def __iter__(self) -> Iterator[Tuple[str, str]]:
+        return map(self.store.pair, self.positions)
+
+    def __getitem__(self, n):
+        if isinstance(n, slice):
+            return list(map(self.store.pair, self.positions[n]))
+        return self.store.pair(self.positions[n])
+
+    def set_blocked(self, n: int, blocked: bool) -> None:
+        self.store.set_blocked(self.positions[n], blocked)
+
+    def blocked_ranges(self, start: int = 0,
+                       end: int or None = None) -> Iterator[Tuple[int, int]]:
+        """Jak `SiteStore.blocked_ranges`, w numeracji tej części listy."""
+        blocked, positions = self.store.blocked, self.positions
+        end = len(positions) if end is None else end
+        first: int or None = None
+        for k in range(start, end):
+            if blocked[positions[k]]:
+                if first is None:
+                    first = k
+            elif first is not None:
+                yield first, k - 1
+                first = None
+        if first is not None:
+            yield first, end - 1
+
+    def selected(self) -> Tuple[int, ...]:
+        """Zwraca krotkę z indeksami (w tej części listy) zablokowanych
+        pozycji."""
+        return tuple(n for first, last in self.blocked_ranges()
+                     for n in range(first, last + 1))
+
+    def selected_positions(self) -> Tuple[int, ...]:
+        """Jak `selected`, ale indeksy w całej liście (`store`), np. do
+        `SiteStore.delete`."""
+        positions = self.positions
+        return tuple(positions[n] for n in self.selected())
+
+
+def sort_name(name: str) -> str:
+    """Adres pozycji bez początkowego `www.` - klucz sortowania listy."""
+    return name[4:] if name.startswith("www.") else name
+
+
+def line_width(entries: Tuple[Tuple[bool, str, str], ...]) -> int:
+    """Liczba adresów w wierszu bloku, z którego `extract_entries` odczytała
+    pozycje `entries`."""
+    return sum(bool(site) + bool(alias) for _, site, alias in entries)
+
+
+def block_markers(app_name: str, profile: str or None = None) -> \
+        Tuple[str, str]:
+    """Znaczniki `BEGIN` i `END` bloku programu lub jego profilu."""
+    name: str = app_name if profile is None else \
+        "{}:{}".format(app_name, profile)
+    return "# BEGIN {}".format(name), "# END {}".format(name)
+
+
+def find_line(data, marker: bytes, pos: int = 0) -> Tuple[int, int] or None:
+    """Zakres bajtów (początek, koniec bez `\\n`) pierwszego od `pos` wiersza
+    `data` równego `marker` po usunięciu białych znaków (jak
+    `line.strip() == marker`) albo None. Kolejne wystąpienia są szukane
+    przez `find` (bez dekodowania i bez dzielenia na wiersze)."""
+    size: int = len(data)
+    while True:
+        i: int = data.find(marker, pos)
+        if i == -1:
+            return None
+        start: int = data.rfind(b'\n', 0, i) + 1
+        end: int = data.find(b'\n', i + len(marker))
+        end = size if end == -1 else end
+        if not data[start:i].strip() and \
+                not data[i + len(marker):end].strip():
+            return start, end
+        pos = i + len(marker)
+
+
+def find_blocks(data, heads: Iterable[str]) -> \
+        Iterator[Tuple[int, int, str]]:
+    """Generator - zakresy bajtów (początek, koniec, znacznik `BEGIN`) bloków
+    o podanych znacznikach `BEGIN` w `data` (np. mmap pliku hosts), razem
+    z wierszami znaczników. Blok bez znacznika `END` sięga do końca pliku.
+    """
+    markers: Dict[bytes, str] = {head.encode(): head for head in heads}
+    size: int = len(data)
+    pos: int = 0
+    while True:
+        found = [(span, marker) for span, marker in
+                 ((find_line(data, marker, pos), marker)
+                  for marker in markers) if span is not None]
+        if not found:
+            return
+        (start, end), marker = min(found)
+        foot = find_line(data, b"# END" + marker[len(b"# BEGIN"):], end)
+        end = size if foot is None else min(foot[1] + 1, size)
+        yield start, end, markers[marker]
+        pos = end
 
 
 class AppModel:
-    """ Model """
+    """ Model
+    profile -- nazwa profilu (osobny blok `# BEGIN app_name:profile`);
+               None - blok główny `# BEGIN app_name`
+    """
 
-    def __init__(self, app_name: str, fpath: str, host: str):
+    def __init__(self, app_name: str, fpath: str, host: str,
+                 profile: str or None = None):
+        if profile is not None and not PROFILE_PATT.match(profile):
+            raise ValueError("invalid profile name: {!r}".format(profile))
         self.app_name = app_name
         self.fpath = fpath
         self.host = host
-        self.head = r"# BEGIN {}".format(self.app_name)
-        self.foot = r"# END {}".format(self.app_name)
+        self.profile = profile
+        # Znaczniki porównywane dokładnie (bez `startswith`), żeby blok
+        # główny nie obejmował bloków profili.
+        self.head, self.foot = block_markers(app_name, profile)
+        # Stan bloku w pliku hosts po ostatnim odczycie lub zapisie
+        # (`SiteStore.state`) i skrót treści bloku.
+        self.snapshot: Dict[str, int] = {}
+        self.block_hash: bytes or None = None
+        # Skrót bloku w pliku (wiersze z `iter_block`) po ostatnim odczycie
+        # przez `reload_block` lub zapisie - do wykrywania zmian z zewnątrz.
+        self.disk_hash: bytes or None = None
+        self.sites: SiteStore = SiteStore()
+        # Układ zwarty: do `dense` adresów w jednym wierszu bloku (0 - jedna
+        # para adresów w wierszu), zob. `render_block`. None - układ bloku
+        # w pliku z ostatniego odczytu (`layout`), więc zapis go nie zmienia.
+        self.dense: int or None = None
+        # Największa liczba adresów w wierszu bloku w pliku (ostatni odczyt
+        # lub zapis), jeśli blok jest w układzie zwartym; inaczej 0.
+        self.layout: int = 0
+        # Trwała pamięć podręczna odczytanego bloku (`parsecache.ParseCache`)
+        # albo None - blok jest zawsze parsowany.
+        self.cache = None
+        # Baza stron (`sitedb.SiteDatabase`) albo None. Z bazą lista jest
+        # czytana z niej, a blok pliku hosts jest tworzony z zapytania.
+        self.db = None
 
+    @timing.traced()
     def read_file(self) -> List[str]:
         """Czyta wiersz po wierszu plik `hosts`, usuwa białe znaki, pobiera
         z niego wiersze pomiędzy znacznikami `BEGIN` i `END` (nie pobiera
         znaczników). Zwraca listę z wierszami.
         """
-        lines = []
         with open(self.fpath, 'r') as fr:
-            read = False
-            for line in fr:
-                line = line.strip()
-                if line.startswith(self.head):
+            return list(self.iter_block(fr))
+
+    def iter_block(self, lines: Iterable[str]) -> Iterator[str]:
+        """Generator - przechodzi jeden raz przez podane wiersze (np. otwarty
+        plik `hosts`) i zwraca kolejno niepuste wiersze pomiędzy znacznikami
+        `BEGIN` i `END`, bez białych znaków i bez samych znaczników.
+        lines -- wiersze pliku hosts
+        """
+        head, foot = self.head, self.foot
+        read = False
+        for line in lines:
+            line = line.strip()
+            if not line:
+                continue
+            if line[0] == '#':
+                if line == head:
                     read = True
                     continue
-                elif line.startswith(self.foot):
+                elif line == foot:
                     read = False
-                if read and line != '':
-                    lines.append(line)
-        return lines
+            if read:
+                yield line
+
+    def iter_hashed(self, lines: Iterable[str], digest) -> Iterator[str]:
+        """Generator - jak `iter_block`, ale każdy zwracany wiersz dopisuje
+        też (z `\\n`) do skrótu `digest` (`hashlib.sha1`). Tak jest liczony
+        `disk_hash` - przy odczycie i przy zapisie bloku."""
+        update = digest.update
+        for line in self.iter_block(lines):
+            update(line.encode() + b'\n')
+            yield line
+
+    def iter_sites(self) -> Iterator[Tuple[bool, str, str]]:
+        """Generator - czyta plik `hosts` jednym przebiegiem i zwraca kolejno
+        krotki (zablokowana, adres.com, www.adres.com) dla każdego poprawnego
+        wiersza pomiędzy znacznikami `BEGIN` i `END`. Nie buduje po drodze
+        listy wierszy. Po przejściu całego bloku ustawia `layout`.
+        """
+        extract = self.extract_entries
+        width: int = 0
+        with open(self.fpath, 'r') as fr:
+            for line in self.iter_block(fr):
+                found = extract(line)
+                if len(found) > 1:
+                    width = max(width, line_width(found))
+                yield from found
+        self.layout = width
+
+    @timing.traced()
+    def load_sites(self) -> SiteStore:
+        """Czyta strony z pliku hosts (`iter_sites`) do `sites`, sortuje je
+        alfabetycznie wg adresu bez `www.` (tak jak widok) i zapamiętuje ich
+        stan, względem którego `write_file` wylicza zmiany. Zwraca `sites`.
+        Jeśli jest pamięć podręczna (`cache`) z aktualnym wpisem dla bloku,
+        lista jest wczytywana z niej zamiast parsowania pliku. Jeśli jest baza
+        (`db`), lista jest czytana z bazy (`load_db`).
+        """
+        if self.db is not None:
+            return self.load_db()
+        digest: bytes or None = None
+        store: SiteStore or None = None
+        if self.cache is not None:
+            store, digest = self.load_cached()
+        if store is None:
+            with timing.span("AppModel.iter_sites") as span:
+                if self.cache is not None:
+                    signature = parsecache.file_signature(self.fpath)
+                    digest, entries = self.read_block()
+                    store = SiteStore.from_sites(entries)
+                    del entries
+                else:
+                    store = SiteStore.from_sites(self.iter_sites())
+                span.set(entries=len(store))
+            with timing.span("SiteStore.sort", entries=len(store)):
+                store.sort()
+            if self.cache is not None:
+                self.save_cached(store, digest, signature, True)
+        self.sites = store
+        with timing.span("SiteStore.state", entries=len(store)):
+            self.snapshot = store.state()
+        self.block_hash = None
+        self.disk_hash = digest
+        return store
+
+    def load_db(self) -> SiteStore:
+        """Czyta listę z bazy `db`. Przy pierwszym użyciu bazy dla bloku
+        przenosi do niej strony z pliku hosts."""
+        if self.db.has_block(self.head):
+            with timing.span("SiteDatabase.load_store") as span:
+                store: SiteStore = self.db.load_store(self.head)
+                span.set(entries=len(store))
+            self.layout = self.db.layout(self.head)
+        else:
+            store: SiteStore = SiteStore.from_sites(self.iter_sites())
+            store.sort()
+            self.db.apply(self.head, store, {}, store.state(), self.layout)
+        self.sites = store
+        self.snapshot = store.state()
+        self.block_hash = None
+        self.disk_hash = None
+        return store
+
+    def block_digest(self) -> bytes:
+        """Skrót wierszy bloku w pliku hosts (jak w `read_block`) bez
+        parsowania wierszy."""
+        digest = hashlib.sha1()
+        with open(self.fpath, 'r') as fr:
+            for _ in self.iter_hashed(fr, digest):
+                pass
+        return digest.digest()
+
+    def load_cached(self) -> Tuple[SiteStore or None, bytes or None]:
+        """Zwraca (lista, skrót bloku) z pamięci podręcznej albo (None, None),
+        jeśli nie ma ważnego wpisu. Wpis jest ważny, gdy plik ma ten sam
+        i-węzeł, rozmiar i czas modyfikacji, a jeśli nie - gdy skrót bloku
+        w pliku jest taki sam (wtedy wpis jest zapisywany z nowym `os.stat`).
+        """
+        with timing.span("ParseCache.load") as span:
+            signature = parsecache.file_signature(self.fpath)
+            entry = self.cache.load(self.fpath, self.head)
+            if entry is None or signature is None:
+                span.set(hit=False)
+                return None, None
+            revalidated: bool = entry.signature != signature
+            if revalidated and self.block_digest() != entry.digest:
+                span.set(hit=False)
+                return None, None
+            try:
+                store: SiteStore = SiteStore.from_parts(entry.parts)
+            except (ValueError, TypeError, AttributeError):
+                span.set(hit=False)
+                return None, None
+            span.set(hit=True, revalidated=revalidated, entries=len(store))
+        self.layout = entry.layout
+        if not entry.ordered:
+            with timing.span("SiteStore.sort", entries=len(store)):
+                store.sort()
+        if revalidated or not entry.ordered:
+            self.save_cached(store, entry.digest, signature, True)
+        return store, entry.digest
+
+    def save_cached(self, store: SiteStore, digest: bytes,
+                    signature: Tuple[int, int, int] or None,
+                    ordered: bool) -> None:
+        """Zapisuje `store` w pamięci podręcznej jako zawartość bloku o skrócie
+        `digest` w pliku o sygnaturze `signature` (`os.stat` sprzed odczytu,
+        więc zmiana pliku w trakcie odczytu unieważnia wpis)."""
+        with timing.span("ParseCache.save", entries=len(store)):
+            self.cache.save(self.fpath, self.head, parsecache.CacheEntry(
+                signature, digest, ordered, store.to_parts(), self.layout))
+
+    def read_block(self) -> Tuple[bytes, List[Tuple[bool, str, str]]]:
+        """Czyta z pliku hosts tylko blok programu: zwraca skrót jego wierszy
+        (jak w `disk_hash`) i pozycje (jak `iter_sites`). Ustawia `layout`.
+        """
+        digest = hashlib.sha1()
+        entries: List[Tuple[bool, str, str]] = []
+        extract = self.extract_entries
+        width: int = 0
+        with open(self.fpath, 'r') as fr:
+            for line in self.iter_hashed(fr, digest):
+                found = extract(line)
+                if len(found) > 1:
+                    width = max(width, line_width(found))
+                entries.extend(found)
+        self.layout = width
+        return digest.digest(), entries
 
+    @timing.traced()
+    def reload_block(self) -> ReloadDiff:
+        """Po zmianie pliku hosts przez inny program nanosi zmiany z bloku
+        na `sites` bez ponownego wczytywania całej listy. Zmiany w pliku są
+        liczone względem stanu z ostatniego odczytu lub zapisu (`snapshot`).
+        Pozycje zmienione od tego czasu także lokalnie (niezapisane) nie są
+        nadpisywane - ich adresy są zwracane w `conflicts`. Jeśli skrót bloku
+        się nie zmienił (np. po własnym zapisie), nic nie robi - kosztuje
+        to tylko skrót bloku (`block_digest`), bez parsowania wierszy.
+        """
+        if self.disk_hash is not None and \
+                self.block_digest() == self.disk_hash:
+            return ReloadDiff(0, 0, 0, ())
+        digest, entries = self.read_block()
+        if digest == self.disk_hash:
+            return ReloadDiff(0, 0, 0, ())
+        disk: SiteStore = SiteStore.from_sites(entries)
+        new: Dict[str, int] = disk.state()
+        old: Dict[str, int] = self.snapshot
+        sites: SiteStore = self.sites
+        local: Dict[str, int] = sites.state()
+        conflicts: List[str] = []
+        drop: List[int] = []
+        append: List[int] = []
+        toggled: int = 0
+        for name, state in new.items():
+            prev: int or None = old.get(name)
+            if prev == state:
+                continue
+            if local.get(name) != prev:
+                # Zmienione także lokalnie - konflikt, jeśli inaczej.
+                if local.get(name) != state:
+                    conflicts.append(name)
+                continue
+            n: int or None = sites.index.get(name)
+            if n is not None and not (prev ^ state) & 0x7f:
+                sites.set_blocked(n, bool(state >> 7))
+                toggled += 1
+                continue
+            if n is not None:
+                drop.append(n)
+            append.append(disk.index[name])
+        removed: int = 0
+        for name, prev in old.items():
+            if name in new:
+                continue
+            if local.get(name) == prev:
+                drop.append(sites.index[name])
+                removed += 1
+            elif local.get(name) is not None:
+                conflicts.append(name)
+        sites.delete(drop)
+        for m in append:
+            sites.append(disk.pair(m), bool(disk.blocked[m]))
+        self.snapshot = new
+        self.disk_hash = digest
+        self.block_hash = None
+        return ReloadDiff(len(append), removed, toggled, tuple(conflicts))
+
+    @timing.traced()
     def extract_sites(self, lines: List[str]) -> List[Tuple[bool, str, str]]:
         """ Dla każdego elementu listy wywołuje `extract_data`, która konwertuje
         go na krotkę. Ta funkcja usuwa elementy None."""
@@ -47,23 +1128,48 @@ class AppModel:
         ktoregoś, zastąpi je pustym stingiem) i zwraca je jako krotkę.
         s -- wiersz z pliku hosts
         """
-        patt = re.compile(r"""(\s*\#*\s*)
-                              (\d{3}.\d{1}.\d{1}.\d{1})
-                              (\s+)
-                              ([\w\.\-]+)
-                              (\s*)
-                              ([\w\.\-]*)""", re.VERBOSE)
-        try:
-            m = re.match(patt, s)
-            if m.group(1).strip().startswith("#"):
-                blocked: bool = False
-            else:
-                blocked: bool = True
-            lin: List[str] = sorted((m.group(4), m.group(6)),
-                                    key=lambda i: i.startswith("www."))
-            return blocked, lin[0], lin[1]
-        except AttributeError:
+        m = SITE_PATT.match(s)
+        if m is None:
             return None
+        blocked: bool = '#' not in m.group(1)
+        # Adres z `www.` zawsze na drugim miejscu (zamiast sorted() z lambdą).
+        site, alias = m.group(4, 6)
+        if site.startswith("www.") and not alias.startswith("www."):
+            site, alias = alias, site
+        return blocked, site, alias
+
+    def extract_entries(self, s: str) -> Tuple[Tuple[bool, str, str], ...]:
+        """ Jak `extract_data`, ale obsługuje też wiersze w układzie zwartym
+        (więcej niż dwa adresy, zob. `render_block`) - zwraca krotkę pozycji.
+        W takim wierszu adres.com i następujący po nim www.adres.com tworzą
+        jedną pozycję, pozostałe adresy są osobnymi pozycjami.
+        s -- wiersz z pliku hosts
+        """
+        m = SITE_PATT.match(s)
+        if m is None:
+            return ()
+        blocked: bool = '#' not in m.group(1)
+        rest: str = s[m.end():].split('#', 1)[0]
+        if not rest or rest.isspace():
+            site, alias = m.group(4, 6)
+            if site.startswith("www.") and not alias.startswith("www."):
+                site, alias = alias, site
+            return (blocked, site, alias),
+        names: List[str] = s[m.start(4):].split('#', 1)[0].split()
+        entries: List[Tuple[bool, str, str]] = []
+        i: int = 0
+        while i < len(names):
+            name: str = names[i]
+            if i + 1 < len(names) and names[i + 1] == "www." + name:
+                entries.append((blocked, name, names[i + 1]))
+                i += 2
+                continue
+            if name.startswith("www."):
+                entries.append((blocked, "", name))
+            else:
+                entries.append((blocked, name, ""))
+            i += 1
+        return tuple(entries)
 
     def validate_data(self, inp: str) -> bool:
         """ Sprawdza poprawnośc wprowadzonych danych: 1) czy zaczyna się od
@@ -72,8 +1178,8 @@ class AppModel:
         inp -- dane wprowadzone przez użytkownika
         """
         inp = inp.strip()
-        if re.match(r"[a-zA-Z]", inp):
-            if re.search(r"^[\w.-]+$", inp):
+        if START_PATT.match(inp):
+            if CHARS_PATT.search(inp):
                 return True
         return False
 
@@ -82,52 +1188,461 @@ class AppModel:
         dodaje go, jeśli tak, usuwa. Zwraca zawsze dwuelementową krotkę:
         (adres.com, www.adres.com).
         """
-        patt = r"^www\."
-        if re.match(patt, inp):
-            return re.sub(patt, '', inp), inp
+        if WWW_PATT.match(inp):
+            return WWW_PATT.sub('', inp), inp
         else:
             return inp, "www." + inp
 
-    def write_file(self, all_sites: List[Tuple[str, str]],
-                   sel: Tuple[int, ...]) -> None:
+    def filter_sites(self, text: str) -> SiteStore or FilteredSites:
+        """Zwraca strony z listy, których adres zawiera `text` (wielkość
+        liter i początkowe `www.` nie mają znaczenia), jako `FilteredSites`
+        - wyszukiwane w indeksie listy (`SiteStore.search`). Dla pustego
+        `text` zwraca całą listę.
+        """
+        query: str = text.strip().lower()
+        if query.startswith('www.'):
+            query = query[4:]
+        if not query:
+            return self.sites
+        return FilteredSites(self.sites, self.sites.search(query))
+
+    @timing.traced()
+    def write_file(self, all_sites: Iterable[Tuple[str, str]],
+                   sel: Iterable[int] or None = None,
+                   atomic: bool = False, force: bool = False) -> BlockDiff:
         """ Zapisuje dane do pliku hosts. Wcześniej czyści plik hosts między
-        znacznikami `BEGIN` i `END`. (włącznie ze znacznikami). """
-        self.clear_hosts_file()
-        with open(self.fpath, 'a') as fw:
-            fw.write(self.head + '\n')
-            for n, site in enumerate(all_sites):
-                if n in sel:
-                    fw.write(" ".join((self.host, *site, '\n')))
-                    # Dla Py < 3,5:
-                    # fw.write(" ".join((self.host, site[0], site[1], '\n')))
-                    # https://stackoverflow.com/a/33973612
+        znacznikami `BEGIN` i `END`. (włącznie ze znacznikami).
+        Jeśli skrót nowego bloku jest taki sam jak ostatnio zapisanego albo
+        w stosunku do ostatniego odczytu nic się nie zmieniło, plik nie jest
+        w ogóle otwierany (mtime się nie zmienia). Zwraca `BlockDiff`.
+        all_sites -- `SiteStore` albo pary adresów
+        sel -- indeksy zablokowanych pozycji; jeśli None, zaznaczenie jest
+               brane z `all_sites.blocked`
+        atomic -- zamiast dwóch przebiegów (`clear_hosts_file` i dopisanie)
+                  zapisuje plik jednym przebiegiem przez `replace_hosts_file`
+        force -- zapisuje blok także bez zmian na liście (np. po zmianie
+                 układu wierszy - `dense`)
+        """
+        if sel is None and isinstance(all_sites, SiteStore):
+            store: SiteStore = all_sites
+        else:
+            store: SiteStore = SiteStore(all_sites)
+            if sel is not None:
+                store.select(sel)
+        if self.db is not None:
+            return self.write_db(store, atomic, force)
+        width: int = self.row_names()
+        if width != self.layout:
+            # Zmiana układu wierszy - blok jest zapisywany także bez zmian
+            # na liście.
+            force = True
+        with timing.span("AppModel.render_block", entries=len(store)):
+            block: List[str] = list(self.render_block(store))
+        with timing.span("hash", lines=len(block)):
+            digest: bytes = hashlib.sha1(''.join(block).encode()).digest()
+        if digest == self.block_hash and not force:
+            return BlockDiff(0, 0, 0)
+        with timing.span("SiteStore.state", entries=len(store)):
+            entries: Dict[str, int] = store.state()
+        diff: BlockDiff = self.diff_sites(entries)
+        if any(diff) or force or self.block_hash is None and not self.snapshot:
+            if atomic:
+                self.replace_hosts_file(block)
+            else:
+                self.clear_hosts_file()
+                with open(self.fpath, 'a') as fw:
+                    for line in block:
+                        fw.write(line)
+            # Skrót jak w `read_block` - własny zapis nie jest zmianą
+            # z zewnątrz.
+            disk = hashlib.sha1()
+            for _ in self.iter_hashed(block, disk):
+                pass
+            self.disk_hash = disk.digest()
+            self.layout = width
+            if self.cache is not None:
+                self.save_cached(store, self.disk_hash,
+                                 parsecache.file_signature(self.fpath),
+                                 store.is_sorted())
+        self.snapshot = entries
+        self.block_hash = digest
+        return diff
+
+    def write_db(self, store: SiteStore, atomic: bool,
+                 force: bool) -> BlockDiff:
+        """`write_file` z bazą: zapisuje zmiany w bazie, a blok pliku hosts
+        tworzy zapytaniem czytanym wiersz po wierszu (w układzie zwartym -
+        z `render_dense`)."""
+        with timing.span("SiteStore.state", entries=len(store)):
+            entries: Dict[str, int] = store.state()
+        diff: BlockDiff = self.diff_sites(entries)
+        width: int = self.row_names()
+        if any(diff) or force or width != self.layout or \
+                not self.db.has_block(self.head):
+            with timing.span("SiteDatabase.apply", added=diff.added,
+                             removed=diff.removed, toggled=diff.toggled):
+                self.db.apply(self.head, store, self.snapshot, entries, width)
+            disk = hashlib.sha1()
+
+            def block() -> Iterator[str]:
+                lines = self.render_block(store) if width else \
+                    itertools.chain((self.head + '\n',),
+                                    self.db.render(self.head, self.host),
+                                    (self.foot + '\n',))
+                # Skrót jak w `read_block`, liczony w trakcie zapisu:
+                # `raw` to wiersze pobrane przez `iter_hashed` od ostatniego
+                # wiersza bloku (najwyżej kilka).
+                raw: List[str] = []
+
+                def source() -> Iterator[str]:
+                    for line in lines:
+                        raw.append(line)
+                        yield line
+                for _ in self.iter_hashed(source(), disk):
+                    yield from raw
+                    raw.clear()
+                yield from raw
+            if atomic:
+                self.replace_hosts_file(block())
+            else:
+                self.clear_hosts_file()
+                with open(self.fpath, 'a') as fw:
+                    fw.writelines(block())
+            self.disk_hash = disk.digest()
+            self.layout = width
+        self.snapshot = entries
+        self.block_hash = None
+        return diff
+
+    @timing.traced()
+    def diff_sites(self, entries: Dict[str, int]) -> BlockDiff:
+        """Porównuje `entries` (`SiteStore.state`) ze stanem z ostatniego
+        odczytu / zapisu (`snapshot`) i zwraca liczbę pozycji dodanych,
+        usuniętych i przełączonych. Pozycja, której zmienił się zestaw
+        adresów, liczy się jako usunięta i dodana.
+        """
+        old: Dict[str, int] = self.snapshot
+        added: int = 0
+        toggled: int = 0
+        matched: int = 0
+        for name, state in entries.items():
+            prev: int or None = old.get(name)
+            if prev is None or (prev ^ state) & 0x7f:
+                added += 1
+            else:
+                matched += 1
+                if prev != state:
+                    toggled += 1
+        return BlockDiff(added, len(old) - matched, toggled)
+
+    def row_names(self) -> int:
+        """Liczba adresów w wierszu przy zapisie bloku: `dense`, a jeśli nie
+        jest ustawione - układ bloku w pliku (`layout`). 0 - jedna para
+        w wierszu."""
+        width: int = self.layout if self.dense is None else self.dense
+        return width if width > 2 else 0
+
+    def render_block(self, store: SiteStore) -> Iterator[str]:
+        """Generator - zwraca kolejne wiersze bloku zarządzanego przez program
+        razem ze znacznikami `BEGIN` i `END`. Strony niezablokowane
+        (bit 0 w `store.blocked`) są zakomentowane.
+        W układzie zwartym (`row_names` większe niż 2) zapisuje blok przez
+        `render_dense`.
+        """
+        if self.row_names():
+            yield from self.render_dense(store)
+            return
+        yield self.head + '\n'
+        for site, blocked in zip(store, store.blocked):
+            if blocked:
+                yield " ".join((self.host, *site, '\n'))
+                # Dla Py < 3,5:
+                # " ".join((self.host, site[0], site[1], '\n'))
+                # https://stackoverflow.com/a/33973612
+            else:
+                yield " ".join(('#', self.host, *site, '\n'))
+        yield self.foot + '\n'
+
+    def render_dense(self, store: SiteStore) -> Iterator[str]:
+        """Generator - jak `render_block`, ale umieszcza do `dense` adresów
+        w jednym wierszu: najpierw zablokowane, potem zakomentowane, każde
+        posortowane wg adresu, żeby adres.com i www.adres.com były obok
+        siebie i nie trafiały do różnych wierszy. Pary z drugim adresem,
+        który nie jest wariantem `www.`, i pozycje z samym `www.adres`
+        dostają osobny wiersz, żeby `extract_entries` odczytał je bez zmian
+        (nie połączył ich z sąsiednim adresem).
+        """
+        yield self.head + '\n'
+        width: int = self.row_names()
+        groups: Tuple[List[Tuple[str, ...]], ...] = ([], [])
+        singles: List[str] = []
+        for n, name in enumerate(store.names):
+            site: Tuple[str, str] = store.pair(n)
+            prefix: str = '' if store.blocked[n] else '# '
+            if store.flags[n] & HAS_ALIAS:
+                singles.append(" ".join((prefix + self.host, *site, '\n')))
+            else:
+                groups[not store.blocked[n]].append(
+                    (name, *filter(None, site)))
+        for names, prefix in zip(groups, ('', '# ')):
+            names.sort()
+            line: List[str] = [prefix + self.host]
+            for entry in names:
+                if len(line) + len(entry) > width + 2 and len(line) > 1:
+                    yield " ".join(line) + '\n'
+                    line = [prefix + self.host]
+                line.extend(entry[1:])
+            if len(line) > 1:
+                yield " ".join(line) + '\n'
+        yield from singles
+        yield self.foot + '\n'
+
+    def replace_hosts_file(self, block: Iterable[str]) -> None:
+        """ Zapisuje plik hosts jednym przebiegiem: przepisuje wiersze spoza
+        znaczników `BEGIN` i `END` do pliku tymczasowego w tym samym katalogu,
+        w miejsce starego bloku (lub na końcu, jeśli go nie było) wstawia
+        `block`, a następnie podmienia plik przez `os.replace` (zob.
+        `replace_blocks`).
+        block -- wiersze nowego bloku (ze znacznikami i znakami końca wiersza)
+        """
+        self.replace_blocks({self.head: block})
+
+    @timing.traced()
+    def replace_blocks(self, blocks: Dict[str, Iterable[str]]) -> None:
+        """ Podmienia w pliku hosts jednym przebiegiem wiele bloków (np.
+        profili): {znacznik `BEGIN`: nowe wiersze bloku ze znacznikami}.
+        Pozostałe wiersze, także bloki spoza `blocks`, kopiuje bajt po bajcie
+        (znaczniki są szukane w mmap pliku - `find_blocks`), a bloki, których
+        nie było, dopisuje na końcu. Zachowuje uprawnienia
+        i właściciela pliku, `fsync` wywołuje tylko raz. Plik hosts nigdy nie
+        jest widoczny jako pusty lub zapisany do połowy.
+        Podmiana przez plik tymczasowy wymaga przepisania całego pliku - jeśli
+        nowe bloki mają tyle bajtów co stare, są zapisywane w miejscu starych
+        (`splice_blocks`) bez kopiowania reszty pliku.
+        """
+        if self.splice_blocks(blocks):
+            return
+        import tempfile
+        fpath: str = os.path.realpath(self.fpath)
+        st = os.stat(fpath)
+        fd, tmp = tempfile.mkstemp(prefix='.hosts.',
+                                   dir=os.path.dirname(fpath))
+        pending: Dict[str, Iterable[str]] = dict(blocks)
+        try:
+            with open(fd, 'w') as fw, open(fpath, 'rb') as fr:
+                raw = fw.buffer
+                data = mmap.mmap(fr.fileno(), 0, access=mmap.ACCESS_READ) \
+                    if st.st_size else b''
+                # Bajty spoza bloków są kopiowane bez dekodowania wierszy.
+                with memoryview(data) as view:
+                    pos: int = 0
+                    for start, end, head in find_blocks(data, blocks):
+                        raw.write(view[pos:start])
+                        if head in pending:
+                            fw.writelines(pending.pop(head))
+                            fw.flush()
+                        pos = end
+                    raw.write(view[pos:])
+                    last: bytes = data[-1:]
+                if st.st_size:
+                    data.close()
+                if pending and last not in (b'', b'\n'):
+                    raw.write(b'\n')
+                for block in pending.values():
+                    fw.writelines(block)
+                fw.flush()
+                os.fsync(fw.fileno())
+            os.chmod(tmp, stat.S_IMODE(st.st_mode))
+            try:
+                os.chown(tmp, st.st_uid, st.st_gid)
+            except PermissionError:
+                # Bez uprawnień roota plik i tak należy do nas.
+                pass
+            os.replace(tmp, fpath)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+
+    def splice_blocks(self, blocks: Dict[str, Iterable[str]]) -> bool:
+        """ Jak `replace_blocks`, ale zapisuje bloki w miejscu starych, bez
+        pliku tymczasowego - tylko jeśli każdy blok jest już w pliku (jeden
+        raz) i ma w nowej postaci dokładnie tyle bajtów co stara (np. inny
+        adres tej samej długości). Rozmiar pliku się nie zmienia, a każdy
+        zmieniony blok jest zapisywany jednym `write`. Zwraca False i nie
+        zmienia pliku, jeśli tak się nie da - także gdy bloki nie są listami
+        wierszy (np. generator z bazy), bo długości trzeba znać przed zapisem.
+        """
+        if not all(isinstance(lines, (list, tuple))
+                   for lines in blocks.values()):
+            return False
+        new: Dict[str, bytes] = {head: ''.join(lines).encode()
+                                 for head, lines in blocks.items()}
+        with open(self.fpath, 'r+b') as fr:
+            if not os.fstat(fr.fileno()).st_size:
+                return False
+            with mmap.mmap(fr.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                spans: List[Tuple[int, int, str]] = list(find_blocks(mm, new))
+                if sorted(head for _, _, head in spans) != sorted(new) or \
+                        any(end - start != len(new[head])
+                            for start, end, head in spans):
+                    return False
+                changed: List[Tuple[int, bytes]] = [
+                    (start, new[head]) for start, end, head in spans
+                    if mm[start:end] != new[head]]
+            for start, data in changed:
+                fr.seek(start)
+                fr.write(data)
+            if changed:
+                fr.flush()
+                os.fsync(fr.fileno())
+        return True
+
+    def for_profile(self, profile: str or None) -> 'AppModel':
+        """Model tego samego pliku hosts dla innego profilu."""
+        other = AppModel(self.app_name, self.fpath, self.host, profile)
+        other.dense = self.dense
+        other.cache = self.cache
+        other.db = self.db
+        return other
+
+    def load_profiles(self, profiles: Iterable[str or None] or None = None) \
+            -> Dict[str or None, 'AppModel']:
+        """Czyta jednym przebiegiem wszystkie bloki programu (główny i
+        profile). Zwraca {profil: model z wczytanymi `sites`} - jak po
+        `load_sites` dla każdego z nich. Profil None to blok główny.
+        profiles -- tylko te profile (zob. `load_selected`); brakujących
+                    nie ma w wyniku
+        """
+        if profiles is not None:
+            return self.load_selected(profiles)
+        prefix: str = "# BEGIN {}".format(self.app_name)
+        models: Dict[str or None, AppModel] = {}
+        entries: Dict[str or None, List[Tuple[bool, str, str]]] = {}
+        current: List[Tuple[bool, str, str]] or None = None
+        foot: str or None = None
+        other: AppModel or None = None
+        extract = self.extract_entries
+        with open(self.fpath, 'r') as fr:
+            for line in fr:
+                line = line.strip()
+                if not line:
+                    continue
+                if current is None:
+                    if line == prefix or line.startswith(prefix + ':'):
+                        profile = line[len(prefix) + 1:] or None
+                        if profile is None or PROFILE_PATT.match(profile):
+                            other = models[profile] = \
+                                self.for_profile(profile)
+                            foot = other.foot
+                            current = entries.setdefault(profile, [])
+                elif line == foot:
+                    current = None
                 else:
-                    fw.write(" ".join(('#', self.host, *site, '\n')))
-                    # Dla Py < 3,5:
-                    # fw.write(" ".join(('#', self.host, site[0], site[1], '\n')))
-                    # https://stackoverflow.com/a/33973612
-            fw.write(self.foot + '\n')
+                    found = extract(line)
+                    if len(found) > 1:
+                        other.layout = max(other.layout, line_width(found))
+                    current.extend(found)
+        for profile, other in models.items():
+            store: SiteStore = SiteStore.from_sites(entries[profile])
+            store.sort()
+            other.sites = store
+            other.snapshot = store.state()
+        return models
+
+    def load_selected(self, profiles: Iterable[str or None]) -> \
+            Dict[str or None, 'AppModel']:
+        """Jak `load_profiles`, ale parsuje tylko bloki podanych profili -
+        znaczniki są szukane w mmap pliku (`find_blocks`), a wiersze
+        pozostałych bloków nie są ani dekodowane, ani dzielone."""
+        models: Dict[str, AppModel] = {}
+        for profile in profiles:
+            if profile is None or PROFILE_PATT.match(profile):
+                other: AppModel = self.for_profile(profile)
+                models[other.head] = other
+        # Tylko bloki znalezione w pliku.
+        entries: Dict[str, List[Tuple[bool, str, str]]] = {}
+        extract = self.extract_entries
+        with open(self.fpath, 'rb') as fr:
+            if not os.fstat(fr.fileno()).st_size:
+                return {}
+            with mmap.mmap(fr.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                for start, end, head in find_blocks(mm, models):
+                    # Pierwszy wiersz to znacznik `BEGIN`, ostatni - `END`
+                    # (jeśli jest).
+                    lines = mm[start:end].decode().splitlines()[1:]
+                    foot: str = models[head].foot
+                    current = entries.setdefault(head, [])
+                    other = models[head]
+                    for line in lines:
+                        line = line.strip()
+                        if line and line != foot:
+                            found = extract(line)
+                            if len(found) > 1:
+                                other.layout = max(other.layout,
+                                                   line_width(found))
+                            current.extend(found)
+        found: Dict[str or None, AppModel] = {}
+        for head, block in entries.items():
+            other = models[head]
+            store: SiteStore = SiteStore.from_sites(block)
+            store.sort()
+            other.sites = store
+            other.snapshot = store.state()
+            found[other.profile] = other
+        return found
+
+    def write_profiles(self, models: Iterable['AppModel']) -> \
+            Dict[str or None, BlockDiff]:
+        """Zapisuje bloki podanych modeli profili (zob. `load_profiles`)
+        jednym przebiegiem przez plik (`replace_blocks`). Bloki pozostałych
+        profili nie są zmieniane. Zwraca {profil: `BlockDiff`}.
+        Z bazą (`db`) zmiany są też zapisywane w bazie."""
+        blocks: Dict[str, List[str]] = {}
+        diffs: Dict[str or None, BlockDiff] = {}
+        states: List[Tuple[AppModel, Dict[str, int]]] = []
+        for other in models:
+            entries: Dict[str, int] = other.sites.state()
+            diffs[other.profile] = other.diff_sites(entries)
+            states.append((other, entries))
+        changed: bool = any(any(diff) for diff in diffs.values())
+        for other, entries in states:
+            # Układ wierszy zmienia się tylko razem z zapisem pliku.
+            layout: int = other.row_names() if changed else other.layout
+            if self.db is not None:
+                self.db.apply(other.head, other.sites, other.snapshot, entries,
+                              layout)
+            blocks[other.head] = list(other.render_block(other.sites))
+            other.snapshot = entries
+            other.block_hash = None
+            other.disk_hash = None
+            other.layout = layout
+        if changed:
+            self.replace_blocks(blocks)
+        return diffs
 
+    @timing.traced()
     def clear_hosts_file(self) -> None:
         """ Usuwa wiersze pomiędzy znacznikami `BEGIN` i `END` włacznie z samymi
-        liniami ze znacznikami.
-        """
-        with open(self.fpath, 'r+') as fr:
-            fr.seek(0)
-            rewritten: List[str] = []
-            rewrite: bool = True
-            # readlines() - niewydajne dla dużych plików, ale hosts jest mały
-            for line in fr.readlines():
-                if line.startswith(self.head):
-                    rewrite = False
-                elif line.startswith(self.foot):
-                    rewrite = True
-                    continue
-                if rewrite:
-                    rewritten.append(line)
-            fr.truncate(0)
-            fr.seek(0)
-            fr.write(''.join(rewritten))
+        liniami ze znacznikami. Znaczniki są szukane w bajtach pliku przez
+        mmap (`find_blocks`), a zapisywana jest tylko część pliku za początkiem
+        bloku - koszt nie zależy od wierszy przed blokiem. Jeśli bloku nie
+        ma, plik nie jest zmieniany.
+        """
+        with open(self.fpath, 'r+b') as fr:
+            if not os.fstat(fr.fileno()).st_size:
+                return
+            with mmap.mmap(fr.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                spans: List[Tuple[int, int, str]] = list(
+                    find_blocks(mm, (self.head,)))
+                if not spans:
+                    return
+                ends: List[int] = [end for _, end, _ in spans]
+                starts: List[int] = [start for start, _, _ in spans[1:]]
+                tail: bytes = b''.join(mm[end:start] for end, start
+                                       in zip(ends, starts + [len(mm)]))
+            fr.seek(spans[0][0])
+            fr.write(tail)
+            fr.truncate()
 
 
 def main():
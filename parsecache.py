@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""Trwała pamięć podręczna odczytanego bloku pliku hosts.
+
+Przy starcie programu `AppModel.load_sites` zamiast parsować cały blok
+wyrażeniami regularnymi wczytuje gotową listę stron (`SiteStore`) zapisaną
+przy poprzednim odczycie lub zapisie pliku. Wpis jest ważny, jeśli plik ma
+ten sam i-węzeł, rozmiar i czas modyfikacji co przy zapisie wpisu. Gdy
+różni się tylko `os.stat` (np. po `touch` albo zmianie innego bloku),
+wpis jest nadal użyty, o ile skrót wierszy bloku (jak w
+`AppModel.read_block`) jest taki sam - policzenie skrótu jest dużo tańsze
+od parsowania.
+
+Wpisy są plikami `marshal` w katalogu `$XDG_CACHE_HOME/siteblocker`
+(domyślnie `~/.cache/siteblocker`), po jednym na plik hosts i blok.
+Łączny rozmiar katalogu jest ograniczony (`CACHE_LIMIT`) - przy zapisie
+usuwane są najdawniej używane wpisy. Błędy odczytu i zapisu pamięci
+podręcznej nie przerywają programu - wtedy plik hosts jest po prostu
+parsowany.
+
+Program zwykle działa jako root (przez sudo), a `$XDG_CACHE_HOME` może
+wskazywać katalog zwykłego użytkownika. Wpis jest więc czytany tylko,
+jeśli jest zwykłym plikiem należącym do bieżącego (efektywnego)
+użytkownika i nikt inny nie może go zmieniać - inaczej użytkownik mógłby
+podsunąć listę stron zapisywaną potem do pliku hosts.
+"""
+
+from typing import List, NamedTuple, Tuple
+import hashlib
+import marshal
+import os
+import stat
+import time
+
+# Zmiana formatu wpisu unieważnia wszystkie zapisane wpisy.
+CACHE_VERSION: int = 4
+CACHE_LIMIT: int = 128 * 1024 * 1024
+SUFFIX: str = ".cache"
+# Wpis zapisany tuż po zmianie pliku nie zapamiętuje `os.stat`: zmiana
+# w tym samym takcie zegara systemu plików mogłaby nie zmienić czasu
+# modyfikacji. Następny odczyt sprawdzi wtedy skrót bloku.
+RACY_SECONDS: float = 2.0
+
+
+class CacheEntry(NamedTuple):
+    """Wpis pamięci podręcznej.
+    signature -- (i-węzeł, rozmiar, mtime_ns) pliku hosts albo None
+    digest -- skrót wierszy bloku (jak `AppModel.disk_hash`)
+    ordered -- czy lista jest już posortowana (`SiteStore.sort`)
+    parts -- lista stron (`SiteStore.to_parts`)
+    layout -- układ wierszy bloku (`AppModel.layout`)
+    """
+    signature: Tuple[int, int, int] or None
+    digest: bytes
+    ordered: bool
+    parts: tuple
+    layout: int = 0
+
+
+def file_signature(fpath: str) -> Tuple[int, int, int] or None:
+    """(i-węzeł, rozmiar, mtime_ns) pliku albo None, jeśli go nie ma."""
+    try:
+        st = os.stat(fpath)
+    except OSError:
+        return None
+    return st.st_ino, st.st_size, st.st_mtime_ns
+
+
+def trusted(st: os.stat_result) -> bool:
+    """Czy wpis o `os.stat` `st` można wczytać: zwykły plik bieżącego
+    użytkownika, którego nie mogą zmieniać grupa ani inni."""
+    return stat.S_ISREG(st.st_mode) and st.st_uid == os.geteuid() and \
+        not st.st_mode & (stat.S_IWGRP | stat.S_IWOTH)
+
+
+def default_dir(app_name: str) -> str:
+    """Katalog pamięci podręcznej programu zgodnie z XDG."""
+    base: str = os.environ.get('XDG_CACHE_HOME') or \
+        os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(base, app_name.lower())
+
+
+class ParseCache:
+    """Wpisy w katalogu `directory` o łącznym rozmiarze do `limit` bajtów."""
+
+    def __init__(self, directory: str, limit: int = CACHE_LIMIT) -> None:
+        self.directory = directory
+        self.limit = limit
+
+    def path(self, fpath: str, head: str) -> str:
+        """Plik wpisu dla pliku hosts `fpath` i bloku o znaczniku `head`."""
+        key: bytes = os.fsencode(os.path.realpath(fpath)) + b'\0' + \
+            head.encode()
+        return os.path.join(self.directory,
+                            hashlib.sha1(key).hexdigest()[:20] + SUFFIX)
+
+    def load(self, fpath: str, head: str) -> CacheEntry or None:
+        """Zwraca zapisany wpis albo None (brak wpisu, uszkodzony wpis, inny
+        format, obcy plik - `trusted`). Ważność wpisu sprawdza wywołujący
+        (`AppModel.load_sites`).
+        """
+        path: str = self.path(fpath, head)
+        try:
+            with open(path, 'rb') as fr:
+                if not trusted(os.fstat(fr.fileno())):
+                    return None
+                data = marshal.loads(fr.read())
+            version, key, block, signature, digest, ordered, parts, \
+                layout = data
+        except (OSError, EOFError, ValueError, TypeError):
+            return None
+        if version != CACHE_VERSION or key != os.path.realpath(fpath) or \
+                block != head:
+            return None
+        try:
+            # Czas użycia - usuwane są najdawniej używane wpisy.
+            os.utime(path)
+        except OSError:
+            pass
+        return CacheEntry(signature and tuple(signature), digest, ordered,
+                          parts, layout)
+
+    def save(self, fpath: str, head: str, entry: CacheEntry) -> bool:
+        """Zapisuje wpis (atomowo, przez plik tymczasowy) i usuwa najdawniej
+        używane wpisy ponad limit. Zwraca False, jeśli wpis nie został
+        zapisany (błąd albo wpis większy niż cały limit)."""
+        signature = entry.signature
+        if signature is not None and \
+                signature[2] >= (time.time() - RACY_SECONDS) * 1e9:
+            signature = None
+        path: str = self.path(fpath, head)
+        data: bytes = marshal.dumps((CACHE_VERSION, os.path.realpath(fpath),
+                                     head, signature, entry.digest,
+                                     entry.ordered, entry.parts,
+                                     entry.layout))
+        if len(data) > self.limit:
+            self.discard(fpath, head)
+            return False
+        tmp: str = "{}.{}.tmp".format(path, os.getpid())
+        try:
+            os.makedirs(self.directory, mode=0o700, exist_ok=True)
+            # O_EXCL i O_NOFOLLOW - nie przez podstawione dowiązanie.
+            fd: int = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_EXCL |
+                              os.O_NOFOLLOW, 0o600)
+            with open(fd, 'wb') as fw:
+                fw.write(data)
+            os.replace(tmp, path)
+        except OSError:
+            try:
+                os.unlink(tmp)
+            except OSError:
+                pass
+            return False
+        self.evict(keep=path)
+        return True
+
+    def discard(self, fpath: str, head: str) -> None:
+        try:
+            os.unlink(self.path(fpath, head))
+        except OSError:
+            pass
+
+    def evict(self, keep: str or None = None) -> None:
+        """Usuwa najdawniej używane wpisy, aż łączny rozmiar zmieści się
+        w limicie. Wpis `keep` (właśnie zapisany) zostaje."""
+        entries: List[Tuple[float, int, str]] = []
+        try:
+            with os.scandir(self.directory) as it:
+                for item in it:
+                    if item.name.endswith(SUFFIX) and item.is_file():
+                        st = item.stat()
+                        entries.append((st.st_mtime, st.st_size, item.path))
+        except OSError:
+            return
+        total: int = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.limit:
+                break
+            if path == keep:
+                continue
+            try:
+                os.unlink(path)
+            except OSError:
+                continue
+            total -= size
+
+    def clear(self) -> None:
+        """Usuwa wszystkie wpisy."""
+        try:
+            names: List[str] = os.listdir(self.directory)
+        except OSError:
+            return
+        for name in names:
+            if name.endswith(SUFFIX):
+                try:
+                    os.unlink(os.path.join(self.directory, name))
+                except OSError:
+                    pass
+
+
+def main():
+    ParseCache(default_dir("SiteBlocker")).evict()
+
+
+if __name__ == "__main__":
+    # execute only if run as a script
+    main()
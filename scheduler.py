@@ -0,0 +1,263 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""Blokowanie stron w wybranych godzinach (np. tylko w czasie pracy).
+
+Plik harmonogramu - każdy wiersz to grupa albo reguła:
+
+    # komentarz
+    media = facebook.com youtube.com
+    pn-pt 09:00-17:00 @media reddit.com
+    so,nd 22:00-06:00 netflix.com
+
+Reguła przypisuje okno czasowe (dni tygodnia i godziny, także przez
+północ) stronom i grupom (`@nazwa`). Strona jest zablokowana, jeśli trwa
+którekolwiek z jej okien, a poza nimi odblokowana. Dni: pn wt sr cz pt so nd
+(albo mon ... sun), zakresy `pn-pt`, listy `so,nd`, `*` - codziennie.
+
+Harmonogram nie sprawdza zegara co chwilę: śpi do najbliższej zmiany
+(`Schedule.next_transition`), a wtedy zmienia tylko strony, których stan
+się zmienił, i zapisuje plik hosts jeden raz.
+
+    python3 KATALOG_PROGRAMU schedule PLIK [--once]
+"""
+
+from typing import Dict, FrozenSet, Iterable, List, NamedTuple, Tuple
+import datetime
+import re
+import time
+
+import model
+
+DAYS: Dict[str, int] = {'pn': 0, 'wt': 1, 'sr': 2, 'śr': 2, 'cz': 3, 'pt': 4,
+                        'so': 5, 'nd': 6, 'mon': 0, 'tue': 1, 'wed': 2,
+                        'thu': 3, 'fri': 4, 'sat': 5, 'sun': 6}
+HOURS_PATT = re.compile(r"^(\d{1,2}):(\d{2})-(\d{1,2}):(\d{2})$")
+GROUP_PATT = re.compile(r"^(\w+)\s*=\s*(.*)$")
+MINUTES_PER_DAY: int = 24 * 60
+# Najdłuższy sen - po uśpieniu komputera lub zmianie czasu zegar jest
+# sprawdzany ponownie najpóźniej po godzinie.
+MAX_SLEEP: float = 3600.0
+ERRMSG: Dict[str, str] = {'syntax': "Wiersz {}: niepoprawna reguła: {}",
+                          'days': "Wiersz {}: nieznany dzień: {}",
+                          'hours': "Wiersz {}: niepoprawne godziny: {}",
+                          'group': "Wiersz {}: nieznana grupa: {}",
+                          'domain': "Wiersz {}: niepoprawny adres: {}"}
+# 'syntax': "Line {}: invalid rule: {}"
+# 'days': "Line {}: unknown day: {}"
+# 'hours': "Line {}: invalid hours: {}"
+# 'group': "Line {}: unknown group: {}"
+# 'domain': "Line {}: invalid address: {}"
+
+
+class ScheduleError(ValueError):
+    """Błąd w pliku harmonogramu."""
+
+
+class Window(NamedTuple):
+    """Okno czasowe: dni tygodnia (0 - poniedziałek) i godziny w minutach
+    od północy. Jeśli `end <= start`, okno trwa do `end` następnego dnia."""
+    days: FrozenSet[int]
+    start: int
+    end: int
+
+    def __contains__(self, now: datetime.datetime) -> bool:
+        minute: int = now.hour * 60 + now.minute
+        if self.start < self.end:
+            return now.weekday() in self.days and \
+                self.start <= minute < self.end
+        # Przez północ: wieczór dnia z listy albo rano dnia następnego.
+        if minute >= self.start:
+            return now.weekday() in self.days
+        return minute < self.end and (now.weekday() - 1) % 7 in self.days
+
+    def next_transition(self, now: datetime.datetime) -> datetime.datetime:
+        """Najbliższy początek lub koniec okna po `now` (okno z poprzedniego
+        dnia może kończyć się dzisiaj)."""
+        midnight = now.replace(hour=0, minute=0, second=0, microsecond=0)
+        overnight: int = 0 if self.start < self.end else 1
+        moments: List[datetime.datetime] = []
+        for offset in range(-1, 8):
+            day = midnight + datetime.timedelta(days=offset)
+            if day.weekday() in self.days:
+                moments.append(day + datetime.timedelta(minutes=self.start))
+                moments.append(day + datetime.timedelta(days=overnight,
+                                                        minutes=self.end))
+        return min(m for m in moments if m > now)
+
+
+def parse_days(text: str) -> FrozenSet[int]:
+    """'pn-pt' -> {0..4}, 'so,nd' -> {5, 6}, '*' -> wszystkie dni."""
+    if text == '*':
+        return frozenset(range(7))
+    days = set()
+    for part in text.lower().split(','):
+        first, _, last = part.partition('-')
+        a, b = DAYS[first], DAYS[last or first]
+        days.update((a + i) % 7 for i in range((b - a) % 7 + 1))
+    return frozenset(days)
+
+
+def parse_hours(text: str) -> Tuple[int, int]:
+    """'09:00-17:30' -> (540, 1050)."""
+    m = HOURS_PATT.match(text)
+    if m is None:
+        raise ValueError(text)
+    h1, m1, h2, m2 = map(int, m.groups())
+    if h1 > 23 or h2 > 24 or m1 > 59 or m2 > 59:
+        raise ValueError(text)
+    return h1 * 60 + m1, (h2 * 60 + m2) % MINUTES_PER_DAY
+
+
+class Schedule:
+    """Okna czasowe stron. Strony z tym samym zestawem okien są trzymane
+    razem (`groups`), więc stan tysięcy stron z jednej reguły jest liczony
+    raz."""
+
+    def __init__(self, rules: Dict[str, Iterable[Window]] or None = None):
+        self.rules: Dict[str, FrozenSet[Window]] = {}
+        for domain, windows in (rules or {}).items():
+            self.add(domain, windows)
+
+    def add(self, domain: str, windows: Iterable[Window]) -> None:
+        self.rules[domain] = self.rules.get(domain, frozenset()) | \
+            frozenset(windows)
+
+    @property
+    def groups(self) -> Dict[FrozenSet[Window], List[str]]:
+        groups: Dict[FrozenSet[Window], List[str]] = {}
+        for domain, windows in self.rules.items():
+            groups.setdefault(windows, []).append(domain)
+        return groups
+
+    def blocked_at(self, now: datetime.datetime) -> Dict[str, bool]:
+        """{strona: czy ma być zablokowana} w chwili `now`."""
+        state: Dict[str, bool] = {}
+        for windows, domains in self.groups.items():
+            active: bool = any(now in w for w in windows)
+            state.update(dict.fromkeys(domains, active))
+        return state
+
+    def next_transition(self, now: datetime.datetime) -> \
+            datetime.datetime or None:
+        """Najbliższa chwila po `now`, w której zmienia się stan którejś
+        strony; None, jeśli harmonogram jest pusty."""
+        windows = set()
+        for group in self.rules.values():
+            windows.update(group)
+        return min((w.next_transition(now) for w in windows), default=None)
+
+
+def parse_domain(num: int, name: str) -> str:
+    """Adres z wiersza `num` po normalizacji (`model.normalize_domain`) -
+    z `www.`, jeśli tak go podano. Podnosi `ScheduleError` dla
+    niepoprawnego adresu."""
+    site, _ = model.normalize_domain(name)
+    if site is None:
+        raise ScheduleError(ERRMSG['domain'].format(num, name))
+    return site[1] if name.lower().startswith('www.') else site[0]
+
+
+def parse_schedule(lines: Iterable[str]) -> Schedule:
+    """Odczytuje harmonogram z wierszy pliku (zob. opis modułu). Adresy
+    są sprawdzane jak wpisane ręcznie (`parse_domain`). Podnosi
+    `ScheduleError` z numerem błędnego wiersza."""
+    schedule = Schedule()
+    groups: Dict[str, List[str]] = {}
+    for num, line in enumerate(lines, 1):
+        line = line.split('#', 1)[0].strip()
+        if not line:
+            continue
+        m = GROUP_PATT.match(line)
+        if m is not None:
+            groups[m.group(1)] = [parse_domain(num, name)
+                                  for name in m.group(2).split()]
+            continue
+        fields: List[str] = line.split()
+        if len(fields) < 3:
+            raise ScheduleError(ERRMSG['syntax'].format(num, line))
+        try:
+            days = parse_days(fields[0])
+        except KeyError:
+            raise ScheduleError(ERRMSG['days'].format(num, fields[0]))
+        try:
+            start, end = parse_hours(fields[1])
+        except ValueError:
+            raise ScheduleError(ERRMSG['hours'].format(num, fields[1]))
+        window = Window(days, start, end)
+        for name in fields[2:]:
+            if name.startswith('@'):
+                if name[1:] not in groups:
+                    raise ScheduleError(ERRMSG['group'].format(num, name))
+                domains = groups[name[1:]]
+            else:
+                domains = [parse_domain(num, name)]
+            for domain in domains:
+                schedule.add(domain, (window,))
+    return schedule
+
+
+class Clock:
+    """Zegar systemowy; w testach zastępowany zegarem z ręcznie
+    przesuwanym czasem."""
+
+    def now(self) -> datetime.datetime:
+        return datetime.datetime.now()
+
+    def sleep(self, seconds: float) -> None:
+        time.sleep(seconds)
+
+
+class Scheduler:
+    """Stosuje `schedule` do listy stron `app_model` i zapisuje plik hosts.
+    clock -- obiekt z metodami `now()` i `sleep(sekundy)` (domyślnie `Clock`)
+    """
+
+    def __init__(self, app_model: model.AppModel, schedule: Schedule,
+                 clock=None) -> None:
+        self.model = app_model
+        self.schedule = schedule
+        self.clock = clock or Clock()
+
+    def step(self) -> model.BlockDiff:
+        """Czyta plik hosts, zmienia stan stron, które według harmonogramu
+        powinny mieć inny, brakujące strony do zablokowania dodaje i zapisuje
+        plik jeden raz (tylko jeśli coś się zmieniło)."""
+        sites: model.SiteStore = self.model.load_sites()
+        changed: bool = False
+        for domain, blocked in self.schedule.blocked_at(
+                self.clock.now()).items():
+            n: int or None = sites.position(domain)
+            if n is None:
+                if blocked:
+                    sites.append(self.model.complete_user_input(domain), True)
+                    changed = True
+            elif bool(sites.blocked[n]) != blocked:
+                sites.set_blocked(n, blocked)
+                changed = True
+        if not changed:
+            return model.BlockDiff(0, 0, 0)
+        return self.model.write_file(sites, atomic=True)
+
+    def run(self, steps: int or None = None) -> None:
+        """Stosuje harmonogram i śpi do następnej zmiany. `steps` ogranicza
+        liczbę przebiegów (dla testów); None - bez końca."""
+        while steps is None or steps > 0:
+            self.step()
+            now: datetime.datetime = self.clock.now()
+            moment = self.schedule.next_transition(now)
+            if moment is None:
+                return
+            self.clock.sleep(min(MAX_SLEEP,
+                                 (moment - now).total_seconds()))
+            if steps is not None:
+                steps -= 1
+
+
+def main():
+    parse_schedule(["pn-pt 09:00-17:00 example.com"])
+
+
+if __name__ == "__main__":
+    # execute only if run as a script
+    main()
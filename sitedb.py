@@ -0,0 +1,240 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""Opcjonalna baza SQLite z listą stron i danymi, których nie da się zapisać
+w pliku hosts: kto i kiedy dodał stronę, z której listy (np. nazwa
+importowanego pliku) i ile razy była blokowana (`hits`).
+
+Gdy `AppModel.db` jest ustawione, baza jest źródłem listy: `load_sites`
+czyta strony z bazy (przy pierwszym użyciu importuje blok z pliku hosts),
+a `write_file` zapisuje zmiany w bazie i tworzy blok pliku hosts zapytaniem
+czytanym wiersz po wierszu (`render`) - cała lista nie jest budowana
+w pamięci jako tekst. Wiersze bloku są składane przez SQLite w tym samym
+formacie co `AppModel.render_block`.
+
+Zapytania (`query`) korzystają z indeksów: kolejność bloku (blok, klucz
+sortowania, adres - jak `SiteStore.sort`), lista i czas dodania.
+
+    python3 KATALOG_PROGRAMU --db PLIK query [--list NAZWA] [--since DNI]
+"""
+
+from typing import Dict, Iterable, Iterator, NamedTuple, Tuple
+import getpass
+import os
+import sqlite3
+import time
+
+import model
+
+SCHEMA: str = """
+CREATE TABLE IF NOT EXISTS sites (
+    block TEXT NOT NULL,
+    name TEXT NOT NULL,
+    sort_key TEXT NOT NULL,
+    flags INTEGER NOT NULL,
+    alias TEXT,
+    blocked INTEGER NOT NULL,
+    list TEXT,
+    added_at REAL NOT NULL,
+    added_by TEXT,
+    hits INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (block, name)
+);
+CREATE INDEX IF NOT EXISTS sites_order ON sites (block, sort_key, name);
+CREATE INDEX IF NOT EXISTS sites_block_list ON sites (block, list);
+CREATE INDEX IF NOT EXISTS sites_block_added ON sites (block, added_at);
+CREATE TABLE IF NOT EXISTS blocks (
+    block TEXT PRIMARY KEY,
+    layout INTEGER NOT NULL DEFAULT 0
+);
+"""
+# Wiersz bloku jak w `AppModel.render_block`:
+# [# ]host adres.com www.adres.com \n
+RENDER: str = """
+SELECT CASE WHEN blocked THEN '' ELSE '# ' END || :host || ' ' ||
+       CASE WHEN flags & 1 THEN name ELSE '' END || ' ' ||
+       CASE WHEN flags & 2 THEN 'www.' || name
+            WHEN flags & 4 THEN alias ELSE '' END || ' ' || :nl
+FROM sites WHERE block = :block ORDER BY sort_key, name
+"""
+INSERT: str = ("INSERT OR {} INTO sites (block, name, sort_key, flags, alias, "
+               "blocked, list, added_at, added_by) "
+               "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)")
+
+
+class SiteRecord(NamedTuple):
+    """Pozycja bazy zwracana przez `query`."""
+    block: str
+    name: str
+    alias: str
+    blocked: bool
+    source: str or None  # kolumna `list`
+    added_at: float
+    added_by: str or None
+    hits: int
+
+
+def current_user() -> str or None:
+    """Użytkownik, który uruchomił program (także przez sudo)."""
+    try:
+        return os.environ.get('SUDO_USER') or getpass.getuser()
+    except (KeyError, OSError):
+        return None
+
+
+class SiteDatabase:
+    """Baza stron w pliku `path` (':memory:' - w pamięci).
+    source -- nazwa listy zapisywana przy nowych pozycjach (np. nazwa
+              importowanego pliku); None - dodane ręcznie
+    clock -- funkcja zwracająca bieżący czas (jak `time.time`)
+    """
+
+    def __init__(self, path: str, clock=time.time) -> None:
+        self.path = path
+        self.clock = clock
+        self.source: str or None = None
+        self.user: str or None = current_user()
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode = WAL")
+        self.conn.execute("PRAGMA synchronous = NORMAL")
+        self.conn.executescript(SCHEMA)
+
+    def close(self) -> None:
+        self.conn.close()
+
+    def has_block(self, block: str) -> bool:
+        """Czy blok (znacznik `BEGIN`) był już zapisany w bazie."""
+        return self.conn.execute("SELECT 1 FROM blocks WHERE block = ?",
+                                 (block,)).fetchone() is not None
+
+    def layout(self, block: str) -> int:
+        """Układ wierszy bloku przy ostatnim zapisie (`AppModel.layout`)."""
+        row = self.conn.execute("SELECT layout FROM blocks WHERE block = ?",
+                                (block,)).fetchone()
+        return row[0] if row is not None else 0
+
+    def load_store(self, block: str) -> model.SiteStore:
+        """Strony bloku jako `SiteStore` w kolejności `SiteStore.sort` -
+        odczyt wg indeksu, bez sortowania."""
+        names = []
+        flags = bytearray()
+        blocked = model.BitArray()
+        aliases: Dict[int, str] = {}
+        cursor = self.conn.execute(
+            "SELECT name, flags, alias, blocked FROM sites WHERE block = ? "
+            "ORDER BY sort_key, name", (block,))
+        for n, (name, flag, alias, state) in enumerate(cursor):
+            names.append(name)
+            flags.append(flag)
+            blocked.append(state)
+            if flag & model.HAS_ALIAS:
+                aliases[n] = alias
+        return model.SiteStore.from_parts((names, flags, blocked.bits,
+                                           blocked.size, aliases))
+
+    def rows(self, block: str, store: model.SiteStore,
+             names: Iterable[str]) -> Iterator[tuple]:
+        """Wiersze tabeli `sites` dla podanych adresów z `store`."""
+        index, aliases = store.index, store.aliases
+        now: float = self.clock()
+        for name in names:
+            n: int = index[name]
+            flag: int = store.flags[n]
+            yield (block, name, model.sort_name(name), flag, aliases.get(n),
+                   store.blocked[n], self.source, now, self.user)
+
+    def apply(self, block: str, store: model.SiteStore,
+              old: Dict[str, int], new: Dict[str, int],
+              layout: int = 0) -> None:
+        """Zapisuje w bazie zmiany listy `store` - stan `new`
+        (`SiteStore.state`) względem `old` - i układ wierszy bloku `layout`
+        w jednej transakcji. Pozycje tylko przełączone zachowują dane (kto,
+        kiedy, lista, `hits`).
+        """
+        added = []
+        toggled = []
+        for name, state in new.items():
+            prev: int or None = old.get(name)
+            if prev is None or (prev ^ state) & 0x7f:
+                added.append(name)
+            elif prev != state:
+                toggled.append(name)
+        removed = [(block, name) for name in old if name not in new]
+        with self.conn:
+            self.conn.executemany(
+                "DELETE FROM sites WHERE block = ? AND name = ?", removed)
+            self.conn.executemany(INSERT.format('REPLACE'),
+                                  self.rows(block, store, added))
+            # Brakujące w bazie (np. po zmianie pliku hosts z zewnątrz).
+            self.conn.executemany(INSERT.format('IGNORE'),
+                                  self.rows(block, store, toggled))
+            self.conn.executemany(
+                "UPDATE sites SET blocked = ? WHERE block = ? AND name = ?",
+                ((new[name] >> 7, block, name) for name in toggled))
+            self.conn.execute("INSERT OR REPLACE INTO blocks VALUES (?, ?)",
+                              (block, layout))
+
+    def render(self, block: str, host: str) -> Iterator[str]:
+        """Generator - wiersze bloku (bez znaczników) czytane z kursora."""
+        cursor = self.conn.execute(RENDER, {'host': host, 'nl': '\n',
+                                            'block': block})
+        for line, in cursor:
+            yield line
+
+    def add_hits(self, block: str, counts: Dict[str, int]) -> None:
+        """Dodaje liczby zapytań o strony bloku ({adres: liczba}) - zbierane
+        przez `dnssink` (`cli dns --db`)."""
+        with self.conn:
+            self.conn.executemany(
+                "UPDATE sites SET hits = hits + ? WHERE block = ? AND "
+                "name = ?", ((hits, block, name)
+                             for name, hits in counts.items()))
+
+    def query(self, block: str or None = None, source: str or None = None,
+              since: float or None = None) -> Iterator[SiteRecord]:
+        """Generator - pozycje bloku `block`, z listy `source` i dodane
+        od chwili `since` (każdy warunek opcjonalny). Bez `source` i `since`
+        pozycje są wg adresu, a z nimi - w kolejności indeksu warunku."""
+        sql, params = self.query_sql(block, source, since)
+        for row in self.conn.execute(sql, params):
+            block_, name, flag, alias, blocked = row[:5]
+            if flag & model.HAS_WWW:
+                alias = "www." + name
+            yield SiteRecord(block_, name if flag & model.HAS_BARE else '',
+                             alias or '', bool(blocked), *row[5:])
+
+    def query_sql(self, block: str or None = None, source: str or None = None,
+                  since: float or None = None) -> Tuple[str, list]:
+        """Zapytanie SQL i jego parametry dla `query`. Z blokiem (tak pyta
+        `cli`) warunki `source` i `since` używają indeksów złożonych
+        `sites_block_list` i `sites_block_added`."""
+        where = []
+        params = []
+        for column, op, value in (('block', '=', block),
+                                  ('list', '=', source),
+                                  ('added_at', '>=', since)):
+            if value is not None:
+                where.append("{} {} ?".format(column, op))
+                params.append(value)
+        sql: str = ("SELECT block, name, flags, alias, blocked, list, "
+                    "added_at, added_by, hits FROM sites")
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        if source is None and since is None:
+            sql += " ORDER BY block, sort_key, name"
+        return sql, params
+
+    def plan(self, sql: str, params: Tuple = ()) -> str:
+        """Plan zapytania (`EXPLAIN QUERY PLAN`) - np. do sprawdzenia, czy
+        używa indeksu."""
+        return "\n".join(row[-1] for row in self.conn.execute(
+            "EXPLAIN QUERY PLAN " + sql, params))
+
+
+def main():
+    SiteDatabase(':memory:').close()
+
+
+if __name__ == "__main__":
+    # execute only if run as a script
+    main()
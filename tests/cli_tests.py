@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import cli
+import contextlib
+import io
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+HOSTS_FILE = r"""127.0.0.1    localhost
+# BEGIN SiteBlocker
+# 127.0.0.1 python.org www.python.org
+127.0.0.1 java.com www.java.com
+# END SiteBlocker
+"""
+
+
+class TestCli(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.fpath = os.path.join(self.tmp.name, 'hosts')
+        with open(self.fpath, 'w') as fw:
+            fw.write(HOSTS_FILE)
+        self.cache_dir = os.path.join(self.tmp.name, 'cache')
+        env = mock.patch.dict(os.environ, XDG_CACHE_HOME=self.cache_dir)
+        env.start()
+        self.addCleanup(env.stop)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def run_cli(self, *argv):
+        out = io.StringIO()
+        with contextlib.redirect_stdout(out):
+            code = cli.main(['--hosts', self.fpath, *argv])
+        return code, out.getvalue()
+
+    def read(self):
+        with open(self.fpath) as fr:
+            return fr.read()
+
+    def test_list(self):
+        testsmap = {(): "+ java.com www.java.com\n"
+                        "- python.org www.python.org\n",
+                    ('--blocked',): "+ java.com www.java.com\n",
+                    ('--unblocked',): "- python.org www.python.org\n"}
+        for args, out in testsmap.items():
+            with self.subTest():
+                self.assertTupleEqual((0, out), self.run_cli('list', *args))
+
+    def test_block_unblock(self):
+        code, out = self.run_cli('block', 'www.python.org', 'perl.org')
+        self.assertEqual(0, code)
+        self.assertEqual(cli.MSG['written'].format(1, 0, 1) + '\n', out)
+        self.assertIn("\n127.0.0.1 python.org www.python.org \n", self.read())
+        self.assertIn("\n127.0.0.1 perl.org www.perl.org \n", self.read())
+        code, out = self.run_cli('unblock', 'java.com')
+        self.assertEqual(cli.MSG['written'].format(0, 0, 1) + '\n', out)
+        self.assertIn("\n# 127.0.0.1 java.com www.java.com \n", self.read())
+        self.assertTrue(self.read().startswith("127.0.0.1    localhost\n"))
+
+    def test_block_errors(self):
+        with contextlib.redirect_stderr(io.StringIO()):
+            self.assertEqual(1, self.run_cli('unblock', 'perl.org')[0])
+            self.assertEqual(2, self.run_cli('block', '?perl.org')[0])
+        self.assertEqual(HOSTS_FILE, self.read())
+
+    def test_block_subdomains_check(self):
+        code, out = self.run_cli('block', '--subdomains', 'python.org')
+        self.assertEqual(0, code)
+        self.assertIn("\n127.0.0.1 python.org www.python.org \n", self.read())
+        self.assertIn("\n127.0.0.1 api.python.org  \n", self.read())
+        code, out = self.run_cli('check', 'docs.python.org', 'java.com',
+                                 'perl.org')
+        self.assertEqual(1, code)
+        self.assertEqual(cli.MSG['covered'].format("docs.python.org",
+                                                   "python.org") + '\n' +
+                         cli.MSG['covered'].format("java.com", "java.com") +
+                         '\n' + cli.MSG['notcovered'].format("perl.org") +
+                         '\n', out)
+
+    def test_rewrite_dense(self):
+        self.run_cli('block', 'perl.org')
+        code, out = self.run_cli('--dense', '4', 'rewrite')
+        self.assertTupleEqual((0, cli.MSG['written'].format(0, 0, 0) + '\n'),
+                              (code, out))
+        self.assertIn("\n127.0.0.1 java.com www.java.com perl.org "
+                      "www.perl.org\n# 127.0.0.1 python.org www.python.org\n",
+                      self.read())
+        code, out = self.run_cli('list', '--blocked')
+        self.assertEqual("+ java.com www.java.com\n+ perl.org www.perl.org\n",
+                         out)
+        # Bez --dense zapis zachowuje układ z pliku, --dense 0 go zmienia.
+        self.run_cli('unblock', 'perl.org')
+        self.assertIn("\n127.0.0.1 java.com www.java.com\n# 127.0.0.1 "
+                      "perl.org www.perl.org python.org www.python.org\n",
+                      self.read())
+        self.run_cli('--dense', '0', 'rewrite')
+        self.assertIn("\n127.0.0.1 java.com www.java.com \n", self.read())
+
+    def test_cache(self):
+        """Blok jest zapamiętywany między wywołaniami, zmiany pliku z
+        zewnątrz są widoczne, `--no-cache` nie używa pamięci podręcznej."""
+        self.run_cli('block', 'perl.org')
+        self.assertEqual(1, len(os.listdir(os.path.join(self.cache_dir,
+                                                        'siteblocker'))))
+        with open(self.fpath, 'w') as fw:
+            fw.write(HOSTS_FILE)
+        self.assertTupleEqual((0, "+ java.com www.java.com\n"),
+                              self.run_cli('list', '--blocked'))
+        with mock.patch('model.AppModel.load_cached') as load:
+            self.run_cli('--no-cache', 'list')
+            load.assert_not_called()
+
+    def test_db(self):
+        db = os.path.join(self.tmp.name, 'sites.db')
+        source = os.path.join(self.tmp.name, 'ads.txt')
+        with open(source, 'w') as fw:
+            fw.write("ads.net\n")
+        self.assertEqual(0, self.run_cli('--db', db, 'import', source)[0])
+        self.assertIn("\n127.0.0.1 ads.net www.ads.net \n", self.read())
+        code, out = self.run_cli('--db', db, 'query', '--list', 'ads.txt')
+        self.assertEqual(0, code)
+        self.assertRegex(out, r"^\+ ads.net www.ads.net\tlista: ads.txt\t"
+                              r"dodana: [-\d]+ [:\d]+ \(.*\)\ttrafienia: 0\n$")
+        self.assertEqual(3, len(self.run_cli('--db', db, 'query', '--since',
+                                             '1')[1].splitlines()))
+        with contextlib.redirect_stderr(io.StringIO()) as err:
+            self.assertEqual(2, self.run_cli('query')[0])
+            self.assertEqual(1, self.run_cli('--db', self.fpath, 'list')[0])
+        self.assertIn(cli.ERRMSG['db'].format(''), err.getvalue())
+
+    def test_profiles(self):
+        code, out = self.run_cli('--profile', 'kids', 'block', 'games.com')
+        self.assertEqual(0, code)
+        self.assertTupleEqual((0, "-                zablokowane: 1 z 2\n"
+                                  "kids             zablokowane: 1 z 1\n"),
+                              self.run_cli('profiles'))
+        self.run_cli('disable', 'kids', '-')
+        self.assertIn("# 127.0.0.1 games.com www.games.com \n"
+                      "# END SiteBlocker:kids\n", self.read())
+        self.assertIn("\n# 127.0.0.1 java.com www.java.com \n", self.read())
+        self.run_cli('enable', 'kids')
+        self.assertTupleEqual(
+            (0, "+ games.com www.games.com\n"),
+            self.run_cli('--profile', 'kids', 'list', '--blocked'))
+        with contextlib.redirect_stderr(io.StringIO()):
+            self.assertEqual(1, self.run_cli('enable', 'work')[0])
+            self.assertEqual(2, self.run_cli('--profile', 'a:b', 'list')[0])
+
+    def test_import_export(self):
+        source = os.path.join(self.tmp.name, 'list.txt')
+        with open(source, 'w') as fw:
+            fw.write("||ads.net^\njava.com\n0.0.0.0 tracker.org\n")
+        code, out = self.run_cli('import', source)
+        self.assertEqual(0, code)
+        self.assertTrue(out.startswith(cli.MSG['imported'].format(2, 1, 0)))
+        target = os.path.join(self.tmp.name, 'export.txt')
+        self.assertEqual(0, self.run_cli('export', target)[0])
+        with open(target) as fr:
+            self.assertEqual("ads.net\njava.com\ntracker.org\n", fr.read())
+        code, out = self.run_cli('export', '--all')
+        self.assertEqual("ads.net\njava.com\npython.org\ntracker.org\n", out)
+
+    def test_no_gui_modules(self):
+        """CLI nie ładuje GUI - sprawdzane w osobnym procesie, bo inne testy
+        importują `view` i `controller` do tego samego `sys.modules`."""
+        code = ("import sys, cli; cli.main(sys.argv[1:]); "
+                "print(sorted({'tkinter', 'view', 'controller'} & "
+                "set(sys.modules)))")
+        out = subprocess.check_output(
+            [sys.executable, '-c', code, '--hosts', self.fpath, 'list'],
+            cwd=ROOT)
+        self.assertEqual("[]", out.decode().splitlines()[-1])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -2,6 +2,7 @@
 # -*- coding: utf-8 -*-
 
 import controller
+import importer
 import model
 import view
 import unittest
@@ -18,24 +19,22 @@ class TestAppController(unittest.TestCase):
         self.c.view = view.AppView()
 
     def test_create_gui(self):
-        lines = ["# 127.0.0.1  www.python.org  python.org  ",
-                 "#127.0.0.1www.pylonsproject.org pylonsproject.org",
-                 "127.0.0.1 flask.pocoo.org www.flask.pocoo.org"]
         sites = [(False, "python.org", "www.python.org"),
                  (True, "flask.pocoo.org", "www.flask.pocoo.org")]
-        self.c.model.read_file = mock.Mock(return_value=lines)
-        self.c.model.extract_sites = mock.Mock(return_value=sites)
+        self.c.model.load_sites = mock.Mock(return_value=sites)
         self.c.create_gui()
-        self.c.model.read_file.assert_called_once()
-        self.c.model.extract_sites.assert_called_once_with(lines)
-        self.c.view.load_from_file.assert_called_once_with(sites)
+        self.c.model.load_sites.assert_called_once_with()
+        self.c.view.load_from_file.assert_called_once_with(self.c.model.sites)
         self.c.view.register.assert_called_once()
         self.c.view.root.title.assert_called_once_with("App 0.0")
         self.c.view.mainloop.assert_called_once()
+        self.c.view.watch_file.assert_called_once_with(
+            self.c.watcher, self.c.on_external_change)
+        self.c.watcher.close()
 
     def test_add_user_input_0(self):
         """user_inp:
-        - zawiera dozwolone znaki - validate_data zwraca True
+        - jest poprawnym adresem - `normalize_domain` zwraca parę adresów
         - nie istnieje na liście stron (all_sites)
         - zostaje więc dodany
         """
@@ -43,67 +42,57 @@ class TestAppController(unittest.TestCase):
         all_sites = [("flask.pocoo.org", "www.flask.pocoo.org"),
                      ("java.com", "www.java.com"),
                      ("python.org", "www.python.org")]
-        validate = True
         compl_user_inp = ("linuxmint.com", "www.linuxmint.com")
-        # self.c.view.get_user_input = mock.Mock(return_value=user_inp)
-        # self.c.view.get_all_sites = mock.Mock(return_value=all_sites)
         pm_user_inp = mock.PropertyMock(return_value=user_inp)
         pm_all_sites = mock.PropertyMock(return_value=all_sites)
         type(self.c.view).user_input = pm_user_inp
         type(self.c.view).all_sites = pm_all_sites
+        self.c.model.sites = model.SiteStore(all_sites)
         # skąd to type()?
         # > Because of the way mock attributes are stored you can’t directly
         # > attach a PropertyMock to a mock object. Instead you can attach it to
         # > the mock type object
         # zob. https://docs.python.org/3.6/library/unittest.mock.html#unittest.mock.PropertyMock
         # zob. https://kristofclaes.github.io/2016/06/24/mocking-properties-in-python/
-        self.c.model.validate_data = mock.Mock(return_value=validate)
-        self.c.model.complete_user_input = mock.Mock(return_value=compl_user_inp)
         self.c.add_user_input()
-        pm_user_inp.assert_called_once_with()
-        pm_all_sites.assert_called_once_with()
         # skąd to assert_called_once_with()?
         # zob. https://docs.python.org/3.6/library/unittest.mock.html#unittest.mock.PropertyMock
-        self.c.model.validate_data.assert_called_once_with(user_inp)
-        self.assertTrue(self.c.model.validate_data())
-        self.c.view.showerr.assert_not_called()
-        self.c.model.complete_user_input.assert_called_once_with(user_inp)
+        pm_user_inp.assert_called_once_with()
+        pm_all_sites.assert_not_called()
+        self.assertIn(compl_user_inp, self.c.model.sites)
+        self.assertEqual(4, len(self.c.model.sites))
         self.c.view.showerr.assert_not_called()
-        self.c.view.add_to_listbox.assert_called_once_with(True, compl_user_inp)
+        self.c.view.show_added.assert_called_once_with()
+        self.assertTupleEqual((3,), self.c.model.sites.selected())
 
     def test_add_user_input_1(self):
         """user_inp:
-        - zawiera dozwolone znaki - `validate_data` zwraca True
-        - ale istnieje już na liście stron (all_sites) - `add_user_input` zwraca
-          False
+        - jest poprawnym adresem
+        - ale istnieje już na liście stron (all_sites), także jako wariant
+          z innymi wielkimi literami - `add_user_input` zwraca False
         - wywołana zostaje funkcja showerr
         - user_inp nie zostaje więc dodany
         """
-        user_inp = "www.python.org"
         all_sites = [("flask.pocoo.org", "www.flask.pocoo.org"),
                      ("java.com", "www.java.com"),
                      ("python.org", "www.python.org")]
-        validate = True
-        compl_user_inp = ("python.org", "www.python.org")
-        pm_user_inp = mock.PropertyMock(return_value=user_inp)
-        pm_all_sites = mock.PropertyMock(return_value=all_sites)
-        type(self.c.view).user_input = pm_user_inp
-        type(self.c.view).all_sites = pm_all_sites
-        self.c.model.validate_data = mock.Mock(return_value=validate)
-        self.c.model.complete_user_input = mock.Mock(return_value=compl_user_inp)
-        result = self.c.add_user_input()
-        pm_user_inp.assert_called_once_with()
-        pm_all_sites.assert_called_once_with()
-        self.c.model.validate_data.assert_called_once_with(user_inp)
-        self.assertTrue(self.c.model.validate_data())
-        self.c.model.complete_user_input.assert_called_once_with(user_inp)
-        self.c.view.showerr.assert_called_once_with(self.c.errmsg['exists'])
-        self.assertFalse(result)
-        self.c.view.add_to_listbox.assert_not_called()
+        for user_inp in ("www.python.org", "Python.ORG", " WWW.Java.com. "):
+            with self.subTest(user_inp=user_inp):
+                self.c.view.reset_mock()
+                pm_user_inp = mock.PropertyMock(return_value=user_inp)
+                type(self.c.view).user_input = pm_user_inp
+                self.c.model.sites = model.SiteStore(all_sites)
+                result = self.c.add_user_input()
+                pm_user_inp.assert_called_once_with()
+                self.assertEqual(3, len(self.c.model.sites))
+                self.c.view.showerr.assert_called_once_with(
+                    self.c.errmsg['exists'])
+                self.assertFalse(result)
+                self.c.view.show_added.assert_not_called()
 
     def test_add_user_input_2(self):
         """user_inp:
-        - zawiera niedozwolone znaki - `validate_data` zwraca False
+        - zawiera niedozwolone znaki - `normalize_domain` zwraca None
         - więc cała funckja zwraca False
         - wywołana zostaje funkcja showerr
         - user_inp nie zostaje dodany
@@ -112,22 +101,138 @@ class TestAppController(unittest.TestCase):
         all_sites = [("flask.pocoo.org", "www.flask.pocoo.org"),
                      ("java.com", "www.java.com"),
                      ("python.org", "www.python.org")]
-        validate = False
-        # compl_user_inp = ("linuxmint.com", "www.linuxmint.com")
         pm_user_inp = mock.PropertyMock(return_value=user_inp)
         pm_all_sites = mock.PropertyMock(return_value=all_sites)
         type(self.c.view).user_input = pm_user_inp
         type(self.c.view).all_sites = pm_all_sites
-        self.c.model.validate_data = mock.Mock(return_value=validate)
-        self.c.model.complete_user_input = mock.Mock()
+        self.c.model.sites = model.SiteStore(all_sites)
         result = self.c.add_user_input()
         pm_user_inp.assert_called_once_with()
-        pm_all_sites.assert_called_once_with()
-        self.c.model.validate_data.assert_called_once_with(user_inp)
+        pm_all_sites.assert_not_called()
+        self.assertEqual(3, len(self.c.model.sites))
         self.c.view.showerr.assert_called_once_with(self.c.errmsg['invalid'])
         self.assertFalse(result)
-        self.c.model.complete_user_input.assert_not_called()
-        self.c.view.add_to_listbox.assert_not_called()
+        self.c.view.show_added.assert_not_called()
+
+    def test_add_user_input_idna(self):
+        """Adres spoza ASCII jest dodawany jako punycode."""
+        type(self.c.view).user_input = mock.PropertyMock(
+            return_value="Zażółć.PL")
+        self.c.model.sites = model.SiteStore()
+        self.c.add_user_input()
+        self.assertListEqual([("xn--za-6ja4f8n1l.pl",
+                               "www.xn--za-6ja4f8n1l.pl")],
+                             list(self.c.model.sites))
+
+    def test_delete_selected(self):
+        all_sites = [("flask.pocoo.org", "www.flask.pocoo.org"),
+                     ("java.com", "www.java.com"),
+                     ("python.org", "www.python.org")]
+        self.c.model.sites = model.SiteStore(all_sites)
+        self.c.model.sites.select((0, 2))
+        type(self.c.view).filter_text = mock.PropertyMock(return_value="")
+        self.c.model.filter_sites.return_value = self.c.model.sites
+        self.c.delete_selected()
+        self.assertListEqual([("java.com", "www.java.com")],
+                             list(self.c.model.sites))
+        self.assertNotIn(("python.org", "www.python.org"), self.c.model.sites)
+        self.c.view.delete_from_listbox.assert_called_once_with()
+        self.c.view.showerr.assert_not_called()
+
+    def test_delete_selected_none(self):
+        """Nie zaznaczono nic do usunięcia, ale kliknięto przycisk usunięcia."""
+        self.c.model.sites = model.SiteStore([("java.com", "www.java.com")])
+        type(self.c.view).filter_text = mock.PropertyMock(return_value="")
+        self.c.model.filter_sites.return_value = self.c.model.sites
+        self.assertFalse(self.c.delete_selected())
+        self.assertEqual(1, len(self.c.model.sites))
+        self.c.view.showerr.assert_called_once_with(self.c.errmsg['notselected'])
+        self.c.view.delete_from_listbox.assert_not_called()
+
+    def test_delete_selected_filtered(self):
+        """Przy aktywnym filtrze usuwane są tylko widoczne zaznaczone strony,
+        a zaznaczone strony ukryte przez filtr zostają."""
+        all_sites = [("flask.pocoo.org", "www.flask.pocoo.org"),
+                     ("java.com", "www.java.com"),
+                     ("python.org", "www.python.org")]
+        self.c.model.sites = model.SiteStore(all_sites)
+        self.c.model.sites.select((0, 2))
+        type(self.c.view).filter_text = mock.PropertyMock(return_value="pyth")
+        self.c.model.filter_sites.return_value = model.FilteredSites(
+            self.c.model.sites, [2])
+        self.c.delete_selected()
+        self.c.model.filter_sites.assert_called_once_with("pyth")
+        self.assertListEqual(all_sites[:2], list(self.c.model.sites))
+        self.assertTupleEqual((0,), self.c.model.sites.selected())
+        self.c.view.delete_from_listbox.assert_called_once_with()
+
+    def test_filter_sites(self):
+        self.c.model.sites = model.SiteStore([("java.com", "www.java.com"),
+                                              ("python.org", "www.python.org")])
+        found = model.FilteredSites(self.c.model.sites, [1])
+        self.c.model.filter_sites.return_value = found
+        pm_filter_text = mock.PropertyMock(return_value="pyth")
+        type(self.c.view).filter_text = pm_filter_text
+        self.assertEqual(1, self.c.filter_sites())
+        self.c.model.filter_sites.assert_called_once_with("pyth")
+        self.c.view.show_filtered.assert_called_once_with(found)
+
+    def test_index_sites(self):
+        """Indeks wyszukiwania jest budowany krokami po `SEARCH_STEP`
+        pozycji."""
+        self.c.model.sites = model.SiteStore(
+            ("site{}.com".format(i), "www.site{}.com".format(i))
+            for i in range(model.SEARCH_STEP + 10))
+        self.assertEqual(10, self.c.index_sites())
+        self.assertEqual(0, self.c.index_sites())
+        self.assertEqual(len(self.c.model.sites),
+                         len(self.c.model.sites.search_index))
+
+    def test_import_file(self):
+        report = importer.ImportReport(5, 3, 2)
+        with mock.patch('importer.import_file', return_value=report) as mimp:
+            result = self.c.import_file("list.txt")
+            mimp.assert_called_once_with(self.c.model, "list.txt", write=False)
+        self.assertTupleEqual(report, result)
+        self.c.view.refresh.assert_called_once_with()
+        self.c.view.showinfo.assert_called_once_with(
+            self.c.msg['imported'].format(5, 3, 2))
+
+    def test_import_file_error(self):
+        with mock.patch('importer.import_file', side_effect=OSError):
+            self.assertFalse(self.c.import_file("missing.txt"))
+        self.c.view.showerr.assert_called_once_with(self.c.errmsg['import'])
+        self.c.view.refresh.assert_not_called()
+
+    def test_block_selected(self):
+        all_sites = [("java.com", "www.java.com")]
+        self.c.model.sites = model.SiteStore(all_sites)
+        self.c.model.reload_block.return_value = model.ReloadDiff(0, 0, 0, ())
+        self.c.block_selected()
+        self.c.model.reload_block.assert_called_once_with()
+        self.c.model.write_file.assert_called_once_with(
+            self.c.model.sites, atomic=True)
+        # Plik obserwowany i bez zmian - zapis bez ponownego odczytu.
+        self.c.model.reload_block.reset_mock()
+        self.c.watcher = mock.Mock()
+        self.c.watcher.changed.return_value = False
+        self.c.block_selected()
+        self.c.model.reload_block.assert_not_called()
+        self.assertEqual(2, self.c.model.write_file.call_count)
+
+    def test_on_external_change(self):
+        testsmap = [((0, 0, 0, ()), False, False),
+                    ((1, 0, 2, ()), True, False),
+                    ((0, 0, 0, ("java.com",)), False, True)]
+        for diff, refresh, conflict in testsmap:
+            with self.subTest(diff=diff):
+                self.c.view.reset_mock()
+                self.c.model.reload_block.return_value = model.ReloadDiff(*diff)
+                self.c.on_external_change()
+                self.assertIs(refresh, self.c.view.refresh.called)
+                self.assertIs(conflict, self.c.view.showerr.called)
+        self.c.model.reload_block.side_effect = FileNotFoundError
+        self.assertFalse(self.c.on_external_change())
 
 
 if __name__ == '__main__':
@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import asyncio
+import dnssink
+import model
+import socket
+import struct
+import unittest
+from unittest import mock
+
+UPSTREAM_ADDR = socket.inet_aton("93.184.216.34")
+
+
+class Upstream(asyncio.DatagramProtocol):
+    """Lokalny serwer zastępujący upstream - na każde pytanie odpowiada
+    stałym adresem."""
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def datagram_received(self, data, addr):
+        query = dnssink.parse_query(data)
+        self.transport.sendto(dnssink.build_response(
+            query, rdata=UPSTREAM_ADDR), addr)
+
+
+async def upstream_tcp(reader, writer):
+    """Lokalny upstream TCP - odpowiada jak `Upstream`, ale z rekordem
+    dłuższym niż pakiet UDP, więc cała odpowiedź jest tylko w TCP."""
+    length, = struct.unpack("!H", await reader.readexactly(2))
+    query = dnssink.parse_query(await reader.readexactly(length))
+    response = dnssink.build_response(query, rdata=UPSTREAM_ADDR * 200)
+    writer.write(struct.pack("!H", len(response)) + response)
+    await writer.drain()
+    writer.close()
+
+
+class Client(asyncio.DatagramProtocol):
+
+    def __init__(self, waiter):
+        self.waiter = waiter
+
+    def datagram_received(self, data, addr):
+        self.waiter.set_result(data)
+
+
+def answer(response: bytes):
+    """Zwraca (rcode, adres z pierwszego rekordu albo None)."""
+    rcode = dnssink.HEADER.unpack_from(response)[1] & 0xF
+    ancount = dnssink.HEADER.unpack_from(response)[3]
+    if not ancount:
+        return rcode, None
+    # Koniec nazwy w pytaniu, typ i klasa, a w rekordzie długość danych.
+    pos = response.index(b"\0", dnssink.HEADER.size) + 5 + 10
+    length, = struct.unpack_from("!H", response, pos)
+    return rcode, response[pos + 2:pos + 2 + length]
+
+
+class TestDnsSink(unittest.TestCase):
+
+    def setUp(self):
+        store = model.SiteStore([("java.com", "www.java.com"),
+                                 ("python.org", "www.python.org")])
+        store.set_blocked(0, True)
+        store.add_subdomains("tracker.net")
+        self.index = dnssink.SinkIndex.from_store(store)
+
+    def test_packets(self):
+        data = dnssink.build_query("WWW.Java.com.", dnssink.QTYPE_AAAA, 7)
+        query = dnssink.parse_query(data)
+        self.assertTupleEqual((7, "www.java.com", dnssink.QTYPE_AAAA),
+                              (query.ident, query.name, query.qtype))
+        with self.assertRaises(dnssink.DnsError):
+            dnssink.parse_query(data[:-3])
+        with self.assertRaises(dnssink.DnsError):
+            dnssink.parse_query(dnssink.build_response(query))
+
+    def test_index(self):
+        testsmap = {"java.com": True, "www.java.com": True,
+                    "python.org": False, "tracker.net": True,
+                    "a.b.tracker.net": True, "net": False,
+                    "xtracker.net": False}
+        for name, out in testsmap.items():
+            with self.subTest(name=name):
+                self.assertIs(out, name in self.index)
+
+    def test_respond(self):
+        sinkhole = dnssink.DnsSinkhole(self.index, "127.0.0.1")
+        testsmap = {
+            ("java.com", dnssink.QTYPE_A): (0, socket.inet_aton("127.0.0.1")),
+            ("cdn.tracker.net", dnssink.QTYPE_AAAA): (0, bytes(16)),
+            ("java.com", 15): (0, None),
+            ("python.org", dnssink.QTYPE_A): (dnssink.RCODE_REFUSED, None)}
+        for args, out in testsmap.items():
+            with self.subTest(args=args):
+                response = sinkhole.respond(dnssink.build_query(*args))
+                self.assertTupleEqual(out, answer(response))
+        self.assertEqual(dnssink.RCODE_FORMERR,
+                         answer(sinkhole.respond(b"\0\1\2"))[0])
+        # Opcode STATUS (2) - NOTIMP, opcode przepisany do odpowiedzi.
+        data = bytearray(dnssink.build_query("java.com", ident=9))
+        data[2] |= 2 << 3
+        response = sinkhole.respond(bytes(data))
+        self.assertTupleEqual((9, 0x9180 | dnssink.RCODE_NOTIMP),
+                              struct.unpack("!HH", response[:4]))
+        sinkhole.upstream = ("127.0.0.1", 53)
+        self.assertIsNone(sinkhole.respond(dnssink.build_query("python.org")))
+        # Zapytania liczone wg pozycji listy (także przez domenę nadrzędną).
+        self.assertDictEqual({"java.com": 2, "cdn.tracker.net": 1},
+                             sinkhole.take_hits())
+        self.assertDictEqual({}, sinkhole.take_hits())
+
+    def test_run_flush(self):
+        """`run` przekazuje liczby zapytań do `flush` co `interval` sekund
+        i przy zakończeniu."""
+        loop = asyncio.new_event_loop()
+        self.addCleanup(loop.close)
+        sinkhole = dnssink.DnsSinkhole(self.index)
+        query = dnssink.build_query("www.java.com")
+        flushed = []
+
+        def flush(hits):
+            flushed.append(hits)
+            if len(flushed) == 1:
+                sinkhole.respond(query)
+                raise KeyboardInterrupt
+        sinkhole.respond(query)
+        with mock.patch('asyncio.get_event_loop', return_value=loop):
+            dnssink.run(sinkhole, port=0, flush=flush, interval=0)
+        self.assertListEqual([{"java.com": 1}, {"java.com": 1}], flushed)
+
+    def test_serve(self):
+        """Zapytania UDP (zablokowane i przekazane dalej) i TCP."""
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        self.addCleanup(loop.close)
+
+        async def scenario():
+            upstream, _ = await loop.create_datagram_endpoint(
+                Upstream, local_addr=("127.0.0.1", 0))
+            upstream_addr = upstream.get_extra_info('sockname')
+            upstream_server = await asyncio.start_server(upstream_tcp,
+                                                         *upstream_addr)
+            sinkhole = dnssink.DnsSinkhole(self.index, upstream=upstream_addr)
+            transport, server = await dnssink.serve(sinkhole, port=0)
+            addr = transport.get_extra_info('sockname')
+            results = []
+            for name in ("www.java.com", "python.org"):
+                waiter = loop.create_future()
+                client, _ = await loop.create_datagram_endpoint(
+                    lambda: Client(waiter), remote_addr=addr)
+                client.sendto(dnssink.build_query(name))
+                results.append(answer(await asyncio.wait_for(waiter, 5)))
+                client.close()
+            # Zadanie przekazujące zapytanie jest trzymane do zakończenia.
+            await asyncio.sleep(0)
+            self.assertSetEqual(set(), transport.get_protocol().pending)
+            reader, writer = await asyncio.open_connection(*addr)
+            query = dnssink.build_query("m.tracker.net")
+            writer.write(struct.pack("!H", len(query)) + query)
+            length, = struct.unpack("!H", await reader.readexactly(2))
+            results.append(answer(await reader.readexactly(length)))
+            # Zapytanie spoza listy przez TCP idzie do upstream przez TCP.
+            query = dnssink.build_query("python.org")
+            writer.write(struct.pack("!H", len(query)) + query)
+            length, = struct.unpack("!H", await reader.readexactly(2))
+            results.append(answer(await reader.readexactly(length)))
+            # Serwer zamyka połączenie po końcu danych od klienta.
+            writer.write_eof()
+            self.assertEqual(b"", await reader.read())
+            writer.close()
+            transport.close()
+            upstream.close()
+            upstream_server.close()
+            server.close()
+            await server.wait_closed()
+            await upstream_server.wait_closed()
+            return results
+
+        results = loop.run_until_complete(scenario())
+        self.assertListEqual([(0, bytes(4)), (0, UPSTREAM_ADDR),
+                              (0, bytes(4)), (0, UPSTREAM_ADDR * 200)],
+                             results)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import importer
+import model
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+BLOCKLIST = r"""# Title: mixed list
+[Adblock Plus 2.0]
+! adblock comment
+0.0.0.0 0.0.0.0
+127.0.0.1 localhost
+::1 localhost ip6-localhost
+0.0.0.0 ads.example.com
+0.0.0.0 tracker.net www.tracker.net  # inline comment
+Python.org
+www.java.com
+||doubleclick.net^
+||adservice.google.com^$third-party
+||example.org/banner.png
+?bad.com
+java.com
+
+"""
+
+
+class TestImporter(unittest.TestCase):
+
+    def setUp(self):
+        self.model = model.AppModel("SiteBlocker", "", "127.0.0.1")
+        self.model.sites = model.SiteStore.from_sites(
+            [(False, "python.org", "www.python.org")])
+
+    def test_iter_domains(self):
+        out = ["ads.example.com", "tracker.net", "www.tracker.net",
+               "python.org", "www.java.com", "doubleclick.net",
+               "adservice.google.com", None, "?bad.com", "java.com"]
+        result = importer.iter_domains(BLOCKLIST.splitlines())
+        self.assertListEqual(out, list(result))
+
+    def test_import_lines(self):
+        result = importer.import_lines(self.model, BLOCKLIST.splitlines())
+        self.assertTupleEqual(importer.ImportReport(5, 3, 2), result)
+        self.assertIn(("tracker.net", "www.tracker.net"), self.model.sites)
+        self.assertEqual(6, len(self.model.sites))
+        self.assertTupleEqual((1, 2, 3, 4, 5), self.model.sites.selected())
+
+    def test_import_idna(self):
+        lines = ["0.0.0.0 Bücher.de.", "||www.bücher.de^", "xn--bcher-kva.de"]
+        result = importer.import_lines(self.model, lines)
+        self.assertTupleEqual(importer.ImportReport(1, 2, 0), result)
+        self.assertIn(("xn--bcher-kva.de", "www.xn--bcher-kva.de"),
+                      self.model.sites)
+
+    def test_import_subdomains(self):
+        """Subdomeny domeny blokowanej z subdomenami są duplikatami."""
+        self.model.sites.add_subdomains("tracker.net")
+        lines = ["ads.tracker.net", "0.0.0.0 a.b.tracker.net", "tracker.org"]
+        result = importer.import_lines(self.model, lines)
+        self.assertTupleEqual(importer.ImportReport(1, 2, 0), result)
+        self.assertIn(("tracker.org", "www.tracker.org"), self.model.sites)
+
+    def test_import_file(self):
+        """Jeden zapis pliku hosts po imporcie, żaden, gdy nic nie dodano."""
+        self.model.write_file = mock.Mock()
+        m = mock.mock_open(read_data=BLOCKLIST)
+        with mock.patch('importer.open', m):
+            importer.import_file(self.model, "list.txt")
+            result = importer.import_file(self.model, "list.txt")
+        self.assertTupleEqual(importer.ImportReport(0, 8, 2), result)
+        self.model.write_file.assert_called_once_with(self.model.sites,
+                                                      atomic=True)
+
+    def test_split_chunks(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            fpath = os.path.join(tmp, 'list.txt')
+            data = "a.com\nbb.com\r\nccc.com\n\nno-newline.com"
+            with open(fpath, 'w', newline='') as fw:
+                fw.write(data)
+            self.assertListEqual([], importer.split_chunks(os.devnull, 4))
+            for parts in (1, 2, 3, 50):
+                with self.subTest(parts=parts):
+                    chunks = importer.split_chunks(fpath, parts)
+                    self.assertLessEqual(len(chunks), parts)
+                    self.assertEqual(0, chunks[0][0])
+                    self.assertEqual(len(data), chunks[-1][1])
+                    for (_, end), (start, _) in zip(chunks, chunks[1:]):
+                        self.assertEqual(end, start)
+                        self.assertEqual("\n", data[end - 1])
+
+    def test_import_parallel(self):
+        """Wynik jak przy imporcie w jednym procesie, niezależnie od
+        podziału na fragmenty."""
+        lines = BLOCKLIST.splitlines(True) * 3 + \
+            ["0.0.0.0 site{}.org\n".format(i) for i in range(300)]
+        sequential = model.AppModel("SiteBlocker", "", "127.0.0.1")
+        sequential.sites = model.SiteStore.from_sites(
+            [(False, "python.org", "www.python.org")])
+        # ads.example.com jest objęta blokadą domeny nadrzędnej.
+        sequential.sites.add_subdomains("example.com")
+        expected = importer.import_lines(sequential, lines)
+        with tempfile.TemporaryDirectory() as tmp:
+            fpath = os.path.join(tmp, 'list.txt')
+            with open(fpath, 'w') as fw:
+                fw.writelines(lines)
+            for chunks in (1, 7):
+                with self.subTest(chunks=chunks):
+                    self.setUp()
+                    self.model.sites.add_subdomains("example.com")
+                    with mock.patch('importer.CHUNKS_PER_WORKER', chunks):
+                        result = importer.import_parallel(self.model, fpath,
+                                                          workers=2)
+                    self.assertTupleEqual(expected, result)
+                    self.assertListEqual(list(sequential.sites),
+                                         list(self.model.sites))
+                    self.assertEqual(sequential.sites.blocked,
+                                     self.model.sites.blocked)
+            self.setUp()
+            with mock.patch('importer.PARALLEL_MIN', 0), \
+                    mock.patch('importer.import_parallel',
+                               return_value=expected) as parallel:
+                importer.import_file(self.model, fpath, write=False,
+                                     workers=0)
+                parallel.assert_called_once_with(self.model, fpath, True,
+                                                 None)
+
+
+if __name__ == '__main__':
+    unittest.main()
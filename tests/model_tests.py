@@ -3,7 +3,9 @@
 
 import io
 import model
+import os
 import sys
+import tempfile
 import unittest
 from unittest import mock
 
@@ -82,6 +84,33 @@ class TestAppModel(unittest.TestCase):
             result = self.model.read_file()
             self.assertListEqual(RIGHT_HOSTS, result)
 
+    def test_iter_block(self):
+        result = self.model.iter_block(HOSTS_FILE.splitlines(True))
+        self.assertListEqual(RIGHT_HOSTS, list(result))
+        result = self.model.iter_block(HOSTS_FILE_EMPTY.splitlines(True))
+        self.assertListEqual(RIGHT_HOSTS_EMPTY, list(result))
+
+    def test_iter_sites(self):
+        out_sites = [(False, "python.org", "www.python.org"),
+                     (True, "java.com", "www.java.com")]
+        with mock.patch('model.open') as mopen:
+            mopen.return_value = self.HOSTS_FILE
+            result = self.model.iter_sites()
+            self.assertListEqual(out_sites, list(result))
+            mopen.assert_called_once_with(self.model.fpath, 'r')
+
+    def test_load_sites(self):
+        out_sites = [(True, "java.com", "www.java.com"),
+                     (False, "python.org", "www.python.org")]
+        with mock.patch('model.open') as mopen:
+            mopen.return_value = self.HOSTS_FILE
+            result = self.model.load_sites()
+        self.assertIs(self.model.sites, result)
+        self.assertListEqual([s[1:3] for s in out_sites],
+                             list(self.model.sites))
+        self.assertTupleEqual((0,), self.model.sites.selected())
+        self.assertIn(("java.com", "www.java.com"), self.model.sites)
+
     def test_extract_sites_0(self):
         lines = ["# 127.0.0.1  www.python.org  python.org  ",
                  "#127.0.0.1www.pylonsproject.org pylonsproject.org",
@@ -161,6 +190,184 @@ class TestAppModel(unittest.TestCase):
                 result = self.model.complete_user_input(inp)
                 self.assertTupleEqual(complete, result)
 
+    def test_site_store(self):
+        store = model.SiteStore([("java.com", "www.java.com"),
+                                 ("", "www.linuxmint.com"),
+                                 ("python.org", "www.python.org")])
+        self.assertIn(("java.com", "www.java.com"), store)
+        self.assertIn(("linuxmint.com", "www.linuxmint.com"), store)
+        self.assertNotIn(("perl.org", "www.perl.org"), store)
+        self.assertEqual(("java.com", "www.java.com"),
+                         store.find("www.java.com"))
+        self.assertTupleEqual((), store.selected())
+        store.select((1, 2))
+        self.assertListEqual([0, 1, 1], list(store.blocked))
+        self.assertListEqual([(1, 2)], list(store.blocked_ranges()))
+        self.assertListEqual([(2, 2)], list(store.blocked_ranges(2)))
+        self.assertListEqual([], list(store.blocked_ranges(0, 1)))
+        store.delete((2, 0))
+        self.assertListEqual([("", "www.linuxmint.com")], list(store))
+        self.assertTupleEqual((0,), store.selected())
+        self.assertIsNone(store.find("java.com"))
+        self.assertNotIn(("python.org", "www.python.org"), store)
+
+    def test_site_store_compact(self):
+        """Adres bez `www.` jest zapisany raz, pary odtwarzane przy odczycie.
+        """
+        sites = [("java.com", "www.java.com"), ("", "www.linuxmint.com"),
+                 ("xubuntu.com", ""), ("a.com", "b.com")]
+        store = model.SiteStore(sites)
+        # Sam `www.adres` ma własny klucz - nie koliduje z `adres`.
+        self.assertListEqual(["java.com", "www.linuxmint.com", "xubuntu.com",
+                              "a.com"], store.names)
+        self.assertListEqual(sites, list(store))
+        self.assertListEqual(sites[1:3], store[1:3])
+        self.assertEqual(sites[-1], store[-1])
+        for domain, n in (("www.java.com", 0), ("www.linuxmint.com", 1),
+                          ("linuxmint.com", None), ("www.xubuntu.com", None),
+                          ("b.com", 3)):
+            with self.subTest():
+                self.assertEqual(n, store.position(domain))
+        store.sort()
+        # Wg adresu bez `www.`, także pozycje z samym `www.adres`.
+        self.assertListEqual(["a.com", "java.com", "www.linuxmint.com",
+                              "xubuntu.com"], store.names)
+        self.assertTrue(store.is_sorted())
+        self.assertEqual(("a.com", "b.com"), store.find("b.com"))
+
+    def test_domain_trie(self):
+        trie = model.DomainTrie(["example.com", "ads.example.com"])
+        trie.add("tracker.net", wildcard=True)
+        testsmap = {"example.com": "example.com",
+                    "ads.example.com": "ads.example.com",
+                    "cdn.example.com": None,
+                    "a.b.tracker.net": "tracker.net",
+                    "tracker.net": "tracker.net",
+                    "net": None,
+                    "other.org": None}
+        for domain, out in testsmap.items():
+            with self.subTest(domain=domain):
+                self.assertEqual(out, trie.covered_by(domain))
+        self.assertIn("ads.example.com", trie)
+        self.assertNotIn("com", trie)
+        self.assertSetEqual({"example.com", "ads.example.com"},
+                            set(trie.iter_under("example.com")))
+        self.assertTrue(trie.has_under("com"))
+        trie.discard("ads.example.com")
+        self.assertFalse(trie.has_under("ads.example.com"))
+        self.assertTrue(trie.has_under("example.com"))
+
+    def test_site_store_subdomains(self):
+        """Blokada z subdomenami to zwykłe pozycje listy; znacznik jest
+        odtwarzany z nich po ponownym wczytaniu."""
+        store = model.SiteStore([("java.com", "www.java.com")])
+        self.assertEqual(1 + len(model.SUBDOMAINS),
+                         store.add_subdomains("example.com"))
+        self.assertIn(("api.example.com", ""), store)
+        self.assertEqual("example.com", store.covered("x.y.example.com"))
+        self.assertEqual("www.java.com", store.covered("www.java.com"))
+        self.assertIsNone(store.covered("api.java.com"))
+        self.assertEqual(len(store), len(store.selected()) + 1)
+        copy = model.SiteStore(store)
+        self.assertEqual("example.com", copy.covered("x.example.com"))
+        copy.delete((copy.position("m.example.com"),))
+        self.assertIsNone(copy.covered("x.example.com"))
+
+    def test_site_index(self):
+        """Wynik wyszukiwania jest taki sam niezależnie od tego, ile pozycji
+        jest już w indeksie; dodane pozycje są znajdowane od razu."""
+        store = model.SiteStore([("ads.example.com", "www.ads.example.com"),
+                                 ("", "www.only.net"),
+                                 ("example.org", "mirror.example.net"),
+                                 ("tracker.com", "www.tracker.com"),
+                                 ("adserver.net", "www.adserver.net")])
+        testsmap = {"a": [0, 4], "ad": [0, 4], "m": [2], "ex": [2],
+                    "ads": [0, 4], "adse": [4], "example": [0, 2],
+                    "example.net": [2], ".net": [1, 2, 4], "only": [1],
+                    "www": [], "zzz": []}
+        index = store.search_index
+        for limit in (0, 2, 1, None):
+            index.update(limit)
+            for query, out in testsmap.items():
+                with self.subTest(limit=limit, query=query):
+                    self.assertListEqual(out, store.search(query))
+        self.assertEqual(5, len(index))
+        self.assertEqual(0, index.update())
+        store.append(("adnet.io", "www.adnet.io"))
+        self.assertListEqual([0, 4, 5], store.search("ad"))
+        self.assertListEqual([1, 2, 4, 5], store.search("net"))
+        self.assertListEqual([5], store.search("adne"))
+        store.delete([0])
+        self.assertListEqual([3, 4], store.search("ad"))
+        self.assertEqual(0, len(store.search_index))
+
+    def test_filter_sites(self):
+        self.model.sites = model.SiteStore.from_sites(
+            [(False, "java.com", "www.java.com"),
+             (True, "javascript.info", "www.javascript.info"),
+             (False, "python.org", "www.python.org"),
+             (True, "jython.org", "www.jython.org")])
+        self.assertIs(self.model.sites, self.model.filter_sites(" "))
+        for text in ("ython", " www.YTHON.org"):
+            with self.subTest(text=text):
+                sites = self.model.filter_sites(text)
+                self.assertListEqual([("python.org", "www.python.org"),
+                                      ("jython.org", "www.jython.org")],
+                                     list(sites))
+        sites = self.model.filter_sites("j")
+        self.assertEqual(3, len(sites))
+        self.assertEqual(("jython.org", "www.jython.org"), sites[-1])
+        self.assertListEqual([("javascript.info", "www.javascript.info")],
+                             sites[1:2])
+        self.assertListEqual([(1, 2)], list(sites.blocked_ranges()))
+        sites.set_blocked(0, True)
+        sites.set_blocked(2, False)
+        self.assertTupleEqual((0, 1), sites.selected())
+        self.assertTupleEqual((0, 1), self.model.sites.selected())
+        self.model.sites.set_blocked(2, True)
+        sites = self.model.filter_sites("ython")
+        self.assertTupleEqual((0,), sites.selected())
+        self.assertTupleEqual((2,), sites.selected_positions())
+        # Adresy z wielkimi literami (np. wpisane ręcznie w pliku hosts)
+        # są znajdowane w indeksie i poza nim.
+        self.model.sites.append(("Example.COM", "WWW.Example.COM"))
+        for limit in (0, None):
+            with self.subTest(limit=limit):
+                self.model.sites.search_index.update(limit)
+                for text in ("ex", "example", "Example.co"):
+                    self.assertListEqual([("Example.COM", "WWW.Example.COM")],
+                                         list(self.model.filter_sites(text)))
+
+    def test_bit_array_fill(self):
+        for size in (0, 5, 8, 13):
+            with self.subTest(size=size):
+                bits = model.BitArray(size)
+                bits.fill(1)
+                self.assertListEqual([1] * size, list(bits))
+                self.assertEqual(-1, bits.find(0))
+                bits.append(0)
+                self.assertEqual(size, bits.find(0))
+                bits.fill(0)
+                self.assertEqual(-1, bits.find(1))
+
+    def test_bit_array(self):
+        bits = model.BitArray.from_iterable(
+            [0, 1, 1, 0] + [0] * 13 + [1] * 12 + [0])
+        self.assertEqual(30, len(bits))
+        self.assertListEqual([0, 1, 1, 0], list(bits)[:4])
+        testsmap = [((1,), 1), ((0,), 0), ((1, 3), 17), ((0, 17), 29),
+                    ((1, 29), -1), ((0, 17, 29), -1), ((1, 0, 1), -1)]
+        for args, n in testsmap:
+            with self.subTest():
+                self.assertEqual(n, bits.find(*args))
+        bits[29] = 1
+        bits[1] = 0
+        self.assertEqual(-1, bits.find(0, 17))
+        self.assertEqual(2, bits.find(1))
+        with self.assertRaises(IndexError):
+            bits[30]
+        self.assertEqual(model.to_bitmap(30, [2] + list(range(17, 30))), bits)
+
     @unittest.skip("Funkcja będzie usunięta z model.py")
     def test_isunique(self):
         pass
@@ -197,40 +404,410 @@ class TestAppModel(unittest.TestCase):
             mopen.return_value = self.HOSTS_FILE
             # result = self.model.read_file()`
             # self.assertListEqual(RIGHT_HOSTS, result)
-            self.assertIsNone(self.model.write_file(mall_sites, msel))
+            self.assertTupleEqual((3, 0, 0),
+                                  self.model.write_file(mall_sites, msel))
             self.model.clear_hosts_file.assert_called_once()
 
+    def test_write_file_atomic(self):
+        """Tryb atomowy: nowy blok trafia w miejsce starego, reszta pliku
+        i uprawnienia pozostają bez zmian."""
+        mall_sites = [("flask.pocoo.org", "www.flask.pocoo.org"),
+                      ("java.com", "www.java.com")]
+        out = HOSTS_FILE.replace(HOSTS_FILE[HOSTS_FILE.index("# BEGIN"):
+                                            HOSTS_FILE.index("# END")],
+                                 "# BEGIN SiteBlocker\n"
+                                 "127.0.0.1 flask.pocoo.org "
+                                 "www.flask.pocoo.org \n"
+                                 "# 127.0.0.1 java.com www.java.com \n")
+        with tempfile.TemporaryDirectory() as tmp:
+            self.model.fpath = os.path.join(tmp, 'hosts')
+            with open(self.model.fpath, 'w') as fw:
+                fw.write(HOSTS_FILE)
+            os.chmod(self.model.fpath, 0o640)
+            self.model.write_file(mall_sites, (0,), atomic=True)
+            with open(self.model.fpath) as fr:
+                self.assertEqual(out, fr.read())
+            self.assertEqual(0o640, os.stat(self.model.fpath).st_mode & 0o777)
+            self.assertListEqual(['hosts'], os.listdir(tmp))
+
+    def test_write_file_atomic_no_block(self):
+        """Tryb atomowy: w pliku nie ma znaczników - blok trafia na koniec."""
+        with tempfile.TemporaryDirectory() as tmp:
+            self.model.fpath = os.path.join(tmp, 'hosts')
+            with open(self.model.fpath, 'w') as fw:
+                fw.write("127.0.0.1 localhost")
+            self.model.write_file([("java.com", "www.java.com")], (0,),
+                                  atomic=True)
+            with open(self.model.fpath) as fr:
+                self.assertEqual("127.0.0.1 localhost\n"
+                                 "# BEGIN SiteBlocker\n"
+                                 "127.0.0.1 java.com www.java.com \n"
+                                 "# END SiteBlocker\n", fr.read())
+
+    def test_write_file_dense(self):
+        """Układ zwarty: kilka par w wierszu, odczyt zwraca te same pozycje.
+        """
+        sites = [(True, "java.com", "www.java.com"),
+                 (True, "a.com", "b.com"),
+                 (False, "perl.org", "www.perl.org"),
+                 (True, "", "www.linuxmint.com"),
+                 (True, "python.org", "www.python.org"),
+                 (True, "xubuntu.com", "")]
+        store = model.SiteStore.from_sites(sites)
+        block = "# BEGIN SiteBlocker\n" \
+                "127.0.0.1 java.com www.java.com\n" \
+                "127.0.0.1 python.org www.python.org xubuntu.com\n" \
+                "# 127.0.0.1 perl.org www.perl.org\n" \
+                "127.0.0.1 a.com b.com \n" \
+                "127.0.0.1  www.linuxmint.com \n" \
+                "# END SiteBlocker\n"
+        with tempfile.TemporaryDirectory() as tmp:
+            self.model.fpath = os.path.join(tmp, 'hosts')
+            with open(self.model.fpath, 'w') as fw:
+                fw.write(HOSTS_FILE)
+            self.model.load_sites()
+            self.model.dense = 3
+            self.model.write_file(store, atomic=True)
+            with open(self.model.fpath) as fr:
+                self.assertIn(block, fr.read())
+            result = self.model.load_sites()
+            store.sort()
+            self.assertListEqual(list(store), list(result))
+            self.assertListEqual(list(store.blocked), list(result.blocked))
+            # Bez `dense` zapis zachowuje układ bloku z pliku.
+            self.model.dense = None
+            result = self.model.load_sites()
+            self.assertEqual(3, self.model.layout)
+            result.append(("ruby.org", "www.ruby.org"), True)
+            self.model.write_file(result, atomic=True)
+            with open(self.model.fpath) as fr:
+                self.assertIn("\n127.0.0.1 python.org www.python.org\n"
+                              "127.0.0.1 ruby.org www.ruby.org xubuntu.com\n",
+                              fr.read())
+            result = self.model.load_sites()
+            self.model.dense = 0
+            result = self.model.write_file(result, atomic=True, force=True)
+            self.assertTupleEqual((0, 0, 0), result)
+            with open(self.model.fpath) as fr:
+                self.assertIn("\n127.0.0.1 xubuntu.com  \n", fr.read())
+
+    def test_reload_block(self):
+        """Zmiany z zewnątrz trafiają do listy, niezapisane lokalne zostają.
+        """
+        with tempfile.TemporaryDirectory() as tmp:
+            self.model.fpath = os.path.join(tmp, 'hosts')
+            with open(self.model.fpath, 'w') as fw:
+                fw.write("127.0.0.1 localhost\n"
+                         "# BEGIN SiteBlocker\n"
+                         "127.0.0.1 java.com www.java.com \n"
+                         "# 127.0.0.1 perl.org www.perl.org \n"
+                         "127.0.0.1 python.org www.python.org \n"
+                         "# END SiteBlocker\n")
+            sites = self.model.load_sites()
+            self.model.write_file(sites, atomic=True, force=True)
+            # Blok bez zmian - tylko skrót, bez parsowania wierszy.
+            with mock.patch.object(self.model, 'read_block') as mread:
+                self.assertTupleEqual((0, 0, 0, ()),
+                                      self.model.reload_block())
+            mread.assert_not_called()
+            # Lokalnie: odblokowana python.org, dodana ruby.org.
+            sites.set_blocked(sites.position("python.org"), False)
+            sites.append(("ruby.org", "www.ruby.org"), True)
+            with open(self.model.fpath, 'w') as fw:
+                fw.write("127.0.0.1 localhost\n"
+                         "# BEGIN SiteBlocker\n"
+                         "127.0.0.1 perl.org www.perl.org \n"
+                         "127.0.0.1 rust.org \n"
+                         "# 127.0.0.1 python.org www.python.org \n"
+                         "127.0.0.1 ruby.org \n"
+                         "# END SiteBlocker\n")
+            result = self.model.reload_block()
+            self.assertTupleEqual((1, 1, 1, ("ruby.org",)), result)
+            self.assertListEqual(
+                [("perl.org", "www.perl.org", True),
+                 ("python.org", "www.python.org", False),
+                 ("ruby.org", "www.ruby.org", True),
+                 ("rust.org", "", True)],
+                sorted((*site, bool(blocked))
+                       for site, blocked in zip(sites, sites.blocked)))
+            self.assertTupleEqual((0, 0, 0, ()), self.model.reload_block())
+
+    def test_bare_and_www_lines(self):
+        """`adres` i `www.adres` w osobnych wierszach to dwie pozycje
+        z osobnymi kluczami - zmiana jednej z nich jest zapisywana."""
+        hosts = ("# BEGIN SiteBlocker\n"
+                 "127.0.0.1 a.com \n"
+                 "# 127.0.0.1  www.a.com\n"
+                 "# END SiteBlocker\n")
+        with tempfile.TemporaryDirectory() as tmp:
+            self.model.fpath = os.path.join(tmp, 'hosts')
+            with open(self.model.fpath, 'w') as fw:
+                fw.write(hosts)
+            sites = self.model.load_sites()
+            self.assertListEqual([("a.com", ""), ("", "www.a.com")],
+                                 list(sites))
+            self.assertEqual(2, len(sites.state()))
+            self.assertEqual(1, sites.position("www.a.com"))
+            self.assertEqual(0, sites.position("a.com"))
+            sites.set_blocked(sites.position("www.a.com"), True)
+            self.assertTupleEqual((0, 0, 1), self.model.write_file(
+                sites, atomic=True))
+            with open(self.model.fpath) as fr:
+                self.assertIn("\n127.0.0.1  www.a.com \n", fr.read())
+            self.assertListEqual([(True, "", "www.a.com"),
+                                  (True, "a.com", "")],
+                                 sorted(self.model.iter_sites()))
+
+    def test_profiles(self):
+        """Blok główny nie obejmuje profili; profile są czytane i zapisywane
+        jednym przebiegiem, inne bloki zostają bez zmian."""
+        hosts = ("127.0.0.1 localhost\n"
+                 "# BEGIN SiteBlocker\n"
+                 "127.0.0.1 java.com www.java.com \n"
+                 "# END SiteBlocker\n"
+                 "# BEGIN SiteBlocker:work\n"
+                 "# 127.0.0.1 reddit.com www.reddit.com \n"
+                 "# 127.0.0.1 youtube.com www.youtube.com \n"
+                 "# END SiteBlocker:work\n"
+                 "# BEGIN SiteBlocker:kids\n"
+                 "127.0.0.1 games.com www.games.com \n"
+                 "# END SiteBlocker:kids\n")
+        with tempfile.TemporaryDirectory() as tmp:
+            self.model.fpath = os.path.join(tmp, 'hosts')
+            with open(self.model.fpath, 'w') as fw:
+                fw.write(hosts)
+            self.assertListEqual([("java.com", "www.java.com")],
+                                 list(self.model.load_sites()))
+            with mock.patch('model.open', wraps=open) as mopen:
+                models = self.model.load_profiles()
+                mopen.assert_called_once()
+            self.assertSetEqual({None, "work", "kids"}, set(models))
+            self.assertEqual(2, len(models["work"].sites))
+            # Tylko wybrane profile - wiersze innych bloków nie są parsowane.
+            with mock.patch.object(self.model, 'extract_entries',
+                                   wraps=self.model.extract_entries) as mext:
+                selected = self.model.load_profiles(["work", "ads", "a b"])
+            self.assertSetEqual({"work"}, set(selected))
+            self.assertEqual(2, mext.call_count)
+            self.assertListEqual(list(models["work"].sites),
+                                 list(selected["work"].sites))
+            self.assertDictEqual(models["work"].snapshot,
+                                 selected["work"].snapshot)
+            models["work"].sites.set_all(True)
+            diffs = self.model.write_profiles([models["work"]])
+            self.assertTupleEqual((0, 0, 2), diffs["work"])
+            with open(self.model.fpath) as fr:
+                self.assertEqual(hosts.replace("# 127.0.0.1", "127.0.0.1"),
+                                 fr.read())
+            kids = model.AppModel("SiteBlocker", self.model.fpath,
+                                  "127.0.0.1", "kids")
+            self.assertListEqual([("games.com", "www.games.com")],
+                                 list(kids.load_sites()))
+            new = self.model.for_profile("ads")
+            new.write_file([("ads.net", "")], (0,), atomic=True)
+            with open(self.model.fpath) as fr:
+                self.assertTrue(fr.read().endswith(
+                    "# END SiteBlocker:kids\n# BEGIN SiteBlocker:ads\n"
+                    "127.0.0.1 ads.net  \n# END SiteBlocker:ads\n"))
+        with self.assertRaises(ValueError):
+            model.AppModel("SiteBlocker", "", "127.0.0.1", "a b")
+
+    def test_extract_entries(self):
+        testsmap = {
+            "127.0.0.1 a.com www.a.com": ((True, "a.com", "www.a.com"),),
+            "# 127.0.0.1 www.a.com b.com www.b.com c.com # x":
+                ((False, "", "www.a.com"), (False, "b.com", "www.b.com"),
+                 (False, "c.com", "")),
+            "::1 localhost": ()}
+        for line, out in testsmap.items():
+            with self.subTest(line=line):
+                self.assertTupleEqual(out, self.model.extract_entries(line))
+
+    def test_write_file_store(self):
+        """Bez `sel` zaznaczenie jest brane z mapy bitowej `SiteStore`."""
+        store = model.SiteStore.from_sites(
+            [(True, "java.com", "www.java.com"),
+             (False, "python.org", "www.python.org")])
+        self.model.clear_hosts_file = mock.MagicMock()
+        m = mock.mock_open()
+        with mock.patch('model.open', m):
+            self.model.write_file(store)
+            m().write.assert_has_calls(
+                [mock.call('127.0.0.1 java.com www.java.com \n'),
+                 mock.call('# 127.0.0.1 python.org www.python.org \n')])
+
+    def test_write_file_unchanged(self):
+        """Drugi zapis tego samego bloku nie otwiera pliku."""
+        mall_sites = [("java.com", "www.java.com")]
+        self.model.clear_hosts_file = mock.MagicMock()
+        m = mock.mock_open()
+        with mock.patch('model.open', m):
+            self.model.write_file(mall_sites, (0,))
+            result = self.model.write_file(mall_sites, (0,))
+            self.assertTupleEqual(model.BlockDiff(0, 0, 0), result)
+            m.assert_called_once_with(self.model.fpath, 'a')
+            self.model.clear_hosts_file.assert_called_once()
+
+    def test_write_file_diff(self):
+        """Po odczycie pliku `write_file` zwraca liczbę zmian, a bez zmian
+        (nawet przy innej kolejności stron) nie zapisuje pliku."""
+        with mock.patch('model.open') as mopen:
+            mopen.return_value = self.HOSTS_FILE
+            self.model.load_sites()
+        self.model.clear_hosts_file = mock.MagicMock()
+        testsmap = [
+            ([("java.com", "www.java.com"), ("python.org", "www.python.org")],
+             (0,), (0, 0, 0)),
+            ([("java.com", "www.java.com"), ("python.org", "www.python.org")],
+             (0, 1), (0, 0, 1)),
+            ([("java.com", "www.java.com"), ("perl.org", "www.perl.org")],
+             (), (1, 1, 1)),
+        ]
+        for all_sites, sel, diff in testsmap:
+            with self.subTest(), mock.patch('model.open', mock.mock_open()):
+                result = self.model.write_file(all_sites, sel)
+                self.assertTupleEqual(diff, result)
+        self.assertEqual(2, self.model.clear_hosts_file.call_count)
+
     @unittest.skip("Funkcja nieużywana")
     def test_sort_line(self):
         pass
 
-    def test_clear_hosts_file_0(self):
-        # out = r"""127.0.0.1    localhost\n
-        #           127.0.1.1    nuc\n\n
-        #           # The following lines are desirable for IPv6 capable hosts\n
-        #           ::1     ip6-localhost ip6-loopback\n
-        #           fe00::0 ip6-localnet\n
-        #           ff00::0 ip6-mcastprefix\n
-        #           ff02::1 ip6-allnodes\n
-        #           ff02::2 ip6-allrouters\n\n"""
-        out = HOSTS_FILE_EMPTY
-        # out = '\n'.join([l.strip() for l in out.split('\\n')])
-        m = mock.mock_open(read_data=HOSTS_FILE)
-        with mock.patch('model.open', m):
+    def clear(self, data):
+        """`clear_hosts_file` na pliku z `data`; zwraca nową zawartość."""
+        with tempfile.TemporaryDirectory() as tmp:
+            self.model.fpath = os.path.join(tmp, 'hosts')
+            with open(self.model.fpath, 'w', newline='') as fw:
+                fw.write(data)
             self.model.clear_hosts_file()
-            m.assert_called_once_with(self.model.fpath, 'r+')
-            m().write.assert_called_once_with(out)
+            with open(self.model.fpath, newline='') as fr:
+                return fr.read()
+
+    def test_normalize_domain(self):
+        testsmap = {"Python.ORG.": (("python.org", "www.python.org"), None),
+                    " www.Java.com ": (("java.com", "www.java.com"), None),
+                    "zażółć.pl": (("xn--za-6ja4f8n1l.pl",
+                                   "www.xn--za-6ja4f8n1l.pl"), None),
+                    "www.bücher.de": (("xn--bcher-kva.de",
+                                       "www.xn--bcher-kva.de"), None),
+                    "": (None, model.REJECT_EMPTY),
+                    " . ": (None, model.REJECT_EMPTY),
+                    "1abc.com": (None, model.REJECT_START),
+                    "?bad.com": (None, model.REJECT_START),
+                    "a b.com": (None, model.REJECT_CHARS),
+                    "ą?.pl": (None, model.REJECT_CHARS),
+                    "ż" * 64 + ".pl": (None, model.REJECT_IDNA),
+                    "a" * 64 + ".pl": (None, model.REJECT_LENGTH),
+                    "a." * 127 + "pl": (None, model.REJECT_LENGTH)}
+        for inp, out in testsmap.items():
+            with self.subTest(inp=inp):
+                self.assertTupleEqual(out, model.normalize_domain(inp))
+        for inp in ("python.org", "www.perl.org", "a_b.com"):
+            with self.subTest(inp=inp):
+                self.assertTrue(self.model.validate_data(inp))
+                self.assertTupleEqual(self.model.complete_user_input(inp),
+                                      model.normalize_domain(inp)[0])
+
+    def test_normalize_batch(self):
+        inputs = ["a.com", "?", "A.com", "a.com"]
+        result = list(model.normalize_batch(inputs))
+        self.assertListEqual([model.normalize_domain(inp) for inp in inputs],
+                             result)
+        self.assertListEqual([("a.com", "www.a.com"), None,
+                              ("a.com", "www.a.com"), ("a.com", "www.a.com")],
+                             [site for site, _ in result])
+        self.assertListEqual([None, model.REJECT_START, None, None],
+                             [reason for _, reason in result])
+        # Zapamiętanych jest najwyżej `limit` adresów naraz.
+        with mock.patch('model._normalize', wraps=model._normalize) as mnorm:
+            self.assertListEqual(result, list(model.normalize_batch(inputs)))
+            self.assertEqual(3, mnorm.call_count)
+            mnorm.reset_mock()
+            inputs = ["a.com", "b.com", "c.com", "a.com"]
+            self.assertListEqual(
+                [model.normalize_domain(inp) for inp in inputs],
+                list(model.normalize_batch(inputs, limit=2)))
+            self.assertEqual(4, mnorm.call_count)
+
+    def test_clear_hosts_file_0(self):
+        self.assertEqual(HOSTS_FILE_EMPTY, self.clear(HOSTS_FILE))
 
     def test_clear_hosts_file_1(self):
         """W pliku hosts nie ma nic do usunięcia - brak znaczników `BEGIN`
-        i `END`"""
-        out = HOSTS_FILE_EMPTY
-        m = mock.mock_open(read_data=HOSTS_FILE_EMPTY)
-        with mock.patch('model.open', m):
-            self.model.clear_hosts_file()
-            m.assert_called_once_with(self.model.fpath, 'r+')
-            m().write.assert_called_once_with(out)
-
+        i `END`; plik nie jest zapisywany."""
+        with mock.patch('model.open', wraps=open) as mopen:
+            self.assertEqual(HOSTS_FILE_EMPTY, self.clear(HOSTS_FILE_EMPTY))
+        mopen.assert_called_once_with(self.model.fpath, 'r+b')
+        self.assertEqual("", self.clear(""))
+
+    def test_clear_hosts_file_2(self):
+        """Blok w środku pliku, znaczniki z białymi znakami i CRLF, blok
+        profilu i blok bez znacznika `END`."""
+        block = ("# BEGIN SiteBlocker\n127.0.0.1 a.com www.a.com \n"
+                 "# END SiteBlocker\n")
+        profile = block.replace("SiteBlocker", "SiteBlocker:work")
+        testsmap = [("a\n" + block + "b\n", "a\nb\n"),
+                    ("a\n  # BEGIN SiteBlocker \r\nx\r\n# END SiteBlocker\r\n"
+                     "b\r\n", "a\nb\r\n"),
+                    (profile + block + "b", profile + "b"),
+                    ("a\n# BEGIN SiteBlocker\nx\n", "a\n"),
+                    ("# BEGIN SiteBlockers\n" + block,
+                     "# BEGIN SiteBlockers\n"),
+                    (block + "a\n" + block, "a\n")]
+        for data, out in testsmap:
+            with self.subTest(data=data):
+                self.assertEqual(out, self.clear(data))
+
+    def test_find_blocks(self):
+        data = b"x\n# BEGIN A\n1\n# END A\n# BEGIN A:p\n2\n# END A:p\ny"
+        self.assertListEqual([(2, 22, "# BEGIN A"), (22, 46, "# BEGIN A:p")],
+                             list(model.find_blocks(data, ["# BEGIN A",
+                                                           "# BEGIN A:p"])))
+        self.assertListEqual([(22, 46, "# BEGIN A:p")],
+                             list(model.find_blocks(data, ["# BEGIN A:p"])))
+
+    def test_replace_blocks_bytes(self):
+        """Wiersze spoza bloku są kopiowane bez zmian (także CRLF i bajty
+        spoza UTF-8)."""
+        with tempfile.TemporaryDirectory() as tmp:
+            self.model.fpath = os.path.join(tmp, 'hosts')
+            prefix = b"127.0.0.1 localhost\r\n# \xff\xfe\n"
+            with open(self.model.fpath, 'wb') as fw:
+                fw.write(prefix + HOSTS_FILE.encode() + b"tail")
+            self.model.replace_hosts_file(["# BEGIN SiteBlocker\n",
+                                           "# END SiteBlocker\n"])
+            with open(self.model.fpath, 'rb') as fr:
+                self.assertEqual(prefix + HOSTS_FILE_EMPTY.encode().replace(
+                    b"allrouters\n", b"allrouters\n# BEGIN SiteBlocker\n"
+                    b"# END SiteBlocker\n") + b"tail", fr.read())
+
+    def test_splice_blocks(self):
+        """Blok tej samej długości jest zapisywany w miejscu starego (ten sam
+        i-węzeł), inny - przez plik tymczasowy."""
+        with tempfile.TemporaryDirectory() as tmp:
+            self.model.fpath = os.path.join(tmp, 'hosts')
+            with open(self.model.fpath, 'w') as fw:
+                fw.write("127.0.0.1 localhost\n# BEGIN SiteBlocker\n"
+                         "127.0.0.1 java.com www.java.com \n"
+                         "# END SiteBlocker\n::1 localhost\n")
+            sites = self.model.load_sites()
+            inode = os.stat(self.model.fpath).st_ino
+            sites.delete([0])
+            sites.append(("perl.com", "www.perl.com"), True)
+            self.assertTupleEqual((1, 1, 0), self.model.write_file(
+                sites, atomic=True))
+            self.assertEqual(inode, os.stat(self.model.fpath).st_ino)
+            with open(self.model.fpath) as fr:
+                self.assertEqual("127.0.0.1 localhost\n# BEGIN SiteBlocker\n"
+                                 "127.0.0.1 perl.com www.perl.com \n"
+                                 "# END SiteBlocker\n::1 localhost\n",
+                                 fr.read())
+            self.assertFalse(self.model.splice_blocks(
+                {self.model.head: iter(["# BEGIN SiteBlocker\n"])}))
+            sites.set_blocked(0, False)
+            self.model.write_file(sites, atomic=True)
+            self.assertNotEqual(inode, os.stat(self.model.fpath).st_ino)
+            self.assertEqual(self.model.disk_hash, self.model.block_digest())
 
 def main():
 
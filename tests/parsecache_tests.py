@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import model
+import os
+import parsecache
+import tempfile
+import unittest
+from unittest import mock
+
+HOSTS_FILE = r"""127.0.0.1    localhost
+# BEGIN SiteBlocker
+# 127.0.0.1 python.org www.python.org
+127.0.0.1 java.com www.java.com
+127.0.0.1 m.java.com api.java.com
+# END SiteBlocker
+"""
+
+
+class TestParseCache(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.fpath = os.path.join(self.tmp.name, 'hosts')
+        with open(self.fpath, 'w') as fw:
+            fw.write(HOSTS_FILE)
+        self.cache = parsecache.ParseCache(os.path.join(self.tmp.name, 'c'))
+        self.model = model.AppModel("SiteBlocker", self.fpath, "127.0.0.1")
+        self.model.cache = self.cache
+        # Wpisy od razu z `os.stat` - jak przy starcie po dłuższym czasie.
+        racy = mock.patch('parsecache.RACY_SECONDS', -1e9)
+        racy.start()
+        self.addCleanup(racy.stop)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def load(self):
+        """`load_sites`; zwraca (lista, czy wiersze były parsowane)."""
+        with mock.patch.object(self.model, 'extract_entries',
+                               wraps=self.model.extract_entries) as extract:
+            store = self.model.load_sites()
+        return list(store), extract.called
+
+    def test_load_sites(self):
+        expected = [("java.com", "www.java.com"),
+                    ("m.java.com", "api.java.com"),
+                    ("python.org", "www.python.org")]
+        self.assertTupleEqual((expected, True), self.load())
+        self.assertTupleEqual((expected, False), self.load())
+        self.assertTupleEqual((0, 1), self.model.sites.selected())
+        self.assertEqual(1, self.model.sites.position("api.java.com"))
+        self.assertEqual(self.model.read_block()[0], self.model.disk_hash)
+        # Inny czas modyfikacji, ten sam blok - tylko skrót, bez parsowania.
+        os.utime(self.fpath, ns=(0, 0))
+        with mock.patch.object(self.model, 'block_digest',
+                               wraps=self.model.block_digest) as digest:
+            self.assertTupleEqual((expected, False), self.load())
+            self.assertTupleEqual((expected, False), self.load())
+            digest.assert_called_once_with()
+        # Zmiana z zewnątrz tego samego rozmiaru - inny blok, parsowanie.
+        with open(self.fpath, 'w') as fw:
+            fw.write(HOSTS_FILE.replace("# 127", "  127"))
+        os.utime(self.fpath, ns=(1, 1))
+        self.assertTupleEqual((expected, True), self.load())
+        self.assertTupleEqual((0, 1, 2), self.model.sites.selected())
+
+    def test_write_file(self):
+        """Po własnym zapisie następny start nie parsuje pliku."""
+        self.load()
+        self.model.sites.append(("perl.org", "www.perl.org"), True)
+        self.model.write_file(self.model.sites, atomic=True)
+        other = model.AppModel("SiteBlocker", self.fpath, "127.0.0.1")
+        self.model = other
+        self.model.cache = self.cache
+        self.assertTupleEqual(([("java.com", "www.java.com"),
+                                ("m.java.com", "api.java.com"),
+                                ("perl.org", "www.perl.org"),
+                                ("python.org", "www.python.org")], False),
+                              self.load())
+        self.assertTupleEqual((0, 1, 2), self.model.sites.selected())
+        profile = self.model.for_profile("work")
+        self.assertIs(self.cache, profile.cache)
+        self.assertListEqual([], list(profile.load_sites()))
+
+    def test_racy_signature(self):
+        """Wpis zapisany zaraz po zmianie pliku nie ufa `os.stat`."""
+        with mock.patch('parsecache.RACY_SECONDS', 2.0):
+            self.load()
+            entry = self.cache.load(self.fpath, self.model.head)
+        self.assertIsNone(entry.signature)
+        self.assertEqual(self.model.disk_hash, entry.digest)
+
+    def test_invalid_entries(self):
+        self.load()
+        path = self.cache.path(self.fpath, self.model.head)
+        for data in (b"", b"\x00garbage", parsecache.marshal.dumps((1, 2))):
+            with self.subTest(data=data):
+                with open(path, 'wb') as fw:
+                    fw.write(data)
+                self.assertIsNone(self.cache.load(self.fpath,
+                                                  self.model.head))
+                self.assertTrue(self.load()[1])
+        self.assertIsNone(self.cache.load(self.fpath, "# BEGIN Inny"))
+
+    def test_untrusted_entries(self):
+        """Wpis, który może zmienić ktoś inny, nie jest czytany."""
+        self.load()
+        path = self.cache.path(self.fpath, self.model.head)
+        self.assertIsNotNone(self.cache.load(self.fpath, self.model.head))
+        os.chmod(path, 0o666)
+        self.assertIsNone(self.cache.load(self.fpath, self.model.head))
+        self.assertTrue(self.load()[1])
+        self.assertIsNotNone(self.cache.load(self.fpath, self.model.head))
+        with mock.patch('os.geteuid', return_value=os.geteuid() + 1):
+            self.assertIsNone(self.cache.load(self.fpath, self.model.head))
+
+    def test_limit(self):
+        """Najdawniej używane wpisy są usuwane; za duży wpis nie jest
+        zapisywany."""
+        store = model.SiteStore([("a.com", "www.a.com")])
+        entry = parsecache.CacheEntry(None, b"", True, store.to_parts())
+        heads = ["# BEGIN SiteBlocker:p{}".format(i) for i in range(4)]
+        for i, head in enumerate(heads):
+            self.assertTrue(self.cache.save(self.fpath, head, entry))
+            os.utime(self.cache.path(self.fpath, head), (i, i))
+        size = os.path.getsize(self.cache.path(self.fpath, heads[0]))
+        self.cache.limit = size * 3
+        self.cache.load(self.fpath, heads[0])
+        self.cache.evict()
+        self.assertListEqual([True, False, True, True],
+                             [os.path.exists(self.cache.path(self.fpath, h))
+                              for h in heads])
+        self.cache.limit = size - 1
+        self.assertFalse(self.cache.save(self.fpath, heads[0], entry))
+        self.assertIsNone(self.cache.load(self.fpath, heads[0]))
+        self.cache.clear()
+        self.assertListEqual([], os.listdir(self.cache.directory))
+
+    def test_default_dir(self):
+        with mock.patch.dict(os.environ, XDG_CACHE_HOME="/tmp/xdg"):
+            self.assertEqual("/tmp/xdg/siteblocker",
+                             parsecache.default_dir("SiteBlocker"))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import datetime
+import model
+import os
+import scheduler
+import tempfile
+import unittest
+from unittest import mock
+
+SCHEDULE = r"""# godziny pracy
+media = Facebook.com youtube.com
+pn-pt 09:00-17:00 @media reddit.com
+so,nd 22:00-06:00 netflix.com
+"""
+# Poniedziałek.
+MONDAY = datetime.datetime(2024, 1, 1, 8, 30)
+
+
+class FakeClock:
+    """Zegar, którego czas przesuwa tylko `sleep`."""
+
+    def __init__(self, now):
+        self.current = now
+        self.sleeps = []
+
+    def now(self):
+        return self.current
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.current += datetime.timedelta(seconds=seconds)
+
+
+class TestScheduler(unittest.TestCase):
+
+    def setUp(self):
+        self.schedule = scheduler.parse_schedule(SCHEDULE.splitlines())
+        self.tmp = tempfile.TemporaryDirectory()
+        self.fpath = os.path.join(self.tmp.name, 'hosts')
+        with open(self.fpath, 'w') as fw:
+            fw.write("127.0.0.1 localhost\n"
+                     "# BEGIN SiteBlocker\n"
+                     "127.0.0.1 reddit.com www.reddit.com \n"
+                     "# 127.0.0.1 python.org www.python.org \n"
+                     "# END SiteBlocker\n")
+        self.model = model.AppModel("SiteBlocker", self.fpath, "127.0.0.1")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_parse(self):
+        self.assertSetEqual({"facebook.com", "youtube.com", "reddit.com",
+                             "netflix.com"}, set(self.schedule.rules))
+        self.assertEqual(frozenset({scheduler.Window(frozenset(range(5)),
+                                                     540, 1020)}),
+                         self.schedule.rules["reddit.com"])
+        for line in ("pn 09:00 a.com", "xx 09:00-10:00 a.com",
+                     "pn 09:00-25:00 a.com", "pn 09:00-10:00 @none",
+                     "pn 09:00-10:00 a.com ?b.com", "g = a.com -b.com"):
+            with self.subTest(line=line):
+                with self.assertRaises(scheduler.ScheduleError):
+                    scheduler.parse_schedule([line])
+        with self.assertRaisesRegex(scheduler.ScheduleError,
+                                    "^" + scheduler.ERRMSG['domain'].format(
+                                        2, r"a\.com/x") + "$"):
+            scheduler.parse_schedule(["# adresy", "* 0:00-1:00 a.com/x"])
+        schedule = scheduler.parse_schedule(["* 0:00-1:00 WWW.A.com. Zółw.pl"])
+        self.assertSetEqual({"www.a.com", "xn--zw-5ja03a.pl"},
+                            set(schedule.rules))
+
+    def test_window(self):
+        night = scheduler.Window(frozenset({5, 6}), 22 * 60, 6 * 60)
+        testsmap = {datetime.datetime(2024, 1, 6, 23, 0): True,   # sobota
+                    datetime.datetime(2024, 1, 8, 5, 59): True,   # pn rano
+                    datetime.datetime(2024, 1, 8, 6, 0): False,
+                    datetime.datetime(2024, 1, 5, 23, 0): False}  # piątek
+        for now, out in testsmap.items():
+            with self.subTest(now=now):
+                self.assertIs(out, now in night)
+        self.assertEqual(datetime.datetime(2024, 1, 8, 6, 0),
+                         night.next_transition(
+                             datetime.datetime(2024, 1, 8, 1, 0)))
+        self.assertEqual(datetime.datetime(2024, 1, 6, 22, 0),
+                         night.next_transition(MONDAY))
+
+    def test_next_transition(self):
+        testsmap = [(MONDAY, datetime.datetime(2024, 1, 1, 9, 0)),
+                    (datetime.datetime(2024, 1, 1, 9, 0),
+                     datetime.datetime(2024, 1, 1, 17, 0)),
+                    (datetime.datetime(2024, 1, 5, 17, 0),
+                     datetime.datetime(2024, 1, 6, 22, 0))]
+        for now, out in testsmap:
+            with self.subTest(now=now):
+                self.assertEqual(out, self.schedule.next_transition(now))
+        self.assertIsNone(scheduler.Schedule().next_transition(MONDAY))
+
+    def test_step(self):
+        clock = FakeClock(MONDAY)
+        runner = scheduler.Scheduler(self.model, self.schedule, clock)
+        self.assertTupleEqual((0, 0, 1), runner.step())
+        with open(self.fpath) as fr:
+            self.assertIn("# 127.0.0.1 reddit.com", fr.read())
+        clock.current = datetime.datetime(2024, 1, 1, 9, 0)
+        self.assertTupleEqual((2, 0, 1), runner.step())
+        self.model.load_sites()
+        self.assertListEqual(
+            [("facebook.com", "www.facebook.com"),
+             ("reddit.com", "www.reddit.com"),
+             ("youtube.com", "www.youtube.com")],
+            [self.model.sites[n] for n in self.model.sites.selected()])
+        self.assertTupleEqual((0, 0, 0), runner.step())
+
+    def test_run_single_write(self):
+        """Tysiące stron zmieniających stan o tej samej porze - jeden zapis
+        na zmianę, a między zmianami sen (najwyżej `MAX_SLEEP`) bez zapisu.
+        """
+        schedule = scheduler.parse_schedule(
+            ["pn-pt 09:00-17:00 " + " ".join("site{}.com".format(i)
+                                             for i in range(2000))])
+        clock = FakeClock(MONDAY)
+        runner = scheduler.Scheduler(self.model, schedule, clock)
+        with mock.patch.object(self.model, 'write_file',
+                               wraps=self.model.write_file) as write:
+            runner.run(steps=10)
+        self.assertEqual(2, write.call_count)
+        self.assertListEqual([1800.0] + [3600.0] * 9, clock.sleeps)
+        self.assertEqual(2000 + 2, len(self.model.sites))
+        self.assertTupleEqual((self.model.sites.position("reddit.com"),),
+                              self.model.sites.selected())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import model
+import os
+import sitedb
+import tempfile
+import unittest
+
+HOSTS_FILE = r"""127.0.0.1    localhost
+# BEGIN SiteBlocker
+# 127.0.0.1 python.org www.python.org
+127.0.0.1 java.com www.java.com
+127.0.0.1 m.java.com api.java.com
+127.0.0.1  www.only.com
+# END SiteBlocker
+"""
+
+
+class FakeClock:
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestSiteDatabase(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.fpath = os.path.join(self.tmp.name, 'hosts')
+        with open(self.fpath, 'w') as fw:
+            fw.write(HOSTS_FILE)
+        self.clock = FakeClock()
+        self.db = sitedb.SiteDatabase(os.path.join(self.tmp.name, 'sites.db'),
+                                      self.clock)
+        self.db.user = "ala"
+        self.addCleanup(self.db.close)
+        self.model = model.AppModel("SiteBlocker", self.fpath, "127.0.0.1")
+        self.model.db = self.db
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def read(self):
+        with open(self.fpath) as fr:
+            return fr.read()
+
+    def test_load_sites(self):
+        """Pierwszy odczyt przenosi blok do bazy; kolejne czytają z bazy."""
+        plain = model.AppModel("SiteBlocker", self.fpath, "127.0.0.1")
+        expected = list(plain.load_sites())
+        self.assertListEqual(expected, list(self.model.load_sites()))
+        self.assertTrue(self.db.has_block(self.model.head))
+        os.unlink(self.fpath)
+        other = self.model.for_profile(None)
+        self.assertIs(self.db, other.db)
+        store = other.load_sites()
+        self.assertListEqual(expected, list(store))
+        self.assertEqual(plain.sites.selected(), store.selected())
+        self.assertEqual(1, store.position("api.java.com"))
+
+    def test_order(self):
+        """Baza zwraca pozycje w kolejności `SiteStore.sort`, także przy tym
+        samym adresie bez `www.`."""
+        with open(self.fpath, 'w') as fw:
+            fw.write("# BEGIN SiteBlocker\n127.0.0.1 zz.com \n"
+                     "127.0.0.1  www.zz.com \n127.0.0.1  www.b.com \n"
+                     "127.0.0.1 a.com \n127.0.0.1  www.a.com \n"
+                     "# END SiteBlocker\n")
+        names = ["a.com", "www.a.com", "www.b.com", "www.zz.com", "zz.com"]
+        self.assertListEqual(names, self.model.load_sites().names)
+        self.assertListEqual(names, self.db.load_store(self.model.head).names)
+        self.assertListEqual(names, [r.name or r.alias
+                                     for r in self.db.query()])
+
+    def test_write_file(self):
+        """Blok z zapytania jest taki sam jak z `render_block`; przełączenie
+        zachowuje dane pozycji."""
+        sites = self.model.load_sites()
+        self.clock.now = 2000.0
+        self.db.source = "lista.txt"
+        sites.append(("perl.org", "www.perl.org"), True)
+        sites.set_blocked(sites.position("python.org"), True)
+        sites.delete([sites.position("java.com")])
+        self.assertTupleEqual((1, 1, 1), self.model.write_file(sites,
+                                                               atomic=True))
+        plain = model.AppModel("SiteBlocker", self.fpath, "127.0.0.1")
+        plain.load_sites()
+        expected = self.read()
+        plain.write_file(plain.sites, atomic=True, force=True)
+        self.assertEqual(self.read(), expected)
+        self.assertEqual(plain.disk_hash, self.model.disk_hash)
+        self.assertIn("\n127.0.0.1 m.java.com api.java.com \n127.0.0.1  "
+                      "www.only.com \n127.0.0.1 perl.org www.perl.org \n",
+                      expected)
+        records = {r.name or r.alias: r for r in self.db.query()}
+        self.assertListEqual(["m.java.com", "perl.org", "python.org",
+                              "www.only.com"], sorted(records))
+        self.assertEqual(
+            sitedb.SiteRecord(self.model.head, "perl.org", "www.perl.org",
+                              True, "lista.txt", 2000.0, "ala", 0),
+            records["perl.org"])
+        self.assertTupleEqual((True, None, 1000.0),
+                              records["python.org"][3:6])
+        self.assertTupleEqual((0, 0, 0), self.model.write_file(sites))
+        self.model.write_file(sites, atomic=False, force=True)
+        self.assertEqual(expected, self.read())
+
+    def test_layout(self):
+        """Układ zwarty zapisany w bazie zostaje przy kolejnych zapisach."""
+        self.model.load_sites()
+        self.model.dense = 4
+        self.model.write_file(self.model.sites, atomic=True, force=True)
+        other = self.model.for_profile(None)
+        other.dense = None
+        sites = other.load_sites()
+        self.assertEqual(4, other.layout)
+        sites.set_blocked(sites.position("python.org"), True)
+        other.write_file(sites, atomic=True)
+        self.assertIn("\n127.0.0.1 java.com www.java.com python.org "
+                      "www.python.org\n", self.read())
+
+    def test_query(self):
+        self.model.load_sites()
+        self.clock.now = 5000.0
+        self.db.source = "ads"
+        self.model.sites.append(("ads.net", "www.ads.net"), True)
+        self.model.write_file(self.model.sites, atomic=True)
+        self.db.add_hits(self.model.head, {"ads.net": 3, "java.com": 1})
+        self.assertListEqual([("ads.net", 3)],
+                             [(r.name, r.hits)
+                              for r in self.db.query(source="ads")])
+        self.assertListEqual(["ads.net"], [r.name for r in
+                                           self.db.query(since=4000.0)])
+        self.assertEqual(5, len(list(self.db.query(self.model.head,
+                                                   since=0.0))))
+        # Zapytania `cli query` - zawsze z blokiem.
+        head = self.model.head
+        for (sql, params), index in (
+                (self.db.query_sql(head, source="ads"), "sites_block_list"),
+                (self.db.query_sql(head, since=4000.0), "sites_block_added"),
+                (self.db.query_sql(head, "ads", 4000.0), "sites_block_"),
+                ((sitedb.RENDER, {'host': "", 'nl': "", 'block': head}),
+                 "sites_order")):
+            with self.subTest(index=index):
+                plan = self.db.plan(sql, params)
+                self.assertIn("USING INDEX " + index, plan)
+                self.assertNotIn("TEMP B-TREE", plan)
+
+    def test_profiles(self):
+        """Zmiany profili zapisane przez `write_profiles` trafiają do bazy."""
+        self.model.load_sites()
+        work = self.model.for_profile("work")
+        work.sites.append(("reddit.com", "www.reddit.com"), True)
+        work.write_file(work.sites, atomic=True)
+        models = self.model.load_profiles()
+        models["work"].sites.set_all(False)
+        self.model.write_profiles([models["work"]])
+        self.assertIn("# 127.0.0.1 reddit.com www.reddit.com \n", self.read())
+        self.assertListEqual([(False, "reddit.com")],
+                             [(r.blocked, r.name) for r in
+                              self.db.query(work.head)])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import io
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import timing
+import unittest
+from unittest import mock
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class TestTiming(unittest.TestCase):
+
+    def test_phase_timer(self):
+        timer = timing.PhaseTimer()
+        with timer.phase("load"):
+            pass
+        with timer.phase("render"):
+            pass
+        self.assertListEqual(["load", "render"],
+                             [name for name, ms in timer.phases])
+        self.assertTrue(all(ms >= 0 for name, ms in timer.phases))
+        lines = timer.report().splitlines()
+        self.assertEqual(3, len(lines))
+        self.assertTrue(lines[-1].startswith("razem"))
+
+    def test_report(self):
+        f = io.StringIO()
+        with mock.patch('timing.ENABLED', False):
+            timing.report(f)
+        self.assertEqual('', f.getvalue())
+        with mock.patch('timing.ENABLED', True):
+            timing.report(f)
+        self.assertTrue(f.getvalue().splitlines()[-1].startswith("razem"))
+
+    def test_tracer(self):
+        out = io.StringIO()
+        tracer = timing.Tracer(out)
+        with tracer.span("block_selected", entries=3):
+            with tracer.span("write_file") as span:
+                span.set(lines=5)
+        records = [json.loads(line) for line in out.getvalue().splitlines()]
+        self.assertListEqual(["write_file", "block_selected"],
+                             [r['span'] for r in records])
+        self.assertTupleEqual(("block_selected", 1, 5), tuple(
+            records[0][k] for k in ('parent', 'depth', 'lines')))
+        self.assertTupleEqual((None, 0, 3), tuple(
+            records[1][k] for k in ('parent', 'depth', 'entries')))
+        self.assertGreaterEqual(records[1]['ms'], records[0]['ms'])
+
+    def test_tracer_disabled(self):
+        """Bez zapisu `span` zwraca pusty obiekt, a `traced` - tę samą
+        funkcję."""
+        tracer = timing.Tracer()
+        self.assertIs(timing.NULL_SPAN, tracer.span("x", entries=1))
+        with mock.patch('timing.tracer', tracer):
+            self.assertIs(len, timing.traced()(len))
+        with mock.patch('timing.tracer', timing.Tracer(io.StringIO())):
+            self.assertIs(len, timing.traced()(len).__wrapped__)
+
+    def test_trace_env(self):
+        """SITEBLOCKER_TRACE=- zapisuje fazy CLI i modelu na stderr."""
+        with tempfile.TemporaryDirectory() as tmp:
+            fpath = os.path.join(tmp, 'hosts')
+            with open(fpath, 'w') as fw:
+                fw.write("# BEGIN SiteBlocker\n"
+                         "127.0.0.1 java.com www.java.com \n"
+                         "# END SiteBlocker\n")
+            env = dict(os.environ, SITEBLOCKER_TRACE='-', XDG_CACHE_HOME=tmp)
+            proc = subprocess.run(
+                [sys.executable, '-c', 'import cli; cli.main()', '--hosts',
+                 fpath, 'list'], cwd=ROOT, env=env, stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE, check=True)
+        records = {r['span']: r for r in map(json.loads,
+                                              proc.stderr.splitlines())}
+        self.assertEqual(1, records["AppModel.iter_sites"]['entries'])
+        self.assertEqual("load sites", records["AppModel.load_sites"]['parent'])
+
+    def test_lazy_gui_imports(self):
+        """Import `controller` i `cli` nie ładuje tkintera ani subprocess."""
+        code = ("import sys, cli, controller; "
+                "print(sorted({'tkinter', 'view', 'subprocess'} & "
+                "set(sys.modules)))")
+        out = subprocess.check_output([sys.executable, '-c', code], cwd=ROOT)
+        self.assertEqual(b"[]", out.strip())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,11 +1,17 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
+import model
 import tkinter as tk
 import unittest
 import view
 from unittest import mock
 
+SITES = [(False, "news.google.com", "www.news.google.com"),
+         (True, "spotify.com", "www.spotify.com"),
+         (False, "stackoverflow.com", "www.stackoverflow.com"),
+         (True, "youtube.com", "www.youtube.com")]
+
 
 class TestAppController(unittest.TestCase):
 
@@ -16,134 +22,118 @@ class TestAppController(unittest.TestCase):
         # self.v.create_input_widget.assert_called_once()
 
     def test_sel_sites(self):
-        curselection = (0, 2, 3)
-        tk.Listbox.curselection = mock.Mock(return_value=curselection)
-        self.assertTupleEqual(curselection, self.v.sel_sites)
+        store = model.SiteStore.from_sites(SITES)
+        self.v.load_from_file(store)
+        self.assertTupleEqual((1, 3), self.v.sel_sites)
 
     def test_all_sites(self):
-        listboxget = ["flask.pocoo.org    www.flask.pocoo.org",
-                      "java.com    www.java.com",
-                      "python.org    www.python.org"]
-        out = [("flask.pocoo.org", "www.flask.pocoo.org"),
-               ("java.com", "www.java.com"),
-               ("python.org", "www.python.org")]
-        tk.Listbox.get = mock.Mock(return_value=listboxget)
-        self.assertListEqual(out, self.v.all_sites)
+        store = model.SiteStore.from_sites(SITES)
+        self.v.load_from_file(store)
+        self.assertListEqual([s[1:3] for s in SITES], self.v.all_sites)
 
     def test_user_inp(self):
         out = "www.python.org"
         tk.StringVar.get = mock.Mock(return_value=out)
         self.assertEqual(out, self.v.user_input)
 
-    def test_add_to_listbox_0(self):
-        """Nazwa strony jest krótsza niż 16 znaków, więc nie trzeba zmieniać
-        ustawienia tabulatora. Wprowadzona strona będzie automatycznie
-        zaznaczona - sel = True.
-        """
-        sel = True
-        elem = ("java.com", "www.java.com")
-        out = "java.com        www.java.com"
-        self.v.listbox = mock.Mock()
-        self.v.entry = mock.Mock()
-        self.v.add_to_listbox(sel, elem)
-        self.v.listbox.insert.assert_called_once_with('end', out)
-        self.v.listbox.selection_set.assert_called_once_with(tk.END)
-        self.v.entry.delete.assert_called_once_with(0, 'end')
-        self.v.entry.focus.assert_called_once()
-
-    def test_add_to_listbox_1(self):
-        """Nazwa strony jest krótsza niż 16 znaków, więc nie trzeba zmieniać
-        ustawienia tabulatora. Wprowadzona strona nie będzie zaznaczona -
-        sel = False.
-        """
-        sel = False
-        elem = ("java.com", "www.java.com")
-        out = "java.com        www.java.com"
-        self.v.listbox = mock.Mock()
-        self.v.entry = mock.Mock()
-        self.v.add_to_listbox(sel, elem)
-        self.v.listbox.insert.assert_called_once_with('end', out)
-        self.v.listbox.selection_set.assert_not_called()
-        self.v.entry.delete.assert_called_once_with(0, 'end')
-        self.v.entry.focus.assert_called_once()
-
-    def test_add_to_listbox_2(self):
-        """Nazwa strony jest dłuższa niż 16 znaków, więc trzeba zmieniać
-        ustawienia tabulatora. Wprowadzona strona będzie automatycznie
-        zaznaczona - sel = True.
-        """
-        sel = True
-        elem = ("stackoverflow.com", "www.stackoverflow.com")
-        out = "stackoverflow.com   www.stackoverflow.com"
-        self.v.listbox = mock.Mock()
-        self.v.entry = mock.Mock()
-        self.v.add_to_listbox(sel, elem)
-        self.v.listbox.insert.assert_called_once_with('end', out)
-        self.v.listbox.selection_set.assert_called_once_with(tk.END)
-        self.v.entry.delete.assert_called_once_with(0, 'end')
-        self.v.entry.focus.assert_called_once()
+    def test_format_row(self):
+        """Nazwa strony krótsza niż 16 znaków - tabulator bez zmian, dłuższa
+        - tabulator przesunięty o 4."""
+        testsmap = {("java.com", "www.java.com"):
+                        "java.com        www.java.com",
+                    ("stackoverflow.com", "www.stackoverflow.com"):
+                        "stackoverflow.com   www.stackoverflow.com"}
+        for elem, out in testsmap.items():
+            with self.subTest():
+                self.assertEqual(out, view.format_row(elem))
 
-    def test_add_to_listbox_3(self):
-        """Nazwa strony jest dłuższa niż 16 znaków, więc trzeba zmieniać
-        ustawienia tabulatora. Wprowadzona strona nie będzie zaznaczona -
-        sel = False.
-        """
-        sel = True
-        elem = ("stackoverflow.com", "www.stackoverflow.com")
-        out = "stackoverflow.com   www.stackoverflow.com"
-        self.v.listbox = mock.Mock()
+    def test_show_added(self):
+        store = model.SiteStore.from_sites(SITES)
+        self.v.load_from_file(store)
+        store.append(("zoom.us", "www.zoom.us"), True)
         self.v.entry = mock.Mock()
-        self.v.add_to_listbox(sel, elem)
-        self.v.listbox.insert.assert_called_once_with('end', out)
-        self.v.listbox.selection_set.assert_called_once_with(tk.END)
+        self.v.show_added()
+        self.assertEqual(view.format_row(("zoom.us", "www.zoom.us")),
+                         self.v.listbox.get(tk.END))
+        self.assertIn(self.v.listbox.size() - 1, self.v.listbox.curselection())
         self.v.entry.delete.assert_called_once_with(0, 'end')
         self.v.entry.focus.assert_called_once()
 
-    def test_delete_from_listbox_0(self):
-        result_map = [((1, 3, 7), [mock.call(7), mock.call(3), mock.call(1)]),
-                      ((2,), [mock.call(2)]),
-                      ((0, 1, 2, 3), [mock.call(3), mock.call(2), mock.call(1),
-                                      mock.call(0)])]
-        for cursel, calls in result_map:
+    def test_render_window(self):
+        """W widżecie są tylko widoczne wiersze, zaznaczenie jest brane
+        z modelu."""
+        store = model.SiteStore(("site{}.com".format(i),
+                                 "www.site{}.com".format(i))
+                                for i in range(1000))
+        store.select(range(0, 1000, 2))
+        self.v.load_from_file(store)
+        rows = self.v.sitelist.rows
+        self.assertEqual(rows, self.v.listbox.size())
+        self.assertEqual(view.format_row(store[0]), self.v.listbox.get(0))
+        self.assertTupleEqual(tuple(range(0, rows, 2)),
+                              self.v.listbox.curselection())
+
+    def test_yview(self):
+        store = model.SiteStore(("site{}.com".format(i),
+                                 "www.site{}.com".format(i))
+                                for i in range(1000))
+        self.v.load_from_file(store)
+        rows = self.v.sitelist.rows
+        testsmap = [((tk.MOVETO, '0.5'), 500),
+                    ((tk.SCROLL, '1', tk.PAGES), 500 + rows),
+                    ((tk.SCROLL, '-3', tk.UNITS), 497 + rows),
+                    ((tk.MOVETO, '1.0'), 1000 - rows),
+                    ((tk.MOVETO, '-0.5'), 0)]
+        for args, top in testsmap:
             with self.subTest():
-                self.v.listbox.curselection = mock.Mock(return_value=cursel)
-                self.v.listbox.delete = mock.Mock()
-                self.v.delete_from_listbox()
-                self.v.listbox.delete.assert_has_calls(calls)
-
-    def test_delete_from_listbox_1(self):
-        """Nie zaznaczono nic do usunięcia, ale kliknięto przycisk usunięcia."""
-        self.v.listbox.curselection = mock.Mock(return_value=())
-        self.v.listbox.delete = mock.Mock()
-        self.v.showerr = mock.Mock()
-        self.v.delete_from_listbox()
-        self.v.listbox.delete.assert_not_called()
-        self.v.showerr.assert_called_once_with(self.v.errmsg['notselected'])
-
-    def test_load_user_list_0(self):
-        user_list = [(False, "news.google.com", "www.news.google.com"),
-                     (True, "stackoverflow.com", "www.stackoverflow.com"),
-                     (False, "youtube.com", "www.youtube.com"),
-                     (True, "spotify.com", "www.spotify.com")]
-        add_calls = [mock.call(False, ("news.google.com", "www.news.google.com")),
-                     mock.call(True, ("spotify.com", "www.spotify.com")),
-                     mock.call(True, ("stackoverflow.com", "www.stackoverflow.com")),
-                     mock.call(False, ("youtube.com", "www.youtube.com"))]
-        # select_calls = [mock.call(1), mock.call(2)]  # to indeksy listy posortowanej
-        self.v.add_to_listbox = mock.Mock()
-        self.v.listbox.selection_set = mock.Mock()    
-        self.v.load_from_file(user_list)
-        self.v.add_to_listbox.assert_has_calls(add_calls)
-        self.assertTrue(self.v.add_to_listbox.call_count == 4)
-        self.v.listbox.selection_set.assert_not_called()
+                self.v.sitelist.yview(*args)
+                self.assertEqual(top, self.v.sitelist.top)
+                self.assertEqual(view.format_row(store[top]),
+                                 self.v.listbox.get(0))
+
+    def test_on_select(self):
+        """Zaznaczenie w widżecie trafia do modelu z przesunięciem o `top`."""
+        store = model.SiteStore(("site{}.com".format(i),
+                                 "www.site{}.com".format(i))
+                                for i in range(100))
+        self.v.load_from_file(store)
+        self.v.sitelist.see(50)
+        top = self.v.sitelist.top
+        self.v.listbox.selection_set(1)
+        self.v.sitelist.on_select()
+        self.assertTupleEqual((top + 1,), store.selected())
+
+    def test_show_filtered(self):
+        """Przefiltrowana lista jest wyświetlana od początku; zaznaczenie
+        trafia do całej listy w modelu."""
+        store = model.SiteStore(("site{}.com".format(i),
+                                 "www.site{}.com".format(i))
+                                for i in range(100))
+        self.v.load_from_file(store)
+        self.v.sitelist.see(50)
+        self.v.show_filtered(model.FilteredSites(store, [7, 17, 27]))
+        self.assertEqual(0, self.v.sitelist.top)
+        self.assertEqual(3, self.v.listbox.size())
+        self.assertEqual(view.format_row(store[17]), self.v.listbox.get(1))
+        self.v.listbox.selection_set(1)
+        self.v.sitelist.on_select()
+        self.assertTupleEqual((17,), store.selected())
+
+    def test_filter_delay(self):
+        """Filtrowanie jest odkładane do przerwy w pisaniu."""
+        self.v.root.after = mock.Mock(side_effect=["job1", "job2"])
+        self.v.root.after_cancel = mock.Mock()
+        self.v.filter_var.set("py")
+        self.v.filter_var.set("pyt")
+        self.v.root.after_cancel.assert_called_once_with("job1")
+        self.v.root.after.assert_called_with(view.FILTER_DELAY,
+                                             self.v.filter_by_user)
+        self.assertEqual("pyt", self.v.filter_text)
 
     def test_load_user_list_1(self):
-        user_list = []
-        self.v.add_to_listbox = mock.Mock()
-        # self.v.listbox.selection_set = mock.Mock()
-        self.v.load_from_file(user_list)
-        self.v.add_to_listbox.assert_not_called()
-        # self.v.listbox.selection_set.assert_not_called()
+        self.v.load_from_file(model.SiteStore())
+        self.assertEqual(0, self.v.listbox.size())
+        self.assertTupleEqual((), self.v.sel_sites)
 
 
 def main():
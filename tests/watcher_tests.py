@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+import tempfile
+import unittest
+import watcher
+
+
+class TestWatcher(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.fpath = os.path.join(self.tmp.name, 'hosts')
+        with open(self.fpath, 'w') as fw:
+            fw.write("127.0.0.1 localhost\n")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def check(self, w):
+        """Dopisanie, podmiana przez `os.replace` i zmiana innego pliku."""
+        self.addCleanup(w.close)
+        self.assertFalse(w.changed())
+        with open(self.fpath, 'a') as fw:
+            fw.write("# BEGIN SiteBlocker\n")
+        self.assertTrue(w.changed())
+        self.assertFalse(w.changed())
+        tmp = os.path.join(self.tmp.name, '.hosts.tmp')
+        with open(tmp, 'w') as fw:
+            fw.write("127.0.0.1 localhost\n")
+        self.assertFalse(w.changed())
+        os.replace(tmp, self.fpath)
+        self.assertTrue(w.changed())
+
+    def test_stat_watcher(self):
+        w = watcher.StatWatcher(self.fpath)
+        self.assertIsNone(w.fileno())
+        self.check(w)
+
+    def test_inotify_watcher(self):
+        try:
+            w = watcher.InotifyWatcher(self.fpath)
+        except OSError:
+            self.skipTest("inotify jest niedostępne")
+        self.assertIsInstance(w.fileno(), int)
+        self.check(w)
+
+    def test_create_watcher(self):
+        w = watcher.create_watcher(self.fpath)
+        self.addCleanup(w.close)
+        self.assertTrue(hasattr(w, 'changed'))
+
+
+if __name__ == '__main__':
+    unittest.main()
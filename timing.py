@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""Pomiar czasu startu programu z podziałem na fazy (w milisekundach).
+
+Raport jest wypisywany na stderr, gdy ustawiona jest zmienna środowiskowa
+SITEBLOCKER_TIMING, np.:
+
+    SITEBLOCKER_TIMING=1 python3 KATALOG_PROGRAMU list
+
+Szczegółowy zapis faz (`span`) - także operacji w GUI i wywołań modelu pod
+nimi, z liczbą pozycji - trafia w formacie JSON lines do pliku wskazanego
+przez zmienną SITEBLOCKER_TRACE (`-` oznacza stderr), np.:
+
+    SITEBLOCKER_TRACE=/tmp/trace.jsonl python3 KATALOG_PROGRAMU
+
+Bez tej zmiennej `span` zwraca zawsze ten sam pusty obiekt, a `traced` nie
+opakowuje funkcji, więc pomiar nic nie kosztuje.
+
+Moduł powinien być importowany jako pierwszy - moment jego importu jest
+początkiem pomiaru.
+"""
+
+import time
+START: float = time.perf_counter()
+
+from typing import Dict, List, Tuple  # noqa: E402
+import os  # noqa: E402
+import sys  # noqa: E402
+
+ENABLED: bool = bool(os.environ.get('SITEBLOCKER_TIMING'))
+TRACE: str or None = os.environ.get('SITEBLOCKER_TRACE') or None
+
+
+class Phase:
+    """Menedżer kontekstu mierzący jedną fazę - zob. `PhaseTimer.phase`."""
+
+    def __init__(self, timer: 'PhaseTimer', name: str) -> None:
+        self.timer = timer
+        self.name = name
+        self.start: float = 0.0
+        self.span = tracer.span(name)
+
+    def __enter__(self) -> 'Phase':
+        self.span.__enter__()
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        elapsed: float = (time.perf_counter() - self.start) * 1000
+        self.timer.phases.append((self.name, elapsed))
+        self.span.__exit__(*exc)
+
+
+class PhaseTimer:
+    """Zbiera czasy kolejnych faz i czas od `start` do wygenerowania
+    raportu."""
+
+    def __init__(self, start: float or None = None) -> None:
+        self.start: float = time.perf_counter() if start is None else start
+        self.phases: List[Tuple[str, float]] = []
+
+    def phase(self, name: str) -> Phase:
+        return Phase(self, name)
+
+    def total(self) -> float:
+        """Czas od `start` w milisekundach."""
+        return (time.perf_counter() - self.start) * 1000
+
+    def report(self) -> str:
+        lines: List[str] = ["{:<24} {:8.1f} ms".format(name, ms)
+                            for name, ms in self.phases]
+        lines.append("{:<24} {:8.1f} ms".format("razem", self.total()))
+        return '\n'.join(lines)
+
+
+class Span:
+    """Menedżer kontekstu mierzący jedną fazę dla `Tracer`. Przy wyjściu
+    zapisuje rekord z nazwą, fazą nadrzędną, czasem i polami z `set`."""
+    __slots__ = ('tracer', 'name', 'fields', 'parent', 'start')
+
+    def __init__(self, tracer: 'Tracer', name: str, fields: Dict) -> None:
+        self.tracer = tracer
+        self.name = name
+        self.fields = fields
+        self.parent: str or None = None
+        self.start: float = 0.0
+
+    def __enter__(self) -> 'Span':
+        stack: List[Span] = self.tracer.stack
+        self.parent = stack[-1].name if stack else None
+        stack.append(self)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        end: float = time.perf_counter()
+        stack: List[Span] = self.tracer.stack
+        if stack and stack[-1] is self:
+            stack.pop()
+        record = {'span': self.name, 'parent': self.parent,
+                  'depth': len(stack),
+                  'at': round((self.start - START) * 1000, 3),
+                  'ms': round((end - self.start) * 1000, 3)}
+        record.update(self.fields)
+        if exc and exc[0] is not None:
+            record['error'] = exc[0].__name__
+        self.tracer.emit(record)
+
+    def set(self, **fields) -> None:
+        self.fields.update(fields)
+
+
+class NullSpan:
+    """Pusty `Span` zwracany, gdy zapis jest wyłączony."""
+    __slots__ = ()
+
+    def __enter__(self) -> 'NullSpan':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        pass
+
+    def set(self, **fields) -> None:
+        pass
+
+
+NULL_SPAN = NullSpan()
+
+
+class Tracer:
+    """Zapisuje fazy (`span`) jako wiersze JSON do `target` - ścieżki pliku,
+    `-` (stderr) lub otwartego pliku. Bez `target` nic nie mierzy.
+    """
+
+    def __init__(self, target=None) -> None:
+        self.target = target
+        self.out = None
+        self.stack: List[Span] = []
+
+    @property
+    def enabled(self) -> bool:
+        return self.target is not None
+
+    def span(self, name: str, **fields):
+        """Zwraca menedżer kontekstu mierzący fazę `name`; `fields` (i te
+        dodane przez `set`) trafiają do zapisu."""
+        if self.target is None:
+            return NULL_SPAN
+        return Span(self, name, fields)
+
+    def emit(self, record: Dict) -> None:
+        import json  # tylko przy włączonym zapisie - krótszy start programu
+        if self.out is None:
+            if self.target == '-':
+                self.out = sys.stderr
+            elif isinstance(self.target, str):
+                self.out = open(self.target, 'a')
+            else:
+                self.out = self.target
+        self.out.write(json.dumps(record) + '\n')
+        self.out.flush()
+
+
+# Zapis faz wg zmiennej SITEBLOCKER_TRACE.
+tracer = Tracer(TRACE)
+# Fazy startu programu, liczone od importu tego modułu w `__main__`.
+startup = PhaseTimer(START)
+
+
+def span(name: str, **fields):
+    """Faza zapisywana przez `tracer` (zob. `Tracer.span`)."""
+    return tracer.span(name, **fields)
+
+
+def traced(name: str or None = None):
+    """Dekorator - mierzy każde wywołanie funkcji jako fazę `name`
+    (domyślnie nazwa funkcji). Jeśli zapis jest wyłączony w chwili importu,
+    zwraca funkcję bez zmian."""
+    def decorator(fn):
+        if not tracer.enabled:
+            return fn
+        label: str = name or fn.__qualname__
+
+        def wrapper(*args, **kwargs):
+            with tracer.span(label):
+                return fn(*args, **kwargs)
+        wrapper.__wrapped__ = fn
+        wrapper.__name__ = fn.__name__
+        wrapper.__qualname__ = fn.__qualname__
+        wrapper.__doc__ = fn.__doc__
+        return wrapper
+    return decorator
+
+
+def report(file=None) -> None:
+    """Wypisuje raport startu, jeśli pomiar jest włączony."""
+    if ENABLED:
+        print(startup.report(), file=file or sys.stderr)
@@ -2,19 +2,123 @@
 # -*- coding: utf-8 -*-
 
 import tkinter as tk
-from tkinter import ttk, font, messagebox
+from tkinter import ttk, filedialog, font, messagebox
 from typing import Dict, List, Tuple
 
-ERRMSG: Dict[str, str] = {'notselected': "Nie wybrano żadnej pozycji",
-                          'unittests': "View is currently running standalone "
+ERRMSG: Dict[str, str] = {'unittests': "View is currently running standalone "
                                        "- for unittests purpose only."}
 LABELS: Dict[str, str] = {'add': "Dodaj",
                           'block': "Blokuj",
                           'cancel': "Anuluj",
                           'delete': "Usuń",
                           'err': "Błąd",
+                          'filter': "Szukaj:",
+                          'import': "Importuj",
+                          'importfile': "Wybierz listę stron do importu",
+                          'info': "Informacja",
                           'insert': "Podaj adres strony:",
                           'select': "Zaznacz strony do zablokowania:"}
+# Opóźnienie filtrowania listy po ostatnim wpisanym znaku (ms) - przy
+# szybkim pisaniu lista jest filtrowana raz.
+FILTER_DELAY: int = 150
+# Odstęp między krokami budowy indeksu wyszukiwania w tle (ms).
+INDEX_DELAY: int = 1
+
+
+def format_row(elem: Tuple[str, str]) -> str:
+    """Zwraca wiersz listy z parą adresów (xxx.com i www.xxx.com). Sprawdza,
+    czy pierwszy element jest dłuższy niż 16 znaków, jeśli tak to przesuwa
+    tabulator o 4 i tak do skutku (wyliczane od razu, bez pętli).
+    """
+    sitename: int = len(elem[0])
+    tab: int = 16 if sitename < 16 else sitename + 4 - sitename % 4
+    return (' ' * (tab - sitename)).join(elem)
+
+
+class VirtualListbox:
+    """Lista stron, która trzyma w widżecie Listbox tylko aktualnie widoczne
+    wiersze. Dane i zaznaczenie są w modelu (`store`, np. `model.SiteStore`
+    lub `model.FilteredSites`): `len(store)`, `store[n]` - para adresów,
+    `store.blocked_ranges` i `store.set_blocked` - zaznaczenie. Przewijanie
+    i zaznaczanie zmieniają tylko okno widocznych wierszy, więc koszt nie
+    zależy od długości listy.
+    """
+
+    def __init__(self, master, scrollbar: tk.Scrollbar, **kw) -> None:
+        self.store = None
+        self.top: int = 0
+        self.scrollbar = scrollbar
+        self.listbox = tk.Listbox(master, selectmode=tk.MULTIPLE,
+                                  exportselection=False, **kw)
+        self.listbox.bind('<<ListboxSelect>>', self.on_select)
+        for seq in ('<MouseWheel>', '<Button-4>', '<Button-5>'):
+            self.listbox.bind(seq, self.on_wheel)
+        self.scrollbar.config(command=self.yview)
+
+    def __len__(self) -> int:
+        return len(self.store) if self.store is not None else 0
+
+    @property
+    def rows(self) -> int:
+        """Liczba widocznych wierszy (okno jest stałej wysokości)."""
+        return int(self.listbox.cget('height'))
+
+    def set_store(self, store) -> None:
+        self.store = store
+        self.top = 0
+        self.render()
+
+    def render(self) -> None:
+        """Wstawia do widżetu Listbox tylko wiersze od `top` do `top + rows`
+        i zaznacza te, które są zaznaczone w modelu.
+        """
+        total: int = len(self)
+        self.top = max(0, min(self.top, total - self.rows))
+        end: int = min(total, self.top + self.rows)
+        self.listbox.delete(0, tk.END)
+        if end > self.top:
+            # Jedno wywołanie Tcl dla wszystkich wierszy i jedno dla każdego
+            # ciągłego zakresu zaznaczonych pozycji.
+            self.listbox.insert(tk.END, *map(format_row,
+                                             self.store[self.top:end]))
+            for first, last in self.store.blocked_ranges(self.top, end):
+                self.listbox.selection_set(first - self.top, last - self.top)
+        if total:
+            self.scrollbar.set(self.top / total, end / total)
+        else:
+            self.scrollbar.set(0.0, 1.0)
+
+    def yview(self, *args) -> None:
+        """Obsługuje polecenia paska przewijania (`moveto` i `scroll`)."""
+        if args[0] == tk.MOVETO:
+            self.top = int(float(args[1]) * len(self))
+        elif args[0] == tk.SCROLL:
+            step: int = int(args[1])
+            if args[2] == tk.PAGES:
+                step *= self.rows
+            self.top += step
+        self.render()
+
+    def see(self, n: int) -> None:
+        """Przewija listę tak, aby pozycja `n` była widoczna."""
+        if n < self.top:
+            self.top = n
+        elif n >= self.top + self.rows:
+            self.top = n - self.rows + 1
+        self.render()
+
+    def on_wheel(self, event) -> str:
+        down: bool = event.num == 5 or event.delta < 0
+        self.yview(tk.SCROLL, 3 if down else -3, tk.UNITS)
+        return 'break'
+
+    def on_select(self, event=None) -> None:
+        """Przepisuje zaznaczenie widocznych wierszy do modelu."""
+        if self.store is None:
+            return
+        cur = set(self.listbox.curselection())
+        for i in range(self.listbox.size()):
+            self.store.set_blocked(self.top + i, i in cur)
 
 
 class AppView:
@@ -25,6 +129,8 @@ class AppView:
         self.btn_sty = {'pady': (5, 5), 'padx': (5, 5), 'side': tk.RIGHT}
         self.labels: Dict[str, str] = LABELS
         self.errmsg: Dict[str, str] = ERRMSG
+        self.filter_job = None
+        self.index_job = None
         self.create_input_widget()
         self.create_listbox()
         # self.create_dropdown()
@@ -39,23 +145,30 @@ class AppView:
 
     @property
     def sel_sites(self) -> Tuple[int, ...]:
-        """Pobiera krotkę z indeksami zaznaczonych pozycji na liście w widżecie
-        Listbox.
+        """Pobiera krotkę z indeksami zaznaczonych pozycji na liście.
+        Zaznaczenie jest trzymane w modelu, nie w widżecie Listbox.
         """
-        return self.listbox.curselection()
-    
+        if self.sitelist.store is None:
+            return ()
+        return self.sitelist.store.selected()
+
     @property
     def all_sites(self) -> List[Tuple[str, str]]:
-        """Pobiera zawartość listy z widżetu Listbox. Dzieli każdy element listy
-        na podstawie spacji i zwraca krotkę.
-        """
-        return [tuple(site.split()) for site in self.listbox.get('0', tk.END)]
+        """Zwraca listę par adresów wyświetlanych na liście."""
+        if self.sitelist.store is None:
+            return []
+        return list(self.sitelist.store)
 
     @property
     def user_input(self) -> str:
         """Pobiera tekst wprowadzony przez użytkownika."""
         return self.site.get()
 
+    @property
+    def filter_text(self) -> str:
+        """Pobiera tekst z pola wyszukiwania."""
+        return self.filter_var.get()
+
     def create_input_widget(self):
         self.site = tk.StringVar()
         frame = ttk.Frame(self.root, padding=5)
@@ -68,46 +181,49 @@ class AppView:
         self.entry.focus()
         frame.pack(expand=0, fill=tk.X)
 
-    def add_to_listbox(self, sel: bool, elem: Tuple[str, str]) -> None:
-        """Dodaje listę z parą adresów (xxx.com i www.xxx.com) wprowadzoną przez
-        użytkownika do widżetu Listbox i zaznacza wprowadzona pozycję jako
-        aktywną. Sprawdza, czy pierwszy element listy jest dłuższy niż 16 znków,
-        jeśli tak to przesuwa tabulator o 4 i tak do skutku.
+    def show_added(self) -> None:
+        """Odświeża listę po dodaniu strony do modelu, przewija ją do ostatniej
+        pozycji i czyści pole wpisywania.
         """
-        tab: int = 16
-        sitename: int = len(elem[0])
-        while sitename >= tab:
-            tab += 4
-        space: str = ' ' * (tab - len(elem[0]))
-        self.listbox.insert(tk.END, space.join(elem))
-        if sel:
-            self.listbox.selection_set(tk.END)
+        if self.filter_text:
+            # Dodana strona jest widoczna tylko na pełnej liście.
+            self.filter_var.set('')
+            self.filter_by_user()
+        self.sitelist.see(len(self.sitelist) - 1)
         self.entry.delete(0, 'end')
         self.entry.focus()
 
     def delete_from_listbox(self) -> None:
-        """Usuwa zaznaczone elementy z widżetu Listbox. Najpierw pobiera krotkę
-        z indeksami zaznaczonych elementów, odwraca kolejność w krotce i kasuje
-        elementy od tyłu, aby indeksy się nie zmieniły.
+        """Odświeża listę po usunięciu zaznaczonych elementów z modelu."""
+        self.refresh()
+
+    def refresh(self) -> None:
+        """Odświeża listę po zmianie wielu pozycji w modelu (np. po imporcie).
+        Przefiltrowana lista jest filtrowana od nowa, a indeks wyszukiwania
+        uzupełniany w tle.
         """
-        elem: Tuple[int] = self.listbox.curselection()
-        if elem:
-            for i in reversed(elem):
-                self.listbox.delete(i)
+        if self.filter_text:
+            self.filter_by_user()
         else:
-            self.showerr(self.errmsg['notselected'])
+            self.sitelist.render()
+        self.index_sites()
 
     def create_listbox(self):
         frame = ttk.Frame(self.root, padding=5)
         listbox_font = tk.font.Font(family='Monospace', size=10)
         ttk.Label(frame, text=self.labels['select']).pack(fill=tk.X)
+        search = ttk.Frame(frame)
+        ttk.Label(search, text=self.labels['filter']).pack(side=tk.LEFT)
+        self.filter_var = tk.StringVar()
+        self.filter_var.trace_add('write', self.on_filter_change)
+        ttk.Entry(search, textvariable=self.filter_var).pack(
+            expand=1, fill=tk.X, side=tk.LEFT, padx=(5, 0))
+        search.pack(fill=tk.X, pady=(0, 5))
         scrollbar = tk.Scrollbar(frame)
         scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
-        self.listbox = tk.Listbox(frame, font=listbox_font,
-                                  selectmode=tk.MULTIPLE)
+        self.sitelist = VirtualListbox(frame, scrollbar, font=listbox_font)
+        self.listbox = self.sitelist.listbox
         self.listbox.pack(expand=1, fill=tk.BOTH, side=tk.TOP)
-        self.listbox.config(yscrollcommand=scrollbar.set)
-        scrollbar.config(command=self.listbox.yview)
         frame.pack(expand=1, fill=tk.BOTH, side=tk.TOP)
 
     def add_by_user(self, event=None):
@@ -118,27 +234,104 @@ class AppView:
         except AttributeError:
             print(self.errmsg['unittests'])
 
+    def on_filter_change(self, *args) -> None:
+        """Wywoływana po każdej zmianie pola wyszukiwania - odkłada
+        filtrowanie o `FILTER_DELAY` ms od ostatniego znaku."""
+        if self.filter_job is not None:
+            self.root.after_cancel(self.filter_job)
+        self.filter_job = self.root.after(FILTER_DELAY, self.filter_by_user)
+
+    def filter_by_user(self) -> None:
+        """Filtruje listę wg tekstu z pola wyszukiwania."""
+        if self.filter_job is not None:
+            self.root.after_cancel(self.filter_job)
+            self.filter_job = None
+        try:
+            self.controller.filter_sites()
+        except AttributeError:
+            print(self.errmsg['unittests'])
+
+    def show_filtered(self, sites) -> None:
+        """Wyświetla przefiltrowaną listę od początku.
+        sites -- `model.FilteredSites` albo cała lista (`model.SiteStore`)
+        """
+        self.sitelist.set_store(sites)
+
+    def index_sites(self) -> None:
+        """Buduje indeks wyszukiwania listy w tle - małymi krokami w pętli
+        zdarzeń Tk, więc GUI nie jest wstrzymywane."""
+        if self.index_job is not None:
+            return
+
+        def step():
+            self.index_job = None
+            try:
+                remaining: int = self.controller.index_sites()
+            except AttributeError:
+                return
+            if remaining:
+                self.index_job = self.root.after(INDEX_DELAY, step)
+        self.index_job = self.root.after(INDEX_DELAY, step)
+
+    def delete_by_user(self):
+        """Funkcja wywoływana przez naciśnięcie klawisza `Usuń`."""
+        try:
+            self.controller.delete_selected()
+        except AttributeError:
+            print(self.errmsg['unittests'])
+
+    def import_by_user(self):
+        """Funkcja wywoływana przez naciśnięcie klawisza `Importuj`. Pyta
+        o plik z listą stron (hosts, lista domen lub adblock)."""
+        fpath: str = filedialog.askopenfilename(
+            parent=self.root, title=self.labels['importfile'])
+        if not fpath:
+            return
+        try:
+            self.controller.import_file(fpath)
+        except AttributeError:
+            print(self.errmsg['unittests'])
+
     def showerr(self, msg):
         messagebox.showerror(title=self.labels['err'], message=msg)
         return 'break'
 
-    def load_from_file(self, sites: List[Tuple[bool, str, str]]):
-        """Ładuje zawrtość listy do widżetu Listbox. W tym celu najpierw sortuje
-        liste alfabetycznie wg adresu strony bez `www.`, dodaje do widżetu
-        Listbox tylko adresy (alist[1:3]), a na podstawie wartosci bool
-        (alist[0]) ustawia, czy pozycja w widżecie ma być zaznaczona.
-        sites -- lista z parą adresów i informacją czy strona jest zablokowana
+    def showinfo(self, msg):
+        messagebox.showinfo(title=self.labels['info'], message=msg)
+
+    def load_from_file(self, sites) -> None:
+        """Podłącza do listy strony z modelu i wyświetla pierwsze z nich.
+        sites -- lista stron z modelu (`model.SiteStore`), posortowana
+                 i z informacją, czy strona jest zablokowana
         """
-        sites: List[Tuple[bool, str, str]] = sorted(sites, key=lambda t: t[1])
-        for ind, line in enumerate(sites):
-            self.add_to_listbox(line[0], line[1:3])
-            # self.add_to_listbox(line[1:3])
-            # if line[0]:
-            #     self.listbox.selection_set(ind)
+        self.sitelist.set_store(sites)
+        self.index_sites()
+
+    def watch_file(self, watcher, callback, interval: int = 1000) -> None:
+        """Wywołuje `callback`, gdy `watcher` (zob. moduł `watcher`) wykryje
+        zmianę pliku. Deskryptor inotify jest obsługiwany w pętli zdarzeń Tk,
+        bez odpytywania; bez niego plik jest sprawdzany co `interval` ms.
+        """
+        fd = watcher.fileno()
+        if fd is not None:
+            try:
+                self.root.tk.createfilehandler(
+                    fd, tk.READABLE,
+                    lambda *args: watcher.changed() and callback())
+                return
+            except (AttributeError, tk.TclError):
+                pass
+
+        def poll():
+            if watcher.changed():
+                callback()
+            self.root.after(interval, poll)
+        self.root.after(interval, poll)
 
     def create_bottom_button_bar(self):
-        func = (self.block_selected, self.quit, self.delete_from_listbox)
-        labels = ('block', 'cancel', 'delete')
+        func = (self.block_selected, self.quit, self.delete_by_user,
+                self.import_by_user)
+        labels = ('block', 'cancel', 'delete', 'import')
         for fn, lb in zip(func, labels):
             ttk.Button(self.root,
                        command=fn,
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""Wykrywanie zmian pliku hosts wprowadzonych przez inne programy, gdy
+okno programu jest otwarte.
+
+Na Linuksie używa inotify (przez ctypes, bez dodatkowych modułów) i obserwuje
+katalog pliku, bo edytory i `AppModel.replace_hosts_file` podmieniają plik
+przez `rename`. Gdzie inotify jest niedostępne, porównuje `os.stat` pliku
+(i-węzeł, rozmiar, czas modyfikacji) przy każdym sprawdzeniu.
+
+Obiekt obserwujący ma metody `fileno()` (deskryptor do użycia w pętli
+zdarzeń, np. `createfilehandler` w Tk, albo None - wtedy trzeba sprawdzać
+okresowo), `changed()` i `close()`.
+"""
+
+from typing import Tuple
+import os
+import struct
+
+IN_CLOSE_WRITE: int = 0x00000008
+IN_MOVED_TO: int = 0x00000080
+IN_DELETE: int = 0x00000200
+IN_NONBLOCK: int = 0o4000
+IN_CLOEXEC: int = 0o2000000
+# Nagłówek `struct inotify_event`: wd, mask, cookie, len (i nazwa pliku).
+EVENT = struct.Struct("iIII")
+
+
+class StatWatcher:
+    """Wykrywa zmiany porównując wynik `os.stat` z poprzednim."""
+
+    def __init__(self, fpath: str) -> None:
+        self.fpath = os.path.realpath(fpath)
+        self.signature = self.stat()
+
+    def stat(self) -> Tuple[int, int, int] or None:
+        try:
+            st = os.stat(self.fpath)
+        except OSError:
+            return None
+        return st.st_ino, st.st_size, st.st_mtime_ns
+
+    def fileno(self) -> int or None:
+        return None
+
+    def changed(self) -> bool:
+        signature = self.stat()
+        if signature == self.signature:
+            return False
+        self.signature = signature
+        return True
+
+    def close(self) -> None:
+        pass
+
+
+class InotifyWatcher:
+    """Wykrywa zmiany przez inotify. Podnosi OSError, jeśli inotify jest
+    niedostępne."""
+
+    def __init__(self, fpath: str) -> None:
+        import ctypes  # tylko gdy okno jest już otwarte
+        import ctypes.util
+        fpath = os.path.realpath(fpath)
+        self.name: bytes = os.fsencode(os.path.basename(fpath))
+        try:
+            libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6',
+                               use_errno=True)
+            init, add_watch = libc.inotify_init1, libc.inotify_add_watch
+        except (OSError, AttributeError) as err:
+            raise OSError(str(err))
+        self.fd: int = init(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1")
+        wd = add_watch(self.fd, os.fsencode(os.path.dirname(fpath)),
+                       IN_CLOSE_WRITE | IN_MOVED_TO | IN_DELETE)
+        if wd < 0:
+            errno: int = ctypes.get_errno()
+            os.close(self.fd)
+            raise OSError(errno, os.strerror(errno), fpath)
+
+    def fileno(self) -> int:
+        return self.fd
+
+    def changed(self) -> bool:
+        """Odczytuje wszystkie oczekujące zdarzenia; True, jeśli któreś
+        dotyczy obserwowanego pliku."""
+        changed: bool = False
+        while True:
+            try:
+                data: bytes = os.read(self.fd, 65536)
+            except BlockingIOError:
+                return changed
+            pos: int = 0
+            while pos < len(data):
+                length: int = EVENT.unpack_from(data, pos)[3]
+                pos += EVENT.size
+                if data[pos:pos + length].rstrip(b'\0') == self.name:
+                    changed = True
+                pos += length
+
+    def close(self) -> None:
+        os.close(self.fd)
+
+
+def create_watcher(fpath: str):
+    """Zwraca `InotifyWatcher`, a jeśli inotify jest niedostępne -
+    `StatWatcher`."""
+    try:
+        return InotifyWatcher(fpath)
+    except OSError:
+        return StatWatcher(fpath)
+
+
+def main():
+    create_watcher("/etc/hosts").close()
+
+
+if __name__ == "__main__":
+    # execute only if run as a script
+    main()